@@ -16,12 +16,11 @@ from PIL import Image
 from pypdf import PdfReader, PdfWriter
 from werkzeug.utils import secure_filename
 
-# PyMuPDF（用于 PDF 转图片）
-try:
+# PyMuPDF（用于 PDF 转图片），渲染放在 raster 的进程池里
+from raster import HAS_FITZ, render_pages, write_long_image
+
+if HAS_FITZ:
     import fitz  # PyMuPDF
-    HAS_FITZ = True
-except ImportError:
-    HAS_FITZ = False
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max
@@ -769,39 +768,6 @@ def api_normalize_landscape():
             os.remove(temp_path)
 
 
-def compress_image_to_size(img, max_size_kb, output_path):
-    """压缩图片到指定大小以下（仅支持 JPG）"""
-    max_size_bytes = max_size_kb * 1024
-
-    # 先尝试不同的质量等级
-    for quality in range(95, 10, -5):
-        buffer = BytesIO()
-        img.save(buffer, format='JPEG', quality=quality)
-        if buffer.tell() <= max_size_bytes:
-            img.save(output_path, format='JPEG', quality=quality)
-            return os.path.getsize(output_path)
-
-    # 如果还是太大，缩小尺寸
-    scale = 0.9
-    while scale > 0.1:
-        new_size = (int(img.width * scale), int(img.height * scale))
-        resized = img.resize(new_size, Image.LANCZOS)
-
-        for quality in range(85, 10, -10):
-            buffer = BytesIO()
-            resized.save(buffer, format='JPEG', quality=quality)
-            if buffer.tell() <= max_size_bytes:
-                resized.save(output_path, format='JPEG', quality=quality)
-                return os.path.getsize(output_path)
-
-        scale -= 0.1
-
-    # 最后保底
-    resized = img.resize((int(img.width * 0.3), int(img.height * 0.3)), Image.LANCZOS)
-    resized.save(output_path, format='JPEG', quality=20)
-    return os.path.getsize(output_path)
-
-
 @app.route('/api/pdf_to_images', methods=['POST'])
 def api_pdf_to_images():
     if 'pdf' not in request.files:
@@ -826,7 +792,6 @@ def api_pdf_to_images():
 
     pdf_file = request.files['pdf']
     temp_path = safe_temp_path(pdf_file.filename)
-    temp_dir = None
 
     try:
         pdf_file.save(temp_path)
@@ -841,88 +806,60 @@ def api_pdf_to_images():
             doc.close()
             return jsonify({'success': False, 'message': f'页码范围错误，PDF 共 {total_pages} 页'})
 
-        temp_dir = tempfile.mkdtemp()
-        images = []
-        zoom = dpi / 72
-
-        for page_num in range(start_page - 1, end_page):
-            page = doc[page_num]
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            images.append(img)
-
         doc.close()
 
-        # 合并为长图
-        if long_image and len(images) > 0:
-            max_width = max(img.width for img in images)
-            total_height = sum(img.height for img in images)
-
-            long_img = Image.new('RGB', (max_width, total_height), (255, 255, 255))
-            y_offset = 0
-            for img in images:
-                x_offset = (max_width - img.width) // 2
-                long_img.paste(img, (x_offset, y_offset))
-                y_offset += img.height
-
-            ext = 'jpg' if output_format == 'jpg' else 'png'
-            output_filename = f"long_image_{os.urandom(4).hex()}.{ext}"
-            output_path = os.path.join(UPLOAD_FOLDER, output_filename)
-
-            if output_format == 'png':
-                long_img.save(output_path, format='PNG')
+        # 合并为长图：逐页渲染、按行追加，JPG 超过单段高度时分段后打包
+        if long_image:
+            output_name = f"long_image_{os.urandom(4).hex()}"
+            paths, width, height = write_long_image(
+                temp_path, start_page, end_page, dpi, output_format,
+                os.path.join(UPLOAD_FOLDER, output_name), max_size
+            )
+
+            if len(paths) == 1:
+                output_path = paths[0]
+                segment_str = ""
             else:
-                if max_size > 0:
-                    compress_image_to_size(long_img, max_size, output_path)
-                else:
-                    long_img.save(output_path, format='JPEG', quality=85)
+                output_path = os.path.join(UPLOAD_FOLDER, f"{output_name}.zip")
+                with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_STORED) as zf:
+                    for path in paths:
+                        zf.write(path, os.path.basename(path))
+                        os.remove(path)
+                segment_str = f"，按高度分为 {len(paths)} 段"
 
             file_size = os.path.getsize(output_path)
             return jsonify({
                 'success': True,
-                'message': f'✅ 第 {start_page}-{end_page} 页合并为长图（{max_width}x{total_height}，{format_size(file_size)}）',
-                'download_url': f'/download/{output_filename}'
+                'message': f'✅ 第 {start_page}-{end_page} 页合并为长图（{width}x{height}，{format_size(file_size)}{segment_str}）',
+                'download_url': f'/download/{os.path.basename(output_path)}'
             })
 
-        # 正常导出多张图片
-        image_paths = []
+        # 正常导出多张图片：渲染和编码在进程池里完成，按页码顺序直接写进 zip
+        ext = 'jpg' if output_format == 'jpg' else 'png'
+        page_count = 0
         total_size = 0
 
-        for i, img in enumerate(images):
-            page_num = start_page + i
-            if output_format == 'png':
-                out_path = os.path.join(temp_dir, f"page_{page_num}.png")
-                img.save(out_path, format='PNG')
-            else:
-                out_path = os.path.join(temp_dir, f"page_{page_num}.jpg")
-                if max_size > 0:
-                    compress_image_to_size(img, max_size, out_path)
-                else:
-                    img.save(out_path, format='JPEG', quality=85)
-            total_size += os.path.getsize(out_path)
-            image_paths.append(out_path)
-
         zip_filename = f"pdf_images_{os.urandom(4).hex()}.zip"
         zip_path = os.path.join(UPLOAD_FOLDER, zip_filename)
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for img_path in image_paths:
-                zf.write(img_path, os.path.basename(img_path))
+        # PNG/JPG 本身已压缩，再 deflate 只是白白占用 CPU
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as zf:
+            for page_num, data in render_pages(temp_path, start_page, end_page, dpi, output_format, max_size):
+                zf.writestr(f"page_{page_num}.{ext}", data)
+                page_count += 1
+                total_size += len(data)
 
         format_str = "JPG" if output_format == 'jpg' else "PNG"
         size_limit_str = f"，每张≤{max_size}KB" if max_size > 0 and output_format == 'jpg' else ""
 
         return jsonify({
             'success': True,
-            'message': f'✅ 导出第 {start_page}-{end_page} 页，共 {len(image_paths)} 张 {format_str} 图片（总计 {format_size(total_size)}{size_limit_str}）',
+            'message': f'✅ 导出第 {start_page}-{end_page} 页，共 {page_count} 张 {format_str} 图片（总计 {format_size(total_size)}{size_limit_str}）',
             'download_url': f'/download/{zip_filename}'
         })
 
     except Exception as e:
         return jsonify({'success': False, 'message': f'处理失败: {e}'})
     finally:
-        if temp_dir and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
         if os.path.exists(temp_path):
             os.remove(temp_path)
 
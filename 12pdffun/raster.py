@@ -0,0 +1,334 @@
+"""
+PDF 转图片的渲染引擎（PyMuPDF + 进程池）
+
+页码范围切成小段交给进程池，每个工作进程自己打开 fitz 文档、渲染并编码成
+PNG/JPG 字节后返回；主进程按页码顺序取回结果直接写进 zip。
+同时在途的分段数有上限，内存占用取决于进程数而不是总页数。
+
+合并长图时逐页渲染、按行追加到 StripWriter：PNG 边压缩边写盘，峰值约一页；
+JPG 无法逐行编码，按固定高度分段，每段单独成文件，峰值是一段加一页。
+"""
+
+import abc
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from PIL import Image
+
+try:
+    import fitz  # PyMuPDF
+    HAS_FITZ = True
+except ImportError:
+    HAS_FITZ = False
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+CHUNK_PAGES = 4            # 每个任务渲染的页数
+CHUNKS_PER_WORKER = 2      # 每个进程最多排队的分段数
+
+PNG_MAX_HEIGHT = 2 ** 31 - 1      # PNG 规范上限
+JPEG_MAX_SIDE = 65500             # JPG 宽高上限 65535，留一点余量
+JPEG_SEGMENT_PIXELS = 24_000_000  # JPG 每段的像素预算（RGB 约 72MB）
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def compress_image(img, max_size_kb):
+    """把图片压缩为不超过 max_size_kb 的 JPG，返回编码后的字节"""
+    max_size_bytes = max_size_kb * 1024
+
+    # 先尝试不同的质量等级
+    for quality in range(95, 10, -5):
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=quality)
+        if buffer.tell() <= max_size_bytes:
+            return buffer.getvalue()
+
+    # 如果还是太大，缩小尺寸
+    scale = 0.9
+    while scale > 0.1:
+        new_size = (int(img.width * scale), int(img.height * scale))
+        resized = img.resize(new_size, Image.LANCZOS)
+
+        for quality in range(85, 10, -10):
+            buffer = BytesIO()
+            resized.save(buffer, format='JPEG', quality=quality)
+            if buffer.tell() <= max_size_bytes:
+                return buffer.getvalue()
+
+        scale -= 0.1
+
+    # 最后保底
+    resized = img.resize((int(img.width * 0.3), int(img.height * 0.3)), Image.LANCZOS)
+    buffer = BytesIO()
+    resized.save(buffer, format='JPEG', quality=20)
+    return buffer.getvalue()
+
+
+def encode_image(img, output_format, max_size_kb=0):
+    """按导出格式编码单张图片；max_size_kb 只对 JPG 生效"""
+    buffer = BytesIO()
+    if output_format == 'png':
+        img.save(buffer, format='PNG')
+    elif max_size_kb > 0:
+        return compress_image(img, max_size_kb)
+    else:
+        img.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def render_page(doc, page_num, dpi):
+    """渲染第 page_num 页（从 1 开始）为 RGB 图片"""
+    zoom = dpi / 72
+    pix = doc[page_num - 1].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def _render_range(pdf_path, first, last, dpi, output_format, max_size_kb):
+    """工作进程入口：打开自己的文档，渲染 [first, last] 页，返回 [(页码, 字节)]"""
+    doc = fitz.open(pdf_path)
+    try:
+        return [
+            (page_num, encode_image(render_page(doc, page_num, dpi), output_format, max_size_kb))
+            for page_num in range(first, last + 1)
+        ]
+    finally:
+        doc.close()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_pages(pdf_path, start_page, end_page, dpi, output_format, max_size_kb=0):
+    """
+    按页码顺序逐页产出 (页码, 编码后的字节)。
+
+    页数不超过一个分段或只有一个 CPU 时直接在当前进程渲染，省去进程开销。
+    """
+    chunks = [(first, min(first + CHUNK_PAGES - 1, end_page))
+              for first in range(start_page, end_page + 1, CHUNK_PAGES)]
+    args = (dpi, output_format, max_size_kb)
+
+    if len(chunks) <= 1 or MAX_WORKERS <= 1:
+        for first, last in chunks:
+            yield from _render_range(pdf_path, first, last, *args)
+        return
+
+    pool = _get_pool()
+    window = MAX_WORKERS * CHUNKS_PER_WORKER
+    pending = []
+    try:
+        for first, last in chunks:
+            pending.append(pool.submit(_render_range, pdf_path, first, last, *args))
+            # 窗口满了先把最早的分段写出去，再提交新的
+            if len(pending) >= window:
+                yield from pending.pop(0).result()
+        while pending:
+            yield from pending.pop(0).result()
+    except BrokenProcessPool:
+        _reset_pool()
+        raise
+    finally:
+        # 中途出错时取消还没开始的分段，等正在渲染的结束，调用方才能删掉临时 PDF
+        for future in pending:
+            future.cancel()
+        wait(pending)
+
+
+class StripWriter(abc.ABC):
+    """
+    长图写入器：按页从上到下追加，窄的页面居中、两侧补白。
+    一段写满 segment_height 行后另起一段，paths 按顺序记录各段文件。
+    """
+
+    ext = None
+
+    def __init__(self, base_path, width, segment_height):
+        self.base_path = base_path
+        self.width = width
+        self.segment_height = segment_height
+        self.height = 0
+        self.paths = []
+        self._rows = 0
+        self._open = False
+
+    def append(self, img):
+        if img.width != self.width:
+            padded = Image.new('RGB', (self.width, img.height), (255, 255, 255))
+            padded.paste(img, ((self.width - img.width) // 2, 0))
+            img = padded
+
+        top = 0
+        while top < img.height:
+            if not self._open or self._rows == self.segment_height:
+                self._next_segment()
+            n = min(img.height - top, self.segment_height - self._rows)
+            strip = img if n == img.height else img.crop((0, top, self.width, top + n))
+            self._write(strip)
+            self._rows += n
+            self.height += n
+            top += n
+
+    def close(self):
+        if self._open:
+            self._finish()
+            self._open = False
+        # 只有一段时去掉分段后缀
+        if len(self.paths) == 1:
+            path = f"{self.base_path}.{self.ext}"
+            os.replace(self.paths[0], path)
+            self.paths[0] = path
+
+    def abort(self):
+        """出错时调用：关掉当前段并删除已写出的全部分段文件"""
+        if self._open:
+            self._open = False
+            self._discard()
+        for path in self.paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self.paths = []
+
+    def _next_segment(self):
+        if self._open:
+            self._finish()
+        path = f"{self.base_path}_{len(self.paths) + 1}.{self.ext}"
+        self.paths.append(path)
+        self._rows = 0
+        self._begin(path)
+        self._open = True
+
+    @abc.abstractmethod
+    def _begin(self, path):
+        """开始写 path 这一段"""
+
+    @abc.abstractmethod
+    def _write(self, strip):
+        """把宽度为 self.width 的一条图片追加到当前段"""
+
+    @abc.abstractmethod
+    def _finish(self):
+        """结束当前段并落盘，self._rows 是这一段的实际行数"""
+
+    def _discard(self):
+        """放弃写了一半的当前段，释放打开的文件等资源"""
+
+
+class PngStripWriter(StripWriter):
+    """逐行写 PNG：IDAT 用 zlib 流式压缩，实际高度在段结束时回填到 IHDR"""
+
+    ext = 'png'
+
+    def __init__(self, base_path, width):
+        super().__init__(base_path, width, PNG_MAX_HEIGHT)
+
+    def _chunk(self, tag, data):
+        self._file.write(struct.pack('>I', len(data)) + tag + data)
+        self._file.write(struct.pack('>I', zlib.crc32(tag + data)))
+
+    def _ihdr(self, height):
+        # 8 位 RGB，无隔行
+        return struct.pack('>IIBBBBB', self.width, height, 8, 2, 0, 0, 0)
+
+    def _begin(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', self._ihdr(0))
+        self._compressor = zlib.compressobj(6)
+
+    def _write(self, strip):
+        raw = memoryview(strip.tobytes())
+        stride = self.width * 3
+        rows = bytearray()
+        for y in range(strip.height):
+            rows += b'\x00'  # 过滤类型 None
+            rows += raw[y * stride:(y + 1) * stride]
+        data = self._compressor.compress(bytes(rows))
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def _finish(self):
+        self._chunk(b'IDAT', self._compressor.flush())
+        self._chunk(b'IEND', b'')
+        self._file.seek(8)
+        self._chunk(b'IHDR', self._ihdr(self._rows))
+        self._file.close()
+
+    def _discard(self):
+        self._file.close()
+
+
+class JpegStripWriter(StripWriter):
+    """JPG 只能整张编码：每段先拼在一块画布上，段满后编码写盘"""
+
+    ext = 'jpg'
+
+    def __init__(self, base_path, width, max_size_kb=0):
+        if width > JPEG_MAX_SIDE:
+            raise ValueError(f'长图宽度 {width} 超过 JPG 上限 {JPEG_MAX_SIDE}，请降低 DPI 或改用 PNG')
+        segment_height = min(JPEG_MAX_SIDE, max(1, JPEG_SEGMENT_PIXELS // width))
+        super().__init__(base_path, width, segment_height)
+        self.max_size_kb = max_size_kb
+
+    def _begin(self, path):
+        self._path = path
+        self._canvas = Image.new('RGB', (self.width, self.segment_height), (255, 255, 255))
+
+    def _write(self, strip):
+        self._canvas.paste(strip, (0, self._rows))
+
+    def _finish(self):
+        img = self._canvas
+        if self._rows < self.segment_height:
+            img = img.crop((0, 0, self.width, self._rows))
+        self._canvas = None
+        with open(self._path, 'wb') as f:
+            f.write(encode_image(img, 'jpg', self.max_size_kb))
+
+    def _discard(self):
+        self._canvas = None
+
+
+def write_long_image(pdf_path, start_page, end_page, dpi, output_format, base_path, max_size_kb=0):
+    """
+    把 [start_page, end_page] 逐页渲染拼成长图，返回 (各段文件路径, 宽, 总高)。
+    宽度取各页渲染尺寸的最大值，不用先渲染就能算出。
+    """
+    zoom = dpi / 72
+    matrix = fitz.Matrix(zoom, zoom)
+    doc = fitz.open(pdf_path)
+    try:
+        width = max((doc[n - 1].rect * matrix).irect.width for n in range(start_page, end_page + 1))
+        if output_format == 'png':
+            writer = PngStripWriter(base_path, width)
+        else:
+            writer = JpegStripWriter(base_path, width, max_size_kb)
+        try:
+            for page_num in range(start_page, end_page + 1):
+                writer.append(render_page(doc, page_num, dpi))
+            writer.close()
+        except BaseException:
+            # 渲染到一半失败时已写完的分段没人会来下载，连同半截的当前段一起删掉
+            writer.abort()
+            raise
+    finally:
+        doc.close()
+    return writer.paths, width, writer.height
@@ -14,7 +14,10 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from app.config import settings
 from app.database import init_db
-from routers import auth_router, files_router, search_router, preview_router, trash_router, agent_router, mounts_router
+from app.concurrency import get_pool_status, shutdown_executor
+from services.index_service import start_background_indexer
+from services.trash_service import start_purge_worker
+from routers import auth_router, files_router, search_router, preview_router, trash_router, agent_router, mounts_router, duplicates_router
 
 app = FastAPI(
     title="私人文件系统",
@@ -45,6 +48,7 @@ app.include_router(preview_router)
 app.include_router(trash_router)
 app.include_router(agent_router)
 app.include_router(mounts_router)
+app.include_router(duplicates_router)
 
 
 @app.on_event("startup")
@@ -60,6 +64,9 @@ async def startup_event():
     trash_path = Path(settings.trash_path)
     trash_path.mkdir(parents=True, exist_ok=True)
     
+    start_background_indexer()
+    start_purge_worker()
+    
     print(f"\n{'='*50}")
     print(f"  私人文件系统 v1.0 已启动!")
     print(f"  本地访问:   http://localhost:{settings.server_port}")
@@ -68,6 +75,11 @@ async def startup_event():
     print(f"{'='*50}\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_executor()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -125,7 +137,7 @@ async def update_config(request: Request):
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "workers": get_pool_status()}
 
 
 def get_local_ip():
@@ -0,0 +1,115 @@
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.config import settings
+
+
+_CPUS = os.cpu_count() or 1
+
+# 各类接口同时在线程池中执行的上限，可在 config.json 的 server.concurrency 中覆盖；
+# 搜索类主要耗 CPU，默认不超过核数。files 只给单个目录的轻量调用，
+# 统计和整棵文件夹树缓存未命中时要递归扫描，单独归到 tree，避免占满列目录的名额
+DEFAULT_LIMITS = {
+    "search": min(4, _CPUS),
+    "content_search": min(2, _CPUS),
+    "files": 16,
+    "tree": 2,
+    "file_ops": 4,
+    "preview": 8,
+    "agent": 4,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_limiters: Dict[str, "_Limiter"] = {}
+
+
+class _Limiter:
+    """按接口类别限流；名额在线程真正执行完后才归还，客户端中途断开也不会超发。"""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.running = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(self.limit)
+
+    async def acquire(self):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+    def release(self):
+        self.running -= 1
+        self._semaphore.release()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.worker_threads),
+                thread_name_prefix="blocking"
+            )
+        return _executor
+
+
+def _get_limiter(name: str) -> _Limiter:
+    limiter = _limiters.get(name)
+    if limiter is None:
+        limit = settings.endpoint_concurrency.get(name, DEFAULT_LIMITS.get(name, 8))
+        limiter = _limiters[name] = _Limiter(name, limit)
+    return limiter
+
+
+async def run_blocking(name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在受管线程池中执行阻塞调用（文件系统遍历、同步 SQLAlchemy 等），不占用事件循环。
+
+    name 是接口类别，同一类别同时执行的调用数不超过其上限，超出的在事件循环里排队，
+    不占线程。这样一次慢搜索最多占用 search 类别的名额，列目录等请求仍有线程可用。
+    """
+    limiter = _get_limiter(name)
+    await limiter.acquire()
+    loop = asyncio.get_running_loop()
+    try:
+        future = get_executor().submit(functools.partial(func, *args, **kwargs))
+    except BaseException:
+        limiter.release()
+        raise
+
+    def on_done(_):
+        try:
+            loop.call_soon_threadsafe(limiter.release)
+        except RuntimeError:
+            # 事件循环已关闭（进程退出中）
+            pass
+
+    future.add_done_callback(on_done)
+    return await asyncio.wrap_future(future)
+
+
+def get_pool_status() -> dict:
+    return {
+        "worker_threads": max(1, settings.worker_threads),
+        "endpoints": {
+            name: {"limit": limiter.limit, "running": limiter.running, "waiting": limiter.waiting}
+            for name, limiter in sorted(_limiters.items())
+        }
+    }
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
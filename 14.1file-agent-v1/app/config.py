@@ -39,6 +39,18 @@ class Settings:
     def trash_path(self) -> str:
         return self.storage.get("trash", "F:\\MyFiles\\.trash")
     
+    @property
+    def trash_retention_days(self) -> int:
+        return self.storage.get("trash_retention_days", 0)
+    
+    @property
+    def trash_max_size_gb(self) -> float:
+        return self.storage.get("trash_max_size_gb", 0)
+    
+    @property
+    def transfer_workers(self) -> int:
+        return self.storage.get("transfer_workers", 4)
+    
     @property
     def auth(self) -> dict:
         return self._config.get("auth", {})
@@ -63,6 +75,18 @@ class Settings:
     def max_upload_size_mb(self) -> int:
         return self.upload.get("max_size_mb", 2048)
     
+    @property
+    def upload_chunk_size_mb(self) -> int:
+        return self.upload.get("chunk_size_mb", 10)
+    
+    @property
+    def upload_parallel_parts(self) -> int:
+        return self.upload.get("parallel_parts", 4)
+    
+    @property
+    def upload_session_expire_hours(self) -> int:
+        return self.upload.get("session_expire_hours", 24)
+    
     @property
     def search(self) -> dict:
         return self._config.get("search", {})
@@ -71,6 +95,58 @@ class Settings:
     def excluded_dirs(self) -> list:
         return self.search.get("excluded_dirs", [])
     
+    @property
+    def index_enabled(self) -> bool:
+        return self.search.get("index_enabled", True)
+    
+    @property
+    def index_interval_hours(self) -> float:
+        return self.search.get("index_interval_hours", 1)
+    
+    @property
+    def watch_enabled(self) -> bool:
+        return self.search.get("watch_enabled", True)
+    
+    @property
+    def watch_poll_seconds(self) -> float:
+        return self.search.get("watch_poll_seconds", 300)
+    
+    @property
+    def content_index_enabled(self) -> bool:
+        return self.search.get("content_index_enabled", True)
+    
+    @property
+    def content_index_workers(self) -> int:
+        return self.search.get("content_index_workers", min(4, os.cpu_count() or 1))
+    
+    @property
+    def content_max_size_mb(self) -> int:
+        return self.search.get("content_max_size_mb", 50)
+    
+    @property
+    def dedup_workers(self) -> int:
+        return self.search.get("dedup_workers", min(4, os.cpu_count() or 1))
+    
+    @property
+    def walk_workers(self) -> int:
+        return self.search.get("walk_workers", 8)
+    
+    @property
+    def walk_time_budget_seconds(self) -> float:
+        return self.search.get("walk_time_budget_seconds", 30)
+    
+    @property
+    def preview(self) -> dict:
+        return self._config.get("preview", {})
+    
+    @property
+    def thumb_cache_mb(self) -> int:
+        return self.preview.get("thumb_cache_mb", 512)
+    
+    @property
+    def thumb_prefetch(self) -> bool:
+        return self.preview.get("thumb_prefetch", True)
+    
     @property
     def llm(self) -> dict:
         return self._config.get("llm", {})
@@ -111,6 +187,14 @@ class Settings:
     def server_port(self) -> int:
         return self.server.get("port", 5000)
     
+    @property
+    def worker_threads(self) -> int:
+        return self.server.get("worker_threads", 32)
+    
+    @property
+    def endpoint_concurrency(self) -> dict:
+        return self.server.get("concurrency", {})
+    
     @property
     def cors(self) -> dict:
         return self._config.get("cors", {})
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import create_engine, event, inspect, Column, Integer, BigInteger, Float, String, Boolean, DateTime, Text, Index
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -10,7 +11,20 @@ DATA_DIR.mkdir(exist_ok=True)
 
 DATABASE_URL = f"sqlite:///{DATA_DIR / 'files.db'}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False, "timeout": 30})
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL 下读写互不阻塞；synchronous=NORMAL 只在 checkpoint 时 fsync，崩溃最多丢最后几个事务
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-32000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -22,10 +36,10 @@ class File(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(500), nullable=False)
     path = Column(String(1000), unique=True, nullable=False)
-    parent_path = Column(String(1000))
+    parent_path = Column(String(1000), index=True)
     is_dir = Column(Boolean, default=False)
     size = Column(Integer, default=0)
-    ext = Column(String(50))
+    ext = Column(String(50), index=True)
     mime_type = Column(String(100))
     is_starred = Column(Boolean, default=False)
     thumbnail = Column(String(500))
@@ -34,6 +48,79 @@ class File(Base):
     indexed_at = Column(DateTime, default=datetime.utcnow)
 
 
+class ContentIndex(Base):
+    """全文索引的元数据，(path, modified_at, size) 不变时不重新提取；正文存放在 FTS5 表 file_contents 中，rowid 与 id 对应。"""
+    __tablename__ = "content_index"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String(1000), unique=True, nullable=False)
+    ext = Column(String(50))
+    size = Column(Integer, default=0)
+    modified_at = Column(DateTime)
+    indexed_at = Column(DateTime, default=datetime.utcnow)
+    error = Column(Text)
+
+
+class DirAggregate(Base):
+    """目录大小/数量缓存：files/dirs/size 为目录自身，total_* 为整棵子树；mtime 变化或为空时重新扫描该目录。"""
+    __tablename__ = "dir_aggregates"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String(1000), unique=True, nullable=False)
+    parent_path = Column(String(1000), index=True)
+    mtime = Column(Float)
+    files = Column(Integer, default=0)
+    dirs = Column(Integer, default=0)
+    size = Column(BigInteger, default=0)
+    total_files = Column(Integer, default=0)
+    total_dirs = Column(Integer, default=0)
+    total_size = Column(BigInteger, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FileHash(Base):
+    """重复文件检测的哈希缓存，(path, modified_at, size) 不变时直接复用；full_hash 只对部分哈希相同的文件计算。"""
+    __tablename__ = "file_hashes"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String(1000), unique=True, nullable=False)
+    size = Column(BigInteger, index=True)
+    modified_at = Column(DateTime)
+    partial_hash = Column(String(64))
+    full_hash = Column(String(64), index=True)
+    hashed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """分片上传会话：临时文件预分配在目标目录中，各分片按偏移写入，全部到齐后改名。"""
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String(32), primary_key=True)
+    filename = Column(String(500), nullable=False)
+    target_dir = Column(String(1000), nullable=False)
+    temp_path = Column(String(1000), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    total_parts = Column(Integer, nullable=False)
+    # 客户端给出的文件指纹（名称、大小、修改时间和首个分片的哈希），只有指纹相同才续传
+    fingerprint = Column(String(128))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadPart(Base):
+    __tablename__ = "upload_parts"
+    __table_args__ = (
+        Index("ix_upload_parts_session_part", "session_id", "part_number", unique=True),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String(32), nullable=False)
+    part_number = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+    checksum = Column(String(64))
+
+
 class Trash(Base):
     __tablename__ = "trash"
     
@@ -46,6 +133,15 @@ class Trash(Base):
     deleted_at = Column(DateTime, default=datetime.utcnow)
 
 
+class TrashPurge(Base):
+    """待永久删除的回收站条目；后台线程按批删除文件后连同 trash 记录一起清掉，重启后继续处理。"""
+    __tablename__ = "trash_purge_queue"
+    
+    trash_id = Column(Integer, primary_key=True)
+    reason = Column(String(20))
+    queued_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 class OperationLog(Base):
     __tablename__ = "operation_logs"
     
@@ -66,6 +162,86 @@ class SettingsDB(Base):
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all 不会给已存在的表补建索引和新增的可空列，这里逐个补上
+    _add_missing_columns()
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    _init_fts()
+
+
+def _add_missing_columns():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                    )
+
+
+def _init_fts():
+    # trigram 分词支持中文和任意子串匹配（SQLite 3.34+），老版本退回默认分词
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS file_contents USING fts5(content, tokenize='trigram')"
+            )
+    except OperationalError:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS file_contents USING fts5(content)")
+    _init_path_fts()
+
+
+# files.path 上的 trigram 索引，文件名子串搜索按它查 rowid，不用逐行扫 files；
+# 外部内容表不另存路径，由触发器随 files 的增删改同步
+_PATH_FTS_TRIGGERS = (
+    "CREATE TRIGGER IF NOT EXISTS files_path_ai AFTER INSERT ON files BEGIN "
+    "INSERT INTO file_paths (rowid, path) VALUES (new.id, new.path); END",
+    "CREATE TRIGGER IF NOT EXISTS files_path_ad AFTER DELETE ON files BEGIN "
+    "INSERT INTO file_paths (file_paths, rowid, path) VALUES ('delete', old.id, old.path); END",
+    "CREATE TRIGGER IF NOT EXISTS files_path_au AFTER UPDATE OF path ON files BEGIN "
+    "INSERT INTO file_paths (file_paths, rowid, path) VALUES ('delete', old.id, old.path); "
+    "INSERT INTO file_paths (rowid, path) VALUES (new.id, new.path); END",
+)
+
+_path_fts = None
+
+
+def _init_path_fts():
+    global _path_fts
+    try:
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_paths'"
+            ).first() is not None
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS file_paths "
+                "USING fts5(path, content='files', content_rowid='id', tokenize='trigram')"
+            )
+            for stmt in _PATH_FTS_TRIGGERS:
+                conn.exec_driver_sql(stmt)
+            if not exists:
+                # 已有的文件名索引一次性补进来
+                conn.exec_driver_sql("INSERT INTO file_paths (file_paths) VALUES ('rebuild')")
+        _path_fts = True
+    except OperationalError:
+        # 没有 trigram 分词（SQLite < 3.34）时文件名搜索退回逐行子串匹配
+        _path_fts = False
+
+
+def path_fts_available() -> bool:
+    global _path_fts
+    if _path_fts is None:
+        with engine.connect() as conn:
+            _path_fts = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_paths'"
+            ).first() is not None
+    return _path_fts
 
 
 def get_db():
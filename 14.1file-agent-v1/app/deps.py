@@ -1,3 +1,4 @@
+import hashlib
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Cookie
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -42,4 +43,16 @@ async def get_current_user_optional(
     try:
         return await get_current_user(credentials, session_token)
     except HTTPException:
-        return None
\ No newline at end of file
+        return None
+
+async def get_session_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+    session_token: Optional[str] = Cookie(None, alias="session_token")
+) -> str:
+    """
+    当前登录会话的标识。所有登录共用同一个用户名，
+    需要按浏览器/设备区分状态时用令牌的哈希作为键。
+    """
+    await get_current_user(credentials, session_token)
+    token = credentials.credentials if credentials else session_token
+    return hashlib.sha1(token.encode("utf-8")).hexdigest()
@@ -4,4 +4,5 @@ from routers.search import router as search_router
 from routers.preview import router as preview_router
 from routers.trash import router as trash_router
 from routers.agent import router as agent_router
-from routers.mounts import router as mounts_router
\ No newline at end of file
+from routers.mounts import router as mounts_router
+from routers.duplicates import router as duplicates_router
\ No newline at end of file
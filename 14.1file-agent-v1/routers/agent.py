@@ -3,14 +3,20 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import json
+import asyncio
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.deps import get_current_user
-from services.agent_service import AgentService, global_search_progress
+from app.database import get_db, SessionLocal
+from app.deps import get_session_id
+from app.concurrency import run_blocking
+from services.agent_service import AgentService
+from services.agent_session import AgentChannel, get_session
 
 router = APIRouter(prefix="/api/agent", tags=["AI助手"])
 
+# 持有流式对话的后台任务引用，避免被垃圾回收
+_background_tasks = set()
+
 
 class ChatRequest(BaseModel):
     message: str
@@ -20,25 +26,73 @@ class ChatRequest(BaseModel):
 @router.post("/chat")
 async def chat(
     request: ChatRequest,
-    user: str = Depends(get_current_user),
+    session_id: str = Depends(get_session_id),
     db: Session = Depends(get_db)
 ):
-    agent_service = AgentService(db)
-    result = agent_service.chat(request.message, request.context)
+    agent_service = AgentService(db, session_key=session_id)
+    result = await run_blocking("agent", agent_service.chat, request.message, request.context)
     return result
 
 
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    session_id: str = Depends(get_session_id)
+):
+    """
+    流式对话（SSE）。依次推送 progress（进度）、token（LLM 回复片段）、
+    file（搜索命中，未排序）事件，最后一个 done 事件带上与 /chat 相同的完整结果。
+    """
+    channel = AgentChannel()
+    
+    def worker():
+        db = SessionLocal()
+        try:
+            result = AgentService(db, session_key=session_id, channel=channel).chat(
+                request.message, request.context
+            )
+            channel.emit("done", **result)
+        except Exception as e:
+            channel.emit("error", message=f"处理失败: {str(e)[:100]}")
+        finally:
+            db.close()
+            channel.close()
+    
+    # 与 /chat 共用 agent 类别的并发名额；客户端断开后任务照常跑完，只是不再推送
+    task = asyncio.ensure_future(run_blocking("agent", worker))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    
+    async def generate():
+        try:
+            async for event in channel.events():
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            channel.detach()
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/progress")
-async def get_progress():
-    def generate():
-        import time
+async def get_progress(session_id: str = Depends(get_session_id)):
+    session = get_session(session_id)
+    
+    async def generate():
         last_msg = ""
         last_count = -1
         
         while True:
-            current_status = global_search_progress["status"]
-            current_msg = global_search_progress["message"]
-            current_count = global_search_progress["found_count"]
+            progress = session.progress
+            current_status = progress["status"]
+            current_msg = progress["message"]
+            current_count = progress["found_count"]
             
             if current_status != "idle" or last_msg != current_msg or last_count != current_count:
                 yield f"data: {json.dumps({'status': current_status, 'message': current_msg, 'found_count': current_count})}\n\n"
@@ -49,7 +103,7 @@ async def get_progress():
                 yield f"data: {json.dumps({'status': 'idle', 'message': '', 'found_count': 0})}\n\n"
                 break
             
-            time.sleep(0.5)
+            await asyncio.sleep(0.5)
     
     return StreamingResponse(
         generate(),
@@ -0,0 +1,56 @@
+import threading
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.deps import get_current_user
+from app.concurrency import run_blocking
+from services.dedup_service import DedupService, run_duplicate_scan
+
+router = APIRouter(prefix="/api/duplicates", tags=["重复文件"])
+
+
+class TrashDuplicatesRequest(BaseModel):
+    paths: List[str]
+
+
+@router.get("")
+async def list_duplicates(
+    path: Optional[str] = Query(default=None),
+    min_size: int = Query(default=1, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    roots = [path] if path else None
+    return await run_blocking("files", DedupService(db).list_groups, roots=roots, min_size=min_size, limit=limit)
+
+
+@router.get("/status")
+async def get_duplicate_status(
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_blocking("files", DedupService(db).get_status)
+
+
+@router.post("/scan")
+async def scan_duplicates(
+    path: Optional[str] = Query(default=None),
+    min_size: int = Query(default=1, ge=0),
+    user: str = Depends(get_current_user)
+):
+    roots = [path] if path else None
+    threading.Thread(target=run_duplicate_scan, args=(roots, min_size), daemon=True).start()
+    return {"success": True, "message": "重复文件扫描已在后台开始"}
+
+
+@router.post("/trash")
+async def trash_duplicates(
+    request: TrashDuplicatesRequest,
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_blocking("file_ops", DedupService(db).trash_duplicates, request.paths)
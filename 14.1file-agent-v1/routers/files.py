@@ -1,19 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Form, Request, Header
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import List, Optional
 from pathlib import Path
 import shutil
-import zipfile
-import tempfile
+import json
 import os
+import asyncio
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.deps import get_current_user
 from app.config import settings
+from app.concurrency import run_blocking
 from services.file_service import FileService
 from services.upload_service import UploadService
 from services.trash_service import TrashService
+from services.thumbnail_service import prefetch_dir
+from services.zip_stream import iter_zip, collect_entries
+from services.transfer_service import get_transfer
 
 router = APIRouter(prefix="/api/files", tags=["文件管理"])
 
@@ -25,19 +29,29 @@ async def list_files(
     page_size: int = Query(default=50, ge=1, le=200),
     sort_by: str = Query(default="name"),
     sort_order: str = Query(default="asc"),
+    cursor: Optional[str] = Query(default=None),
     user: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     file_service = FileService(db)
-    files, total, current_path = file_service.list_files(
-        path=path,
-        page=page,
-        page_size=page_size,
-        sort_by=sort_by,
-        sort_order=sort_order
-    )
     
-    breadcrumb = file_service.get_breadcrumb(current_path)
+    def load():
+        page_result = file_service.list_files_page(
+            path=path,
+            cursor=cursor,
+            page_size=page_size,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            page=page
+        )
+        return page_result, file_service.get_breadcrumb(page_result[2])
+    
+    try:
+        (files, total, current_path, next_cursor), breadcrumb = await run_blocking("files", load)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    prefetch_dir(current_path)
     
     return {
         "files": files,
@@ -45,7 +59,8 @@ async def list_files(
         "path": current_path,
         "breadcrumb": breadcrumb,
         "page": page,
-        "page_size": page_size
+        "page_size": page_size,
+        "next_cursor": next_cursor
     }
 
 
@@ -61,6 +76,82 @@ async def upload_files(
     return result
 
 
+@router.post("/upload/init")
+async def init_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    target_path: Optional[str] = Form(default=None),
+    part_size: Optional[int] = Form(default=None),
+    fingerprint: Optional[str] = Form(default=None),
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload_service = UploadService(db)
+    try:
+        return await run_blocking("file_ops", upload_service.init_upload, filename, size, target_path,
+                                  part_size, fingerprint)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/upload/{upload_id}")
+async def get_upload_status(
+    upload_id: str,
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload_service = UploadService(db)
+    try:
+        return await run_blocking("files", upload_service.get_upload_status, upload_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.put("/upload/{upload_id}/parts/{part_number}")
+async def upload_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    x_part_checksum: Optional[str] = Header(default=None),
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload_service = UploadService(db)
+    try:
+        return await upload_service.write_part(upload_id, part_number, request.stream(), x_part_checksum)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+
+@router.post("/upload/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload_service = UploadService(db)
+    try:
+        return {"success": True, "file": await run_blocking("file_ops", upload_service.complete_upload, upload_id)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/upload/{upload_id}")
+async def abort_upload(
+    upload_id: str,
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    upload_service = UploadService(db)
+    try:
+        await run_blocking("file_ops", upload_service.abort_upload, upload_id)
+        return {"success": True}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.post("/folder")
 async def create_folder(
     name: str = Form(...),
@@ -71,7 +162,7 @@ async def create_folder(
     file_service = FileService(db)
     
     try:
-        result = file_service.create_folder(name, parent_path)
+        result = await run_blocking("file_ops", file_service.create_folder, name, parent_path)
         return {"success": True, "folder": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -86,13 +177,13 @@ async def download_files(
     file_service = FileService(db)
     path_list = paths.split(",")
     
-    for p in path_list:
-        if not file_service._is_path_allowed(p):
-            raise HTTPException(status_code=403, detail="路径不允许访问")
+    allowed = await run_blocking("files", lambda: all(file_service._is_path_allowed(p) for p in path_list))
+    if not allowed:
+        raise HTTPException(status_code=403, detail="路径不允许访问")
     
     if len(path_list) == 1:
         file_path = Path(path_list[0])
-        if not file_path.exists():
+        if not await run_blocking("files", file_path.exists):
             raise HTTPException(status_code=404, detail="文件不存在")
         
         return FileResponse(
@@ -100,31 +191,11 @@ async def download_files(
             filename=file_path.name
         )
     
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
-    temp_file.close()
-    
-    try:
-        with zipfile.ZipFile(temp_file.name, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for path in path_list:
-                file_path = Path(path)
-                if file_path.exists():
-                    if file_path.is_file():
-                        zf.write(str(file_path), file_path.name)
-                    else:
-                        for root, dirs, files in os.walk(file_path):
-                            for file in files:
-                                file_full_path = Path(root) / file
-                                arcname = str(file_full_path.relative_to(file_path.parent))
-                                zf.write(str(file_full_path), arcname)
-        
-        return FileResponse(
-            path=temp_file.name,
-            filename="files.zip",
-            media_type="application/zip"
-        )
-    except Exception as e:
-        os.unlink(temp_file.name)
-        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        iter_zip(collect_entries(path_list)),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="files.zip"'}
+    )
 
 
 @router.delete("")
@@ -135,7 +206,7 @@ async def delete_files(
 ):
     path_list = paths.split(",")
     trash_service = TrashService(db)
-    result = trash_service.move_to_trash(path_list)
+    result = await run_blocking("file_ops", trash_service.move_to_trash, path_list)
     return result
 
 
@@ -150,7 +221,7 @@ async def move_files(
     file_service = FileService(db)
     
     try:
-        result = file_service.move(path_list, target)
+        result = await run_blocking("file_ops", file_service.move, path_list, target)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -167,12 +238,72 @@ async def copy_files(
     file_service = FileService(db)
     
     try:
-        result = file_service.copy(path_list, target)
+        result = await run_blocking("file_ops", file_service.copy, path_list, target)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/transfer")
+async def start_transfer(
+    action: str = Query(...),
+    paths: str = Query(...),
+    target: str = Query(...),
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    path_list = paths.split(",")
+    file_service = FileService(db)
+    
+    try:
+        return await run_blocking("file_ops", file_service.start_transfer, action, path_list, target)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _get_transfer_or_404(job_id: str):
+    job = get_transfer(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+
+@router.get("/transfers/{job_id}")
+async def get_transfer_status(job_id: str, user: str = Depends(get_current_user)):
+    return _get_transfer_or_404(job_id).snapshot()
+
+
+@router.get("/transfers/{job_id}/progress")
+async def get_transfer_progress(job_id: str, user: str = Depends(get_current_user)):
+    job = _get_transfer_or_404(job_id)
+    
+    # 异步生成器：等待期间不占线程，长时间打开的进度连接不会耗尽线程池
+    async def generate():
+        last_version = -1
+        
+        while True:
+            finished = job.finished
+            if job.version != last_version or finished:
+                snapshot = job.snapshot()
+                last_version = snapshot["version"]
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False)}\n\n"
+            if finished:
+                break
+            await asyncio.sleep(0.5)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream"
+    )
+
+
+@router.post("/transfers/{job_id}/cancel")
+async def cancel_transfer(job_id: str, user: str = Depends(get_current_user)):
+    job = _get_transfer_or_404(job_id)
+    job.cancel()
+    return {"success": True}
+
+
 @router.put("/rename")
 async def rename_file(
     path: str = Query(...),
@@ -183,7 +314,7 @@ async def rename_file(
     file_service = FileService(db)
     
     try:
-        result = file_service.rename(None, path, new_name)
+        result = await run_blocking("file_ops", file_service.rename, None, path, new_name)
         return {"success": True, "file": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -198,7 +329,7 @@ async def get_file_info(
     file_service = FileService(db)
     
     try:
-        info = file_service.get_file_info(path)
+        info = await run_blocking("files", file_service.get_file_info, path)
         return info
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -210,7 +341,7 @@ async def get_stats(
     db: Session = Depends(get_db)
 ):
     file_service = FileService(db)
-    return file_service.get_stats()
+    return await run_blocking("tree", file_service.get_stats)
 
 
 @router.get("/folders")
@@ -220,5 +351,20 @@ async def get_folders(
     db: Session = Depends(get_db)
 ):
     file_service = FileService(db)
-    folders = file_service.get_folders_tree(path)
-    return {"folders": folders}
\ No newline at end of file
+    folders = await run_blocking("tree", file_service.get_folders_tree, path)
+    return {"folders": folders}
+
+
+@router.get("/folders/children")
+async def get_folder_children(
+    path: str = Query(default=""),
+    cursor: Optional[str] = Query(default=None),
+    limit: int = Query(default=200, ge=1, le=1000),
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    file_service = FileService(db)
+    try:
+        return await run_blocking("files", file_service.get_folder_children, path, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -6,6 +6,7 @@ import os
 
 from app.config import settings
 from app.deps import get_current_user
+from app.concurrency import run_blocking
 
 router = APIRouter(prefix="/api/mounts", tags=["挂载点管理"])
 
@@ -17,8 +18,8 @@ class MountCreate(BaseModel):
     readonly: Optional[bool] = True
 
 
-@router.get("")
-async def get_mounts(user: str = Depends(get_current_user)):
+def _mounts_info() -> dict:
+    # 挂载点可能是网络盘，exists() 可能很慢，放在线程池里执行
     mounts = []
     for mount in settings.mounts:
         path = mount.get("path", "")
@@ -45,12 +46,17 @@ async def get_mounts(user: str = Depends(get_current_user)):
     }
 
 
+@router.get("")
+async def get_mounts(user: str = Depends(get_current_user)):
+    return await run_blocking("files", _mounts_info)
+
+
 @router.post("")
 async def add_mount(
     mount: MountCreate,
     user: str = Depends(get_current_user)
 ):
-    if not Path(mount.path).exists():
+    if not await run_blocking("files", Path(mount.path).exists):
         return {"success": False, "message": "路径不存在"}
     
     success = settings.add_mount(
@@ -79,11 +85,7 @@ async def remove_mount(
         return {"success": False, "message": "挂载点不存在"}
 
 
-@router.get("/check")
-async def check_path(
-    path: str = Query(...),
-    user: str = Depends(get_current_user)
-):
+def _check_path(path: str) -> dict:
     p = Path(path)
     
     if not p.exists():
@@ -100,6 +102,14 @@ async def check_path(
     }
 
 
+@router.get("/check")
+async def check_path(
+    path: str = Query(...),
+    user: str = Depends(get_current_user)
+):
+    return await run_blocking("files", _check_path, path)
+
+
 def _list_windows_drives() -> list:
     drives = []
     for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
@@ -112,11 +122,7 @@ def _list_windows_drives() -> list:
     return drives
 
 
-@router.get("/dirs")
-async def list_dirs(
-    path: str = "",
-    user: str = Depends(get_current_user)
-):
+def _list_dirs(path: str) -> dict:
     try:
         if not path:
             if os.name == "nt":
@@ -155,3 +161,11 @@ async def list_dirs(
         }
     except Exception:
         return {"path": path, "parent": "", "dirs": []}
+
+
+@router.get("/dirs")
+async def list_dirs(
+    path: str = "",
+    user: str = Depends(get_current_user)
+):
+    return await run_blocking("files", _list_dirs, path)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from pathlib import Path
 from urllib.parse import quote
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.deps import get_current_user
+from app.concurrency import run_blocking
 from services.preview_service import PreviewService
 
 router = APIRouter(prefix="/api/preview", tags=["预览"])
@@ -28,7 +29,7 @@ async def preview_file(
     base_url = get_base_url(request)
 
     file_path = Path(path)
-    if not file_path.exists():
+    if not await run_blocking("preview", file_path.exists):
         raise HTTPException(status_code=404, detail="文件不存在")
 
     ext = file_path.suffix.lower()
@@ -36,7 +37,7 @@ async def preview_file(
     encoded_path = quote(path, safe='')
 
     if preview_type == "text":
-        content = preview_service.get_text_preview(path)
+        content = await run_blocking("preview", preview_service.get_text_preview, path)
         return {
             "type": "text",
             "content": content,
@@ -44,20 +45,11 @@ async def preview_file(
         }
 
     elif preview_type == "image":
-        try:
-            img_data = preview_service.get_image_base64(path)
-            return {
-                "type": "image",
-                "data": img_data,
-                "filename": file_path.name
-            }
-        except Exception as e:
-            return {
-                "type": "image",
-                "url": f"{base_url}/api/preview/file?path={encoded_path}",
-                "filename": file_path.name,
-                "error": str(e)
-            }
+        return {
+            "type": "image",
+            "url": f"{base_url}/api/preview/file?path={encoded_path}",
+            "filename": file_path.name
+        }
 
     elif preview_type == "video":
         return {
@@ -90,13 +82,14 @@ async def preview_file(
 
 @router.get("/file")
 async def get_file(
+    request: Request,
     path: str = Query(...),
     user: str = Depends(get_current_user)
 ):
     preview_service = PreviewService()
     
     try:
-        return preview_service.get_file_response(path)
+        return await run_blocking("preview", preview_service.get_file_response, path, request.headers)
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except FileNotFoundError:
@@ -105,20 +98,19 @@ async def get_file(
 
 @router.get("/thumb")
 async def get_thumbnail(
+    request: Request,
     path: str = Query(...),
+    v: Optional[str] = Query(default=None),
     user: str = Depends(get_current_user)
 ):
     preview_service = PreviewService()
     
     try:
-        thumb_io = preview_service.get_image_thumbnail(path)
-        return StreamingResponse(
-            thumb_io,
-            media_type="image/jpeg"
-        )
+        return await run_blocking("preview", preview_service.get_thumbnail_response, path,
+                                  request.headers, bool(v))
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="文件不存在")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,10 +1,15 @@
+import threading
 from fastapi import APIRouter, Depends, Query
 from typing import List, Optional
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.deps import get_current_user
+from app.concurrency import run_blocking
 from services.search_service import SearchService
+from services.index_service import IndexService, run_incremental_index
+from services.watch_service import get_watcher_status
+from services.content_index_service import ContentIndexService, run_content_index
 
 router = APIRouter(prefix="/api/search", tags=["搜索"])
 
@@ -22,7 +27,38 @@ async def search_files(
     
     types_list = file_types.split(",") if file_types else None
     
-    results = search_service.search(
+    results = await run_blocking(
+        "search",
+        search_service.search,
+        keyword=keyword,
+        file_types=types_list,
+        max_results=max_results,
+        path=path
+    )
+    
+    return {
+        "results": results,
+        "total": len(results),
+        "keyword": keyword
+    }
+
+
+@router.get("/content")
+async def search_content(
+    keyword: str = Query(default=""),
+    file_types: Optional[str] = Query(default=None),
+    max_results: int = Query(default=50, ge=1, le=500),
+    path: Optional[str] = Query(default=None),
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    search_service = SearchService(db)
+    
+    types_list = file_types.split(",") if file_types else None
+    
+    results = await run_blocking(
+        "content_search",
+        search_service.search_content,
         keyword=keyword,
         file_types=types_list,
         max_results=max_results,
@@ -44,10 +80,40 @@ async def search_by_type(
     db: Session = Depends(get_db)
 ):
     search_service = SearchService(db)
-    results = search_service.search_by_type(file_type, max_results)
+    results = await run_blocking("search", search_service.search_by_type, file_type, max_results)
     
     return {
         "results": results,
         "total": len(results),
         "type": file_type
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/index")
+async def get_index_status(
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    status = await run_blocking("files", IndexService(db).get_status)
+    status["watcher"] = get_watcher_status()
+    return status
+
+
+@router.post("/index/refresh")
+async def refresh_index(user: str = Depends(get_current_user)):
+    threading.Thread(target=run_incremental_index, daemon=True).start()
+    return {"success": True, "message": "索引更新已在后台开始"}
+
+
+@router.get("/content/status")
+async def get_content_index_status(
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await run_blocking("files", ContentIndexService(db).get_status)
+
+
+@router.post("/content/refresh")
+async def refresh_content_index(user: str = Depends(get_current_user)):
+    threading.Thread(target=run_content_index, daemon=True).start()
+    return {"success": True, "message": "全文索引更新已在后台开始"}
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.deps import get_current_user
+from app.concurrency import run_blocking
 from services.trash_service import TrashService
 
 router = APIRouter(prefix="/api/trash", tags=["回收站"])
@@ -26,7 +27,7 @@ async def list_trash(
     db: Session = Depends(get_db)
 ):
     trash_service = TrashService(db)
-    return trash_service.list_trash(page=page, page_size=page_size)
+    return await run_blocking("files", trash_service.list_trash, page=page, page_size=page_size)
 
 
 @router.post("/restore")
@@ -36,10 +37,19 @@ async def restore_files(
     db: Session = Depends(get_db)
 ):
     trash_service = TrashService(db)
-    result = trash_service.restore(request.ids)
+    result = await run_blocking("file_ops", trash_service.restore, request.ids)
     return result
 
 
+@router.get("/purge")
+async def get_purge_status(
+    user: str = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    trash_service = TrashService(db)
+    return await run_blocking("files", trash_service.get_purge_status)
+
+
 @router.delete("")
 async def delete_permanently(
     request: DeleteRequest,
@@ -47,7 +57,7 @@ async def delete_permanently(
     db: Session = Depends(get_db)
 ):
     trash_service = TrashService(db)
-    result = trash_service.delete_permanently(request.ids)
+    result = await run_blocking("file_ops", trash_service.delete_permanently, request.ids)
     return result
 
 
@@ -57,5 +67,5 @@ async def empty_trash(
     db: Session = Depends(get_db)
 ):
     trash_service = TrashService(db)
-    result = trash_service.empty_trash()
+    result = await run_blocking("file_ops", trash_service.empty_trash)
     return result
\ No newline at end of file
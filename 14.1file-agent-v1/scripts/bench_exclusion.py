@@ -0,0 +1,128 @@
+"""
+目录排除匹配基准测试。
+
+在内存中生成一棵合成目录树（默认 100 万个目录，不落盘），分别用旧的逐条
+子串 + fnmatch 判断和预编译的 ExclusionMatcher 判断每个目录是否跳过，
+对比耗时并核对两者结论是否一致。
+
+用法（在项目根目录执行）:
+    python scripts/bench_exclusion.py
+    python scripts/bench_exclusion.py --dirs 200000 --patterns 40
+"""
+import argparse
+import fnmatch
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.exclusion import ExclusionMatcher  # noqa: E402
+
+
+BASE_PATTERNS = [
+    "node_modules", ".git", "__pycache__", ".venv", ".cache", "Program Files",
+    "$RECYCLE.BIN", "System Volume Information", "*.egg-info", "build/out",
+    "/proc", "/sys", "C:\\Windows", "D:\\Backup\\old",
+]
+
+WORDS = [
+    "docs", "src", "photos", "2023", "2024", "project", "report", "music", "video",
+    "work", "tmp", "data", "notes", "archive", "lib", "assets", "client", "server",
+]
+
+
+def legacy_skip(dirpath: str, excluded_dirs: List[str]) -> bool:
+    dirpath_lower = dirpath.lower()
+    dirname = os.path.basename(dirpath).lower()
+    for excl in excluded_dirs:
+        excl_lower = excl.lower()
+        if excl_lower in dirpath_lower:
+            return True
+        if fnmatch.fnmatch(dirname, excl_lower):
+            return True
+    return False
+
+
+def build_patterns(count: int) -> List[str]:
+    patterns = list(BASE_PATTERNS)
+    i = 0
+    while len(patterns) < count:
+        patterns.append(f"skip_{i:03d}")
+        i += 1
+    return patterns[:count]
+
+
+def build_tree(dirs: int, seed: int) -> List[Tuple[str, str]]:
+    """按广度优先生成 (父路径, 目录名)；约 2% 的目录名取自排除列表。"""
+    rng = random.Random(seed)
+    special = ["node_modules", ".git", "__pycache__", "pkg.egg-info", "Program Files", "build", "out"]
+    roots = ["/home/user", "/proc", "C:\\Users\\me", "D:\\Backup"]
+    frontier = list(roots)
+    items = []
+    while len(items) < dirs:
+        parent = frontier[rng.randrange(len(frontier))]
+        if rng.random() < 0.02:
+            name = rng.choice(special)
+        else:
+            name = f"{rng.choice(WORDS)}_{rng.randrange(1000)}"
+        sep = "\\" if parent[1:2] == ":" else "/"
+        items.append((parent, name))
+        frontier.append(parent + sep + name)
+        if len(frontier) > 50000:
+            frontier = frontier[-20000:]
+    return items
+
+
+def timed(label: str, func, items) -> List[bool]:
+    start = time.perf_counter()
+    decisions = [func(parent, name) for parent, name in items]
+    elapsed = time.perf_counter() - start
+    per_dir = elapsed / len(items) * 1e9
+    print(f"{label:<18} {elapsed:8.2f}s  {per_dir:8.0f} ns/目录  跳过 {sum(decisions)}")
+    return decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目录排除匹配基准")
+    parser.add_argument("--dirs", type=int, default=1_000_000)
+    parser.add_argument("--patterns", type=int, default=len(BASE_PATTERNS))
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    patterns = build_patterns(args.patterns)
+    items = build_tree(args.dirs, args.seed)
+    # 路径在生成阶段拼好，不计入各方案耗时
+    items = [(parent + ("\\" if parent[1:2] == ":" else "/") + name, name) for parent, name in items]
+
+    start = time.perf_counter()
+    matcher = ExclusionMatcher(patterns)
+    print(f"{len(items)} 个目录，{len(patterns)} 条排除规则，编译 {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    legacy = timed("逐条匹配", lambda path, name: legacy_skip(path, patterns), items)
+    child = timed("match_child", matcher.match_child, items)
+    full = timed("match_path", lambda path, name: matcher.match_path(path), items)
+
+    # 预期的差异：绝对路径改为按路径段前缀匹配（/proc 不再误伤 /procfs），
+    # 路径片段不再区分分隔符（build/out 也能排除 Windows 下的 build\out）
+    differ = sum(1 for a, b in zip(legacy, full) if a != b)
+    print(f"match_path 与旧实现结论不同: {differ} 个")
+    # 自上而下遍历时被跳过的目录不会再进入，match_child 只需在未跳过的父目录下与 match_path 一致
+    mismatched = 0
+    skipped_parents = set()
+    for (path, name), c, f in zip(items, child, full):
+        parent = path[:-len(name) - 1]
+        if parent in skipped_parents:
+            skipped_parents.add(path)
+            continue
+        if c:
+            skipped_parents.add(path)
+        if c != f:
+            mismatched += 1
+    print(f"match_child 与 match_path 在遍历可达目录上不一致: {mismatched} 个")
+
+
+if __name__ == "__main__":
+    main()
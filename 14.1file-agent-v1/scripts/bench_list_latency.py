@@ -0,0 +1,107 @@
+"""
+列目录延迟基准测试。
+
+先测空闲时 /api/files 的延迟，再在后台持续发起大范围搜索的同时重复测一遍，
+对比两组的 p50/p95/p99。阻塞调用都在线程池中执行时，两组的 p99 应该接近。
+
+用法（先启动服务）:
+    python scripts/bench_list_latency.py --password 你的密码 --keyword a
+    python scripts/bench_list_latency.py --search-endpoint /api/search/content --keyword 报告
+"""
+import argparse
+import statistics
+import threading
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure_list(client: httpx.Client, path: str, requests: int, interval: float) -> List[float]:
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        res = client.get("/api/files", params={"path": path, "page_size": 50})
+        res.raise_for_status()
+        samples.append((time.perf_counter() - start) * 1000)
+        if interval:
+            time.sleep(interval)
+    return samples
+
+
+def search_load(base_url: str, cookies, endpoint: str, keyword: str, max_results: int,
+                stop: threading.Event, counter: List[int]):
+    with httpx.Client(base_url=base_url, cookies=cookies, timeout=600) as client:
+        while not stop.is_set():
+            try:
+                client.get(endpoint, params={"keyword": keyword, "max_results": max_results})
+                counter[0] += 1
+            except httpx.HTTPError:
+                pass
+
+
+def report(name: str, samples: List[float]):
+    print(f"{name:<12} n={len(samples):<5} "
+          f"p50={percentile(samples, 50):8.1f}ms  "
+          f"p95={percentile(samples, 95):8.1f}ms  "
+          f"p99={percentile(samples, 99):8.1f}ms  "
+          f"max={max(samples):8.1f}ms  "
+          f"mean={statistics.mean(samples):8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="搜索负载下的列目录延迟基准")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--path", default="", help="要反复列出的目录，默认主目录")
+    parser.add_argument("--keyword", default="a", help="搜索关键词，越宽泛负载越重")
+    parser.add_argument("--search-endpoint", default="/api/search")
+    parser.add_argument("--max-results", type=int, default=500)
+    parser.add_argument("--search-clients", type=int, default=8, help="并发搜索的客户端数")
+    parser.add_argument("--requests", type=int, default=200, help="每组列目录请求数")
+    parser.add_argument("--interval", type=float, default=0.01, help="两次列目录请求之间的间隔（秒）")
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.url, timeout=60) as client:
+        client.post("/api/auth/login", json={"password": args.password}).raise_for_status()
+
+        measure_list(client, args.path, 10, 0)
+        idle = measure_list(client, args.path, args.requests, args.interval)
+
+        stop = threading.Event()
+        counter = [0]
+        workers = [
+            threading.Thread(
+                target=search_load,
+                args=(args.url, client.cookies, args.search_endpoint, args.keyword,
+                      args.max_results, stop, counter),
+                daemon=True
+            )
+            for _ in range(args.search_clients)
+        ]
+        for worker in workers:
+            worker.start()
+        # 等搜索请求真正占上线程再开始测
+        time.sleep(1)
+        loaded = measure_list(client, args.path, args.requests, args.interval)
+        stop.set()
+
+        print(f"列目录: {args.url}/api/files?path={args.path or '(主目录)'}")
+        print(f"搜索负载: {args.search_clients} 个客户端持续请求 {args.search_endpoint}?keyword={args.keyword}，"
+              f"测试期间完成 {counter[0]} 次")
+        report("空闲", idle)
+        report("搜索进行中", loaded)
+
+        health = client.get("/api/health").json()
+        if "workers" in health:
+            print(f"线程池: {health['workers']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+核对各项目里复制的公共模块是否一致。
+
+ranking.py、exclusion.py 在几个独立部署的项目里各放一份（互不导入），
+改了其中一份忘记同步时这里会列出不一致的文件并以非零状态退出。
+
+用法（在项目根目录执行）:
+    python scripts/check_vendored.py
+"""
+import hashlib
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VENDORED = {
+    "ranking.py": [
+        "14.1file-agent-v1/services/ranking.py",
+        "14file-agent-v0/ranking.py",
+    ],
+    "exclusion.py": [
+        "14.1file-agent-v1/services/exclusion.py",
+        "14file-agent-v0/exclusion.py",
+        "tools(不好用)/lib/exclusion.py",
+    ],
+}
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main() -> int:
+    ok = True
+    for name, copies in VENDORED.items():
+        digests = {}
+        for rel in copies:
+            path = os.path.join(REPO_ROOT, rel)
+            digests[rel] = _digest(path) if os.path.exists(path) else "缺失"
+        if len(set(digests.values())) == 1:
+            print(f"{name}: {len(copies)} 份一致")
+            continue
+        ok = False
+        print(f"{name}: 各份内容不一致")
+        for rel, digest in digests.items():
+            print(f"  {digest[:12]}  {rel}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
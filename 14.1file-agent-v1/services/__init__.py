@@ -3,4 +3,7 @@ from services.upload_service import UploadService
 from services.search_service import SearchService
 from services.preview_service import PreviewService
 from services.trash_service import TrashService
-from services.agent_service import AgentService
\ No newline at end of file
+from services.agent_service import AgentService
+from services.index_service import IndexService
+from services.content_index_service import ContentIndexService
+from services.dedup_service import DedupService
\ No newline at end of file
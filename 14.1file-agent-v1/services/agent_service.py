@@ -1,5 +1,6 @@
 import json
 import os
+import re
 import smtplib
 import zipfile
 import tempfile
@@ -15,13 +16,8 @@ import httpx
 from openai import OpenAI
 
 from app.config import settings
-
-
-global_search_progress = {
-    "status": "idle",
-    "message": "",
-    "found_count": 0
-}
+from services.agent_session import AgentChannel, get_session, llm_cache
+from services.intent_parser import parse_intent
 
 
 SYSTEM_PROMPT = """你是私人文件系统的智能助手，帮助用户管理文件。请用JSON格式输出，不要输出其他内容。
@@ -52,11 +48,71 @@ SYSTEM_PROMPT = """你是私人文件系统的智能助手，帮助用户管理
 - 只输出JSON，不要任何其他内容"""
 
 
+class _ReplyStream:
+    """从流式返回的 JSON 片段中增量取出 "reply" 字段的文本，用于逐字显示聊天回复。"""
+    
+    _START = re.compile(r'"reply"\s*:\s*"')
+    _ESCAPES = {"n": "\n", "t": "\t", "r": "", "b": "", "f": ""}
+    
+    def __init__(self):
+        self.buf = ""
+        self.pos = None
+        self.finished = False
+    
+    def feed(self, delta: str) -> str:
+        self.buf += delta
+        if self.finished:
+            return ""
+        if self.pos is None:
+            match = self._START.search(self.buf)
+            if not match:
+                return ""
+            self.pos = match.end()
+        
+        buf = self.buf
+        out = []
+        i = self.pos
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.finished = True
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            # 转义序列不完整时等下一段
+            if i + 1 >= len(buf):
+                break
+            if buf[i + 1] == "u":
+                if i + 6 > len(buf):
+                    break
+                try:
+                    out.append(chr(int(buf[i + 2:i + 6], 16)))
+                except ValueError:
+                    pass
+                i += 6
+                continue
+            out.append(self._ESCAPES.get(buf[i + 1], buf[i + 1]))
+            i += 2
+        self.pos = i
+        return "".join(out)
+
+
 class AgentService:
-    def __init__(self, db: Session):
+    """
+    AI 助手。
+    
+    进度写在所属会话上，互不干扰；传入 channel 时额外把进度、LLM 输出和搜索命中
+    作为事件实时推送给流式接口。
+    """
+    
+    def __init__(self, db: Session, session_key: Optional[str] = None,
+                 channel: Optional[AgentChannel] = None):
         self.db = db
         self.root_path = Path(settings.root_path)
-        self.last_results: List[dict] = []
+        self.session = get_session(session_key or "default")
+        self.channel = channel
         
         if settings.llm_api_key:
             self.client = OpenAI(
@@ -67,51 +123,46 @@ class AgentService:
         else:
             self.client = None
     
+    def _set_progress(self, status: str, message: str = "", found_count: int = 0):
+        progress = {"status": status, "message": message, "found_count": found_count}
+        self.session.progress = progress
+        if self.channel:
+            self.channel.emit("progress", **progress)
+    
     def chat(self, user_message: str, context: Optional[dict] = None) -> dict:
-        global global_search_progress
-        
-        if not self.client:
-            return {
-                "reply": "LLM API 未配置，请在设置中配置 API Key",
-                "action": "chat",
-                "files": [],
-                "result": None
-            }
-        
-        global_search_progress["status"] = "analyzing"
-        global_search_progress["message"] = "正在理解您的需求..."
-        global_search_progress["found_count"] = 0
-        
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-        
-        context_msg = ""
-        if self.last_results:
-            file_list = ", ".join([f"[{i}]{r['name']}" for i, r in enumerate(self.last_results[:5])])
-            context_msg = f"[上次搜索结果: {file_list}]\n\n"
-        
+        try:
+            return self._chat(user_message, context)
+        finally:
+            last = self.session.progress
+            self._set_progress("idle", last["message"], last["found_count"])
+    
+    def _chat(self, user_message: str, context: Optional[dict] = None) -> dict:
+        session = self.session
         if context and context.get("current_path"):
-            context_msg += f"[当前目录: {context['current_path']}]\n\n"
-        
-        messages.append({"role": "user", "content": context_msg + user_message})
+            session.current_path = context["current_path"]
+        
+        # 常见的搜索/浏览请求本地直接解析，不经过 LLM
+        parsed = parse_intent(user_message, session.current_path, str(self.root_path))
+        source = "local"
+        
+        if parsed is None:
+            if not self.client:
+                return {
+                    "reply": "LLM API 未配置，请在设置中配置 API Key",
+                    "action": "chat",
+                    "files": [],
+                    "result": None
+                }
+            
+            parsed, source = self._ask_llm(user_message)
+            if parsed is None:
+                return {
+                    "reply": source,
+                    "action": "chat",
+                    "files": [],
+                    "result": None
+                }
         
-        try:
-            response = self.client.chat.completions.create(
-                model=settings.llm_model,
-                messages=messages,
-                temperature=0.1,
-                max_tokens=500
-            )
-            raw = response.choices[0].message.content.strip()
-        except Exception as e:
-            global_search_progress["status"] = "idle"
-            return {
-                "reply": f"AI 服务暂时不可用: {str(e)[:100]}",
-                "action": "chat",
-                "files": [],
-                "result": None
-            }
-        
-        parsed = self._parse_response(raw)
         action = parsed.get("action", "chat")
         
         result = None
@@ -120,9 +171,10 @@ class AgentService:
         
         if action == "search":
             files, reply = self._execute_search(parsed.get("search_params", {}))
-            self.last_results = files
+            session.last_results = files
         elif action == "browse":
             result, reply = self._execute_browse(parsed.get("browse_params", {}))
+            session.current_path = result["path"]
         elif action == "delete":
             result, reply = self._execute_delete(parsed.get("delete_params", {}))
         elif action == "move":
@@ -136,15 +188,80 @@ class AgentService:
         else:
             reply = parsed.get("reply", "我可以帮你管理文件，比如搜索、移动、删除等操作。")
         
-        global_search_progress["status"] = "idle"
-        
         return {
             "reply": reply,
             "action": action,
             "files": files,
-            "result": result
+            "result": result,
+            "source": source
         }
     
+    def _ask_llm(self, user_message: str) -> tuple:
+        """
+        调用 LLM 解析意图，返回 (解析结果, 来源)；失败时返回 (None, 错误提示)。
+        
+        提示词连同上下文一起作为缓存键，同一会话状态下重复的问题直接复用上次的输出。
+        """
+        session = self.session
+        
+        self._set_progress("analyzing", "正在理解您的需求...")
+        
+        context_msg = ""
+        if session.last_results:
+            file_list = ", ".join([f"[{i}]{r['name']}" for i, r in enumerate(session.last_results[:5])])
+            context_msg = f"[上次搜索结果: {file_list}]\n\n"
+        
+        if session.current_path:
+            context_msg += f"[当前目录: {session.current_path}]\n\n"
+        
+        cache_key = llm_cache.make_key(settings.llm_model, SYSTEM_PROMPT, context_msg, user_message)
+        raw = llm_cache.get(cache_key)
+        if raw is not None:
+            return self._parse_response(raw), "cache"
+        
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": context_msg + user_message}
+        ]
+        
+        try:
+            if self.channel:
+                raw = self._stream_llm(messages)
+            else:
+                response = self.client.chat.completions.create(
+                    model=settings.llm_model,
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=500
+                )
+                raw = response.choices[0].message.content.strip()
+        except Exception as e:
+            return None, f"AI 服务暂时不可用: {str(e)[:100]}"
+        
+        llm_cache.put(cache_key, raw)
+        return self._parse_response(raw), "llm"
+    
+    def _stream_llm(self, messages: List[dict]) -> str:
+        """流式调用 LLM，边收边把聊天回复推给前端，返回完整输出。"""
+        stream = self.client.chat.completions.create(
+            model=settings.llm_model,
+            messages=messages,
+            temperature=0.1,
+            max_tokens=500,
+            stream=True
+        )
+        reply_stream = _ReplyStream()
+        parts = []
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            parts.append(delta)
+            text = reply_stream.feed(delta)
+            if text:
+                self.channel.emit("token", text=text)
+        return "".join(parts).strip()
+    
     def _parse_response(self, raw: str) -> dict:
         raw = raw.strip()
         
@@ -188,19 +305,21 @@ class AgentService:
         
         search_service = SearchService(self.db)
         
-        global_search_progress["status"] = "searching"
-        global_search_progress["message"] = f"正在搜索: {keyword or '全部文件'}..."
+        self._set_progress("searching", f"正在搜索: {keyword or '全部文件'}...")
         
         def on_progress(msg, count):
-            global_search_progress["message"] = msg
-            global_search_progress["found_count"] = count
+            self._set_progress("searching", msg, count)
+        
+        def on_result(item):
+            self.channel.emit("file", file=item)
         
         files = search_service.search(
             keyword=keyword,
             file_types=file_types,
             max_results=max_results,
             progress_callback=on_progress,
-            search_all_mounts=search_all
+            search_all_mounts=search_all,
+            on_result=on_result if self.channel else None
         )
         
         if files:
@@ -319,8 +438,8 @@ class AgentService:
         if not recipient:
             return None, "请指定收件人邮箱"
         
-        if not paths and self.last_results:
-            paths = [f["path"] for f in self.last_results[:5]]
+        if not paths and self.session.last_results:
+            paths = [f["path"] for f in self.session.last_results[:5]]
         
         if not paths:
             return None, "请指定要发送的文件"
@@ -365,4 +484,4 @@ class AgentService:
         return True, f"已发送 {len(file_paths)} 个文件到 {recipient}"
     
     def get_progress(self) -> dict:
-        return global_search_progress.copy()
\ No newline at end of file
+        return self.session.progress.copy()
\ No newline at end of file
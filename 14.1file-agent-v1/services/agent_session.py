@@ -0,0 +1,123 @@
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+
+_MAX_SESSIONS = 64
+_SESSION_TTL = 4 * 3600
+
+
+class AgentSession:
+    """单个登录会话跨请求保留的助手状态：上次搜索结果、当前所在目录和最近一次请求的进度。"""
+
+    def __init__(self):
+        self.last_results: List[dict] = []
+        self.current_path: Optional[str] = None
+        self.progress = {"status": "idle", "message": "", "found_count": 0}
+        self.touched = time.monotonic()
+
+
+_sessions: "OrderedDict[str, AgentSession]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def get_session(key: str) -> AgentSession:
+    now = time.monotonic()
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None or now - session.touched > _SESSION_TTL:
+            session = AgentSession()
+            _sessions[key] = session
+        session.touched = now
+        _sessions.move_to_end(key)
+        while len(_sessions) > _MAX_SESSIONS:
+            _sessions.popitem(last=False)
+        return session
+
+
+class AgentChannel:
+    """
+    一次流式对话的事件通道，须在事件循环中创建。
+
+    处理线程调用 emit() 写入事件，经 call_soon_threadsafe 投进 asyncio 队列，
+    SSE 响应在事件循环里 await 读出，不占线程池；客户端断开后 detach()，
+    之后的事件直接丢弃，处理线程不会因为没人读而阻塞。
+    """
+
+    def __init__(self, keepalive: float = 15):
+        self.keepalive = keepalive
+        self.attached = True
+        self._loop = asyncio.get_running_loop()
+        self._queue: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+
+    def _put(self, item: Optional[dict]):
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+        except RuntimeError:
+            # 事件循环已关闭（服务退出中），没人会再读
+            pass
+
+    def emit(self, event: str, **data):
+        if self.attached:
+            self._put({"type": event, **data})
+
+    def close(self):
+        self._put(None)
+
+    def detach(self):
+        self.attached = False
+
+    async def events(self):
+        """逐个产出事件，通道关闭时结束；长时间没有事件时产出 None，用于发送心跳。"""
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=self.keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is None:
+                return
+            yield item
+
+
+class ResponseCache:
+    """带过期时间的 LRU 缓存，相同的提示词（含上下文）直接复用上次的模型输出。"""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        h = hashlib.sha1()
+        for part in parts:
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+llm_cache = ResponseCache()
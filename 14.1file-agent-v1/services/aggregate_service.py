@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import DirAggregate
+from services.index_service import path_range
+from services.walker import scan_dir
+
+
+# 每隔这么久对子树做一次完整校验，兜住没经过 invalidate() 的深层变化（如外部程序改动）
+_FULL_CHECK_SECONDS = 300
+
+_active_cond = threading.Condition()
+_active_roots: Set[str] = set()
+_verified_at: Dict[str, float] = {}
+
+
+def _overlaps(a: str, b: str) -> bool:
+    return a == b or a.startswith(b.rstrip("\\/") + os.sep) or b.startswith(a.rstrip("\\/") + os.sep)
+
+
+@contextmanager
+def _path_lock(root: str):
+    """按路径加锁：只有互为祖先/子孙的刷新才需要排队，不相干的目录可以同时刷新。"""
+    with _active_cond:
+        while any(_overlaps(root, p) for p in _active_roots):
+            _active_cond.wait()
+        _active_roots.add(root)
+    try:
+        yield
+    finally:
+        with _active_cond:
+            _active_roots.discard(root)
+            _active_cond.notify_all()
+
+
+def _full_check_due(root: str) -> bool:
+    """root 自身或其祖先最近没做过完整校验时返回 True；顺带清掉过期的记录。"""
+    now = time.monotonic()
+    due = True
+    for path, at in list(_verified_at.items()):
+        if now - at >= _FULL_CHECK_SECONDS:
+            _verified_at.pop(path, None)
+        elif _overlaps(root, path) and len(path) <= len(root):
+            due = False
+    return due
+
+
+def skip_hidden(path: str, name: str) -> bool:
+    """统计口径：跳过隐藏目录，回收站除外。"""
+    return name.startswith('.') and name != '.trash'
+
+
+class AggregateService:
+    """
+    目录大小/数量缓存。
+
+    读取时从根往下检查目录 mtime：mtime 变化（或被 invalidate() 置空）的目录重新
+    scandir 并继续检查其子目录，mtime 未变的目录连同子树直接沿用缓存，不再逐个 stat。
+    深层目录的变化不会改变上层 mtime，所以 invalidate() 会把变化所在目录及其全部
+    祖先一起置空；没经过 invalidate() 的变化（外部程序改动）靠每 _FULL_CHECK_SECONDS
+    一次的完整校验发现。合计值只沿发生变化的目录向上重算到根。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _check(self, path: str, cached_mtime: Optional[float]):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime == cached_mtime:
+            return path, None
+        info, _ = scan_dir(path, skip_hidden)
+        return path, info
+
+    def _drop_subtree(self, path: str, rows: Dict[str, DirAggregate]):
+        self.db.query(DirAggregate).filter(
+            or_(DirAggregate.path == path, path_range(DirAggregate.path, path))
+        ).delete(synchronize_session=False)
+        prefix = path + os.sep
+        for p in [p for p in rows if p == path or p.startswith(prefix)]:
+            del rows[p]
+
+    def _sum_children(self, row: DirAggregate, subs: List[DirAggregate]):
+        row.total_files = (row.files or 0) + sum(c.total_files or 0 for c in subs)
+        row.total_dirs = (row.dirs or 0) + sum(c.total_dirs or 0 for c in subs)
+        row.total_size = (row.size or 0) + sum(c.total_size or 0 for c in subs)
+
+    def _rollup_ancestors(self, path: str):
+        """只刷新了某棵子树时，把新合计继续向上传给已缓存的祖先目录。"""
+        self.db.flush()
+        while True:
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            row = self.db.query(DirAggregate).filter(DirAggregate.path == parent).first()
+            if row is None:
+                break
+            self._sum_children(row, self.db.query(DirAggregate).filter(DirAggregate.parent_path == parent).all())
+            path = parent
+
+    def refresh(self, root: str) -> Tuple[Dict[str, DirAggregate], Dict[str, List[str]]]:
+        """校验并更新 root 子树的缓存，返回 (path -> 记录, path -> 子目录列表)。"""
+        root = str(root).rstrip("\\/") or str(root)
+        with _path_lock(root):
+            full = _full_check_due(root)
+            rows = {r.path: r for r in self.db.query(DirAggregate).filter(
+                or_(DirAggregate.path == root, path_range(DirAggregate.path, root))
+            )}
+            children = defaultdict(list)
+            for path in rows:
+                if path != root:
+                    children[os.path.dirname(path)].append(path)
+
+            dirty = set()
+            frontier = [root]
+            with ThreadPoolExecutor(max_workers=max(1, settings.walk_workers)) as pool:
+                while frontier:
+                    checks = pool.map(
+                        lambda p: self._check(p, rows[p].mtime if p in rows else None), frontier
+                    )
+                    frontier = []
+                    for path, info in checks:
+                        if info is None:
+                            if full:
+                                frontier.extend(children.get(path, ()))
+                            continue
+
+                        row = rows.get(path)
+                        if row is None:
+                            row = DirAggregate(path=path, parent_path=os.path.dirname(path))
+                            self.db.add(row)
+                            rows[path] = row
+                        row.mtime = info["mtime"]
+                        row.files = info["files"]
+                        row.dirs = info["dirs"]
+                        row.size = info["size"]
+                        row.updated_at = datetime.utcnow()
+                        dirty.add(path)
+
+                        for gone in set(children.get(path, ())) - set(info["subdirs"]):
+                            self._drop_subtree(gone, rows)
+                        children[path] = list(info["subdirs"])
+                        frontier.extend(info["subdirs"])
+
+            # 只重算变化目录及其祖先的合计
+            affected = set()
+            for path in dirty:
+                while path not in affected:
+                    affected.add(path)
+                    if path == root:
+                        break
+                    path = os.path.dirname(path)
+
+            for path in sorted(affected, key=lambda p: p.count(os.sep), reverse=True):
+                row = rows.get(path)
+                if row is None:
+                    continue
+                self._sum_children(row, [rows[c] for c in children.get(path, ()) if c in rows])
+
+            if dirty:
+                self._rollup_ancestors(root)
+            self.db.commit()
+            if full:
+                _verified_at[root] = time.monotonic()
+        return rows, children
+
+    def get_totals(self, path: str) -> dict:
+        root = str(path).rstrip("\\/") or str(path)
+        rows, _ = self.refresh(root)
+        row = rows.get(root)
+        if row is None:
+            return {"files": 0, "dirs": 0, "size": 0}
+        return {"files": row.total_files or 0, "dirs": row.total_dirs or 0, "size": row.total_size or 0}
+
+    def invalidate(self, paths: List[str]):
+        """
+        把变化所在目录及其全部祖先标记为需要重扫：文件内容变化不会改变目录 mtime，
+        深层目录的增删也不会改变上层目录的 mtime。
+        """
+        parents = set()
+        for p in paths:
+            parent = os.path.dirname(str(p))
+            while parent not in parents:
+                parents.add(parent)
+                up = os.path.dirname(parent)
+                if up == parent:
+                    break
+                parent = up
+        parents = list(parents)
+        for i in range(0, len(parents), 500):
+            self.db.query(DirAggregate).filter(
+                DirAggregate.path.in_(parents[i:i + 500])
+            ).update({DirAggregate.mtime: None}, synchronize_session=False)
@@ -0,0 +1,188 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import File, ContentIndex, SessionLocal
+from services.extractors import SUPPORTED_EXTS, extract_job
+
+
+_CHUNK = 500
+_COMMIT_EVERY = 50
+_SNIPPET_TOKENS = 12
+
+
+def _range_params(prefix: str):
+    base = prefix.rstrip("\\/") + os.sep
+    return base, base[:-1] + chr(ord(os.sep) + 1)
+
+
+class ContentIndexService:
+    """
+    基于 SQLite FTS5 的全文索引。
+
+    候选文件来自文件名索引（files 表），按 (path, modified_at, size) 判断是否需要
+    重新提取；提取在进程池中进行，正文写入 FTS5 表 file_contents。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.max_size = settings.content_max_size_mb * 1024 * 1024
+
+    def _pending(self) -> List[tuple]:
+        return self.db.query(File.path, File.ext, File.size, File.modified_at).outerjoin(
+            ContentIndex, ContentIndex.path == File.path
+        ).filter(
+            File.is_dir == False,
+            File.ext.in_(SUPPORTED_EXTS),
+            File.size <= self.max_size,
+            or_(
+                ContentIndex.id == None,
+                ContentIndex.modified_at != File.modified_at,
+                ContentIndex.size != File.size
+            )
+        ).all()
+
+    def _purge_stale(self) -> int:
+        """删除文件名索引里已不存在的文件对应的正文。"""
+        ids = [cid for (cid,) in self.db.query(ContentIndex.id).outerjoin(
+            File, File.path == ContentIndex.path
+        ).filter(File.id == None)]
+        for i in range(0, len(ids), _CHUNK):
+            chunk = ids[i:i + _CHUNK]
+            self.db.execute(
+                text(f"DELETE FROM file_contents WHERE rowid IN ({','.join(str(cid) for cid in chunk)})")
+            )
+            self.db.query(ContentIndex).filter(ContentIndex.id.in_(chunk)).delete(synchronize_session=False)
+        self.db.commit()
+        return len(ids)
+
+    def _store(self, path: str, ext: str, size: int, modified_at: datetime, content: str, error: str):
+        row = self.db.query(ContentIndex).filter(ContentIndex.path == path).first()
+        if row is None:
+            row = ContentIndex(path=path)
+            self.db.add(row)
+        row.ext = ext
+        row.size = size
+        row.modified_at = modified_at
+        row.indexed_at = datetime.now()
+        row.error = error or None
+        self.db.flush()
+
+        self.db.execute(text("DELETE FROM file_contents WHERE rowid = :id"), {"id": row.id})
+        if content:
+            self.db.execute(
+                text("INSERT INTO file_contents (rowid, content) VALUES (:id, :content)"),
+                {"id": row.id, "content": content}
+            )
+
+    def refresh(self) -> dict:
+        removed = self._purge_stale()
+        pending = self._pending()
+        if not pending:
+            return {"extracted": 0, "failed": 0, "removed": removed}
+
+        meta = {path: (ext, size, modified_at) for path, ext, size, modified_at in pending}
+        paths = list(meta)
+        extracted = 0
+        failed = 0
+
+        with ProcessPoolExecutor(max_workers=max(1, settings.content_index_workers)) as pool:
+            for i in range(0, len(paths), _CHUNK):
+                for path, content, error in pool.map(extract_job, paths[i:i + _CHUNK], chunksize=8):
+                    ext, size, modified_at = meta[path]
+                    self._store(path, ext, size, modified_at, content, error)
+                    if error:
+                        failed += 1
+                    else:
+                        extracted += 1
+                    if (extracted + failed) % _COMMIT_EVERY == 0:
+                        self.db.commit()
+                self.db.commit()
+
+        return {"extracted": extracted, "failed": failed, "removed": removed}
+
+    def search(self, keyword: str, file_types: Optional[List[str]] = None,
+               max_results: int = 50, roots: Optional[List[str]] = None) -> List[dict]:
+        """
+        全文检索，返回 [{"path", "ext", "snippet"}]。
+
+        trigram 分词要求词长至少 3 个字符，更短的词改用 instr 逐行过滤
+        （trigram 表上的 LIKE 对过短的模式不返回结果）。
+        """
+        terms = [t for t in keyword.split() if t]
+        if not terms:
+            return []
+
+        match_terms = [t for t in terms if len(t) >= 3]
+        short_terms = [t for t in terms if len(t) < 3]
+
+        where = []
+        params = {"limit": max_results}
+
+        if match_terms:
+            params["match"] = " ".join('"' + t.replace('"', '""') + '"' for t in match_terms)
+            where.append("file_contents MATCH :match")
+        for i, term in enumerate(short_terms):
+            params[f"short{i}"] = term.lower()
+            where.append(f"instr(lower(file_contents.content), :short{i}) > 0")
+
+        if file_types:
+            names = []
+            for i, ft in enumerate(file_types):
+                params[f"ext{i}"] = ft.lower()
+                names.append(f":ext{i}")
+            where.append(f"ci.ext IN ({', '.join(names)})")
+
+        if roots:
+            scopes = []
+            for i, root in enumerate(roots):
+                params[f"lo{i}"], params[f"hi{i}"] = _range_params(str(root))
+                scopes.append(f"(ci.path >= :lo{i} AND ci.path < :hi{i})")
+            where.append("(" + " OR ".join(scopes) + ")")
+
+        if match_terms:
+            snippet = f"snippet(file_contents, 0, '【', '】', '…', {_SNIPPET_TOKENS})"
+            order = "bm25(file_contents)"
+        else:
+            snippet = ("substr(file_contents.content, "
+                       "max(1, instr(lower(file_contents.content), :short0) - 30), 80)")
+            order = "ci.modified_at DESC"
+
+        sql = (
+            f"SELECT ci.path, ci.ext, {snippet} AS snippet "
+            f"FROM file_contents JOIN content_index ci ON ci.id = file_contents.rowid "
+            f"WHERE {' AND '.join(where)} ORDER BY {order} LIMIT :limit"
+        )
+        rows = self.db.execute(text(sql), params).fetchall()
+        return [{"path": path, "ext": ext, "snippet": snippet} for path, ext, snippet in rows]
+
+    def get_status(self) -> dict:
+        total = self.db.query(ContentIndex.id).count()
+        failed = self.db.query(ContentIndex.id).filter(ContentIndex.error != None).count()
+        return {"documents": total, "failed": failed, "running": _content_lock.locked()}
+
+
+_content_lock = threading.Lock()
+
+
+def run_content_index() -> Optional[dict]:
+    """执行一轮全文索引增量更新；已有一轮在跑时直接返回 None。"""
+    if not settings.content_index_enabled:
+        return None
+    if not _content_lock.acquire(blocking=False):
+        return None
+    db = SessionLocal()
+    try:
+        return ContentIndexService(db).refresh()
+    except Exception as e:
+        db.rollback()
+        print(f"[全文索引] 更新失败: {e}")
+        return None
+    finally:
+        db.close()
+        _content_lock.release()
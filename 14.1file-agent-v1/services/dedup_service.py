@@ -0,0 +1,281 @@
+import os
+import hashlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import File, FileHash, SessionLocal
+from services.index_service import path_range
+
+
+_EDGE = 64 * 1024
+_READ_CHUNK = 1024 * 1024
+_CHUNK = 500
+
+
+def _digest():
+    return hashlib.blake2b(digest_size=32)
+
+
+def partial_hash_job(job: Tuple[str, int]) -> Tuple[str, Optional[str]]:
+    """首尾各 64KB 的哈希；不超过 128KB 的文件整个读入，结果即为全量哈希。"""
+    path, size = job
+    h = _digest()
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != size:
+                # 索引里的大小已经过期，等下一轮索引更新后再算
+                return path, None
+            if size <= 2 * _EDGE:
+                h.update(f.read())
+            else:
+                h.update(f.read(_EDGE))
+                f.seek(-_EDGE, os.SEEK_END)
+                h.update(f.read(_EDGE))
+    except OSError:
+        return path, None
+    return path, h.hexdigest()
+
+
+def full_hash_job(job: Tuple[str, int]) -> Tuple[str, Optional[str]]:
+    path, size = job
+    h = _digest()
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != size:
+                return path, None
+            while True:
+                chunk = f.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                h.update(chunk)
+    except OSError:
+        return path, None
+    return path, h.hexdigest()
+
+
+class DedupService:
+    """
+    基于文件名索引的重复文件检测。
+
+    逐级缩小候选：先按大小分组，同大小的再比首尾 64KB 的部分哈希，
+    部分哈希也相同的才读全文算 BLAKE2；哈希在进程池中计算，按 (path, modified_at, size) 缓存。
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _scoped(self, query, column, roots: Optional[List[str]]):
+        if roots:
+            query = query.filter(or_(*[or_(column == r, path_range(column, r)) for r in roots]))
+        return query
+
+    def _candidates(self, roots: Optional[List[str]], min_size: int) -> List[tuple]:
+        def base(*cols):
+            query = self.db.query(*cols).filter(File.is_dir == False, File.size >= min_size)
+            return self._scoped(query, File.path, roots)
+
+        sizes = base(File.size).group_by(File.size).having(func.count(File.id) > 1)
+        return base(File.path, File.size, File.modified_at).filter(File.size.in_(sizes)).all()
+
+    def _cached(self, paths: List[str]) -> Dict[str, FileHash]:
+        rows = {}
+        for i in range(0, len(paths), _CHUNK):
+            rows.update(
+                (row.path, row)
+                for row in self.db.query(FileHash).filter(FileHash.path.in_(paths[i:i + _CHUNK]))
+            )
+        return rows
+
+    def _purge_stale(self) -> int:
+        """删除文件名索引里已不存在的文件对应的哈希。"""
+        ids = [hid for (hid,) in self.db.query(FileHash.id).outerjoin(
+            File, File.path == FileHash.path
+        ).filter(File.id == None)]
+        for i in range(0, len(ids), _CHUNK):
+            self.db.query(FileHash).filter(FileHash.id.in_(ids[i:i + _CHUNK])).delete(synchronize_session=False)
+        self.db.commit()
+        return len(ids)
+
+    def _hash(self, pool, job, items: List[tuple], rows: Dict[str, FileHash], field: str):
+        for i in range(0, len(items), _CHUNK):
+            for path, digest in pool.map(job, items[i:i + _CHUNK], chunksize=16):
+                row = rows[path]
+                setattr(row, field, digest)
+                row.hashed_at = datetime.now()
+            self.db.commit()
+
+    def scan(self, roots: Optional[List[str]] = None, min_size: int = 1) -> dict:
+        removed = self._purge_stale()
+        candidates = self._candidates(roots, min_size)
+        cache = self._cached([path for path, _, _ in candidates])
+
+        rows = {}
+        need_partial = []
+        for path, size, modified_at in candidates:
+            row = cache.get(path)
+            if row is None:
+                row = FileHash(path=path)
+                self.db.add(row)
+            if row.size != size or row.modified_at != modified_at:
+                row.size = size
+                row.modified_at = modified_at
+                row.partial_hash = None
+                row.full_hash = None
+            rows[path] = row
+            if row.partial_hash is None:
+                need_partial.append((path, size))
+        self.db.commit()
+
+        need_full = []
+        with ProcessPoolExecutor(max_workers=max(1, settings.dedup_workers)) as pool:
+            self._hash(pool, partial_hash_job, need_partial, rows, "partial_hash")
+
+            by_partial = defaultdict(list)
+            for row in rows.values():
+                if row.partial_hash:
+                    by_partial[(row.size, row.partial_hash)].append(row)
+
+            for (size, _), group in by_partial.items():
+                if len(group) < 2:
+                    continue
+                for row in group:
+                    if row.full_hash is not None:
+                        continue
+                    if size <= 2 * _EDGE:
+                        row.full_hash = row.partial_hash
+                    else:
+                        need_full.append((row.path, size))
+            self.db.commit()
+
+            self._hash(pool, full_hash_job, need_full, rows, "full_hash")
+
+        return {
+            "candidates": len(rows),
+            "partial_hashed": len(need_partial),
+            "full_hashed": len(need_full),
+            "removed": removed
+        }
+
+    def _valid_hashes(self, *cols):
+        """只取缓存与文件名索引一致（大小、修改时间未变）的哈希。"""
+        return self.db.query(*cols).select_from(FileHash).join(File, File.path == FileHash.path).filter(
+            FileHash.full_hash != None,
+            File.size == FileHash.size,
+            File.modified_at == FileHash.modified_at
+        )
+
+    def list_groups(self, roots: Optional[List[str]] = None, min_size: int = 1, limit: int = 100) -> dict:
+        count = func.count(FileHash.id)
+        groups = self._scoped(
+            self._valid_hashes(FileHash.full_hash, FileHash.size, count).filter(FileHash.size >= min_size),
+            FileHash.path, roots
+        ).group_by(FileHash.full_hash, FileHash.size).having(count > 1).order_by(
+            (FileHash.size * (count - 1)).desc()
+        ).all()
+
+        top = groups[:limit]
+        members = defaultdict(list)
+        hashes = [h for h, _, _ in top]
+        for i in range(0, len(hashes), _CHUNK):
+            query = self._valid_hashes(FileHash.full_hash, File.path, File.name, File.modified_at).filter(
+                FileHash.full_hash.in_(hashes[i:i + _CHUNK])
+            )
+            for full_hash, path, name, modified_at in self._scoped(query, FileHash.path, roots):
+                members[full_hash].append({
+                    "name": name,
+                    "path": path,
+                    "modified_at": modified_at.isoformat() if modified_at else None
+                })
+
+        result = []
+        for full_hash, size, n in top:
+            files = sorted(members[full_hash], key=lambda f: (f["modified_at"] or "", f["path"]))
+            result.append({
+                "hash": full_hash,
+                "size": size,
+                "count": n,
+                "reclaimable": size * (n - 1),
+                "files": files
+            })
+
+        return {
+            "groups": result,
+            "group_count": len(groups),
+            "duplicate_files": sum(n - 1 for _, _, n in groups),
+            "reclaimable_bytes": sum(size * (n - 1) for _, size, n in groups),
+            "running": _dedup_lock.locked()
+        }
+
+    def trash_duplicates(self, paths: List[str]) -> dict:
+        """把选中的重复副本移入回收站；每组至少保留一份，已变化的文件跳过。"""
+        from services.trash_service import TrashService
+
+        paths = list(dict.fromkeys(paths))
+        rows = {path: row for path, row in self._cached(paths).items() if row.full_hash}
+        failed = [{"path": p, "error": "不在重复文件列表中，请重新扫描"} for p in paths if p not in rows]
+
+        selected = defaultdict(list)
+        for path in paths:
+            if path in rows:
+                selected[rows[path].full_hash].append(path)
+
+        removable = []
+        for full_hash, chosen in selected.items():
+            copies = {path for (path,) in self._valid_hashes(File.path).filter(FileHash.full_hash == full_hash)}
+            if not copies - set(chosen):
+                # 整组都被选中时保留第一份
+                failed.append({"path": chosen[0], "error": "每组重复文件至少保留一份"})
+                chosen = chosen[1:]
+            for path in chosen:
+                try:
+                    unchanged = os.stat(path).st_size == rows[path].size
+                except OSError:
+                    unchanged = False
+                if unchanged:
+                    removable.append(path)
+                else:
+                    failed.append({"path": path, "error": "文件已变化，请重新扫描"})
+
+        result = TrashService(self.db).move_to_trash(removable)
+        moved = {m["original_path"] for m in result["moved"]}
+        result["failed"] = failed + result["failed"]
+        result["failed_count"] = len(result["failed"])
+        result["total"] = len(paths)
+        result["freed_bytes"] = sum(rows[p].size for p in moved)
+        return result
+
+    def get_status(self) -> dict:
+        hashed = self.db.query(FileHash.id).filter(FileHash.full_hash != None).count()
+        return {"hashed": hashed, "running": _dedup_lock.locked(), "last_scan": _last_scan}
+
+
+_dedup_lock = threading.Lock()
+_last_scan: Optional[dict] = None
+
+
+def run_duplicate_scan(roots: Optional[List[str]] = None, min_size: int = 1) -> Optional[dict]:
+    """执行一轮重复文件扫描；已有一轮在跑时直接返回 None。"""
+    global _last_scan
+    if not _dedup_lock.acquire(blocking=False):
+        return None
+    db = SessionLocal()
+    try:
+        started = datetime.now()
+        result = DedupService(db).scan(roots, min_size)
+        result["started_at"] = started.isoformat()
+        result["finished_at"] = datetime.now().isoformat()
+        _last_scan = result
+        return result
+    except Exception as e:
+        db.rollback()
+        print(f"[重复文件] 扫描失败: {e}")
+        return None
+    finally:
+        db.close()
+        _dedup_lock.release()
@@ -0,0 +1,141 @@
+"""
+目录排除规则的预编译匹配器。
+
+排除项分三类，构造时一次性编译：
+- 普通名称（如 node_modules、.git）：精确名称放进集合，子串匹配合并成一个正则；
+- 通配符（含 * ? [ 的，如 *.egg-info）：fnmatch 规则翻译后并入同一个正则，只匹配目录名；
+- 绝对路径（如 C:\\Windows、/proc）：按路径分段建前缀树，命中任一前缀即排除。
+
+全部不区分大小写，路径分隔符 \\ 与 / 视为相同。
+
+本文件在 14.1file-agent-v1/services、14file-agent-v0 和 tools(不好用)/lib 各有一份，
+几个项目独立部署、互不导入，内容必须保持一致：改一处就同步其余各处，并运行
+14.1file-agent-v1/scripts/check_vendored.py 核对。
+"""
+import re
+import fnmatch
+import functools
+from typing import Iterable
+
+_GLOB_CHARS = set("*?[")
+_DRIVE_RE = re.compile(r"^[a-z]:(/|$)")
+# 前缀树中标记"到此为止"的键；"/" 不会出现在分段里，不会和路径段冲突
+_TERMINAL = "/"
+
+
+def _normalize(path: str) -> str:
+    return path.lower().replace("\\", "/")
+
+
+class ExclusionMatcher:
+    """
+    match_path(path)        任意路径：路径中任一段含排除名称、目录名匹配通配符或位于排除路径之下；
+    match_child(path, name) 自上而下遍历时使用：父目录已确认未被排除，只需检查新的一段；
+    match_name(name)        只看名称。
+
+    substring=False 时普通名称只做精确匹配，不再按子串匹配。
+    """
+
+    def __init__(self, patterns: Iterable[str], substring: bool = True):
+        names = set()
+        literals = []
+        spanning = []
+        globs = []
+        self._trie: dict = {}
+
+        for pattern in patterns:
+            # 单独的 "/" 会排除所有目录，视为无效配置忽略
+            pattern = _normalize(pattern.strip()).rstrip("/")
+            if not pattern:
+                continue
+            if _GLOB_CHARS & set(pattern):
+                globs.append(pattern)
+            elif pattern.startswith("/") or _DRIVE_RE.match(pattern):
+                self._add_prefix(pattern)
+            elif "/" in pattern:
+                # 相对路径片段，如 "build/cache"，只能在完整路径上匹配
+                spanning.append(pattern)
+            else:
+                names.add(pattern)
+                literals.append(pattern)
+
+        self._names = frozenset(names)
+        self._substring = substring
+
+        name_parts = [re.escape(p) for p in literals] if substring else []
+        name_parts += ["^" + fnmatch.translate(g) for g in globs]
+        self._name_re = re.compile("|".join(name_parts)) if name_parts else None
+
+        path_parts = [re.escape(p) for p in literals] if substring else []
+        path_parts += [re.escape(p) for p in spanning]
+        self._path_re = re.compile("|".join(path_parts)) if path_parts else None
+        self._span_re = re.compile("|".join(re.escape(p) for p in spanning)) if spanning else None
+
+        self._glob_re = re.compile("|".join(fnmatch.translate(g) for g in globs)) if globs else None
+        self._exact_only = not substring and not globs and not spanning and not self._trie
+
+    def _add_prefix(self, pattern: str):
+        node = self._trie
+        for part in pattern.split("/"):
+            if _TERMINAL in node:
+                return
+            node = node.setdefault(part, {})
+        node.clear()
+        node[_TERMINAL] = True
+
+    def _under_prefix(self, path_norm: str) -> bool:
+        node = self._trie
+        for part in path_norm.split("/"):
+            node = node.get(part)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+    def __bool__(self) -> bool:
+        return bool(self._names or self._name_re or self._path_re or self._trie)
+
+    def match_name(self, name: str) -> bool:
+        name = name.lower()
+        if name in self._names:
+            return True
+        if self._exact_only or self._name_re is None:
+            return False
+        return self._name_re.search(name) is not None
+
+    def match_child(self, path: str, name: str) -> bool:
+        if self.match_name(name):
+            return True
+        if self._trie or self._span_re:
+            path_norm = _normalize(path)
+            if self._trie and self._under_prefix(path_norm):
+                return True
+            if self._span_re and self._span_re.search(path_norm):
+                return True
+        return False
+
+    def match_path(self, path: str) -> bool:
+        path_norm = _normalize(path).rstrip("/")
+        if self._path_re and self._path_re.search(path_norm):
+            return True
+        name = path_norm.rsplit("/", 1)[-1]
+        if name in self._names:
+            return True
+        if self._glob_re and self._glob_re.match(name):
+            return True
+        if not self._substring and self._names:
+            # 精确模式下路径中任一段等于排除名称
+            if not self._names.isdisjoint(path_norm.split("/")):
+                return True
+        return bool(self._trie) and self._under_prefix(path_norm)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached(patterns: tuple, substring: bool) -> ExclusionMatcher:
+    return ExclusionMatcher(patterns, substring)
+
+
+def get_matcher(patterns: Iterable[str], substring: bool = True) -> ExclusionMatcher:
+    """按排除列表缓存编译结果，配置不变时各处共用同一个匹配器。"""
+    return _cached(tuple(patterns), substring)
@@ -0,0 +1,85 @@
+"""文档正文提取，供全文索引在子进程中调用，不依赖应用配置和数据库。"""
+import os
+from typing import Tuple
+
+MAX_TEXT_CHARS = 200000
+
+TEXT_EXTS = {'.txt', '.md', '.py', '.js', '.ts', '.html', '.css', '.json', '.xml', '.log', '.csv'}
+PDF_EXTS = {'.pdf'}
+DOCX_EXTS = {'.docx'}
+PPTX_EXTS = {'.pptx'}
+
+SUPPORTED_EXTS = TEXT_EXTS | PDF_EXTS | DOCX_EXTS | PPTX_EXTS
+
+
+def _extract_text_file(path: str) -> str:
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read(MAX_TEXT_CHARS)
+
+
+def _extract_pdf(path: str) -> str:
+    import PyPDF2
+
+    parts = []
+    total = 0
+    with open(path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            total += len(text)
+            if total >= MAX_TEXT_CHARS:
+                break
+    return "\n".join(parts)
+
+
+def _extract_docx(path: str) -> str:
+    from docx import Document
+
+    doc = Document(path)
+    parts = [para.text for para in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                parts.append(cell.text)
+    return "\n".join(parts)
+
+
+def _extract_pptx(path: str) -> str:
+    from pptx import Presentation
+
+    prs = Presentation(path)
+    parts = []
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if not shape.has_text_frame:
+                continue
+            for para in shape.text_frame.paragraphs:
+                if para.text.strip():
+                    parts.append(para.text.strip())
+    return "\n".join(parts)
+
+
+def extract_text(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TEXT_EXTS:
+        text = _extract_text_file(path)
+    elif ext in PDF_EXTS:
+        text = _extract_pdf(path)
+    elif ext in DOCX_EXTS:
+        text = _extract_docx(path)
+    elif ext in PPTX_EXTS:
+        text = _extract_pptx(path)
+    else:
+        return ""
+    return text[:MAX_TEXT_CHARS]
+
+
+def extract_job(path: str) -> Tuple[str, str, str]:
+    """进程池入口：返回 (path, 正文, 错误信息)，异常不外抛。"""
+    try:
+        return path, extract_text(path), ""
+    except ImportError as e:
+        return path, "", f"缺少依赖: {e.name}"
+    except Exception as e:
+        return path, "", str(e)[:500]
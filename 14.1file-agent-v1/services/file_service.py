@@ -1,13 +1,41 @@
 import os
+import json
+import heapq
+import base64
+import string
 import shutil
 import mimetypes
 from datetime import datetime
 from typing import List, Optional, Tuple
 from pathlib import Path
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, exists, func
+from sqlalchemy.orm import Session, aliased
 
 from app.config import settings
-from app.database import File, OperationLog
+from app.database import File
+from services.index_service import IndexService
+from services.exclusion import get_matcher
+from services.aggregate_service import AggregateService
+from services.oplog import log_operation, flush_operation_logs
+from services.transfer_service import submit_transfer
+
+
+# 与 SQLite lower() 一致，只折叠 ASCII 大小写，保证两种分页方式的游标可以互用
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class _Desc:
+    """反转比较方向，让 heapq 的小顶堆在升序排序时保留最小的 k 个。"""
+    __slots__ = ("key",)
+    
+    def __init__(self, key):
+        self.key = key
+    
+    def __lt__(self, other):
+        return other.key < self.key
+    
+    def __eq__(self, other):
+        return self.key == other.key
 
 
 class FileService:
@@ -48,67 +76,127 @@ class FileService:
     
     def list_files(self, path: str = "", page: int = 1, page_size: int = 50,
                    sort_by: str = "name", sort_order: str = "asc") -> Tuple[List[dict], int, str]:
+        items, total, current_path, _ = self.list_files_page(
+            path, page_size=page_size, sort_by=sort_by, sort_order=sort_order, page=page
+        )
+        return items, total, current_path
+    
+    def _listing_key(self, entry: os.DirEntry, is_dir: bool, sort_by: str) -> tuple:
+        name_key = (entry.name.translate(_ASCII_LOWER), entry.name)
+        if is_dir or sort_by not in ("size", "modified"):
+            return name_key
+        stat = entry.stat()
+        return (stat.st_size if sort_by == "size" else stat.st_mtime,) + name_key
+    
+    def _encode_list_cursor(self, group: int, key: tuple, sort_by: str, sort_order: str) -> str:
+        raw = json.dumps([sort_by, sort_order, group, list(key)], ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+    
+    def _decode_list_cursor(self, cursor: str, sort_by: str, sort_order: str) -> Tuple[int, tuple]:
+        try:
+            c_sort, c_order, group, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+        except Exception:
+            raise ValueError("无效的分页游标")
+        if c_sort != sort_by or c_order != sort_order:
+            raise ValueError("分页游标与排序方式不匹配")
+        return group, tuple(key)
+    
+    def list_files_page(self, path: str = "", cursor: Optional[str] = None, page_size: int = 50,
+                        sort_by: str = "name", sort_order: str = "asc",
+                        page: int = 1) -> Tuple[List[dict], int, str, Optional[str]]:
+        """
+        流式列目录：os.scandir 一遍扫描，只用有界堆保留当前页需要的条目。
+        
+        目录固定排在文件前面（目录按名称排序，仅按名称倒序时倒排），文件按 sort_by 排序。
+        名称排序无需 stat；按大小/时间排序时复用 DirEntry 缓存的 stat 结果。
+        cursor 为上一页返回的 next_cursor；不带 cursor 时按 page 偏移。
+        """
         if not path:
             target_path = self.root_path
         else:
             target_path = Path(path)
             if not self._is_path_allowed(str(target_path)):
-                return [], 0, str(self.root_path)
+                return [], 0, str(self.root_path), None
         
         if not target_path.exists():
-            return [], 0, str(self.root_path)
+            return [], 0, str(self.root_path), None
+        
+        if sort_by not in ("name", "size", "modified"):
+            sort_by, sort_order = "name", "asc"
+        desc = sort_order == "desc"
+        reverse = {0: desc and sort_by == "name", 1: desc}
         
-        dirs = []
-        files = []
+        after = self._decode_list_cursor(cursor, sort_by, sort_order) if cursor else None
+        skip = 0 if after else (page - 1) * page_size
+        limit = skip + page_size
         
+        heaps = {0: [], 1: []}
+        remaining = 0
+        total = 0
         try:
-            for entry in target_path.iterdir():
-                if entry.name.startswith('.') and entry.name != '.trash':
-                    continue
-                
-                stat = entry.stat()
-                item = {
-                    "name": entry.name,
-                    "path": str(entry),
-                    "parent_path": str(entry.parent),
-                    "is_dir": entry.is_dir(),
-                    "size": stat.st_size if entry.is_file() else 0,
-                    "ext": entry.suffix.lower() if entry.is_file() else None,
-                    "mime_type": self._get_mime_type(str(entry)) if entry.is_file() else None,
-                    "modified_at": datetime.fromtimestamp(stat.st_mtime),
-                    "created_at": datetime.fromtimestamp(stat.st_ctime),
-                }
-                
-                if entry.is_dir():
-                    dirs.append(item)
-                else:
-                    files.append(item)
+            with os.scandir(target_path) as it:
+                for entry in it:
+                    if entry.name.startswith('.') and entry.name != '.trash':
+                        continue
+                    try:
+                        is_dir = entry.is_dir()
+                        group = 0 if is_dir else 1
+                        key = self._listing_key(entry, is_dir, sort_by)
+                    except OSError:
+                        continue
+                    total += 1
+                    
+                    if after:
+                        if group < after[0]:
+                            continue
+                        if group == after[0] and (key >= after[1] if reverse[group] else key <= after[1]):
+                            continue
+                    remaining += 1
+                    
+                    # 有界堆：每组最多保留 limit 个，堆顶是当前最差的一个
+                    heap = heaps[group]
+                    item = (_Desc(key) if not reverse[group] else key, entry)
+                    if len(heap) < limit:
+                        heapq.heappush(heap, item)
+                    elif heap[0][0] < item[0]:
+                        heapq.heapreplace(heap, item)
         except PermissionError:
             pass
         
-        reverse = sort_order == "desc"
-        
-        if sort_by == "name":
-            dirs.sort(key=lambda x: x["name"].lower(), reverse=reverse)
-            files.sort(key=lambda x: x["name"].lower(), reverse=reverse)
-        elif sort_by == "size":
-            dirs.sort(key=lambda x: x["name"].lower())
-            files.sort(key=lambda x: x["size"], reverse=reverse)
-        elif sort_by == "modified":
-            dirs.sort(key=lambda x: x["name"].lower())
-            files.sort(key=lambda x: x["modified_at"], reverse=reverse)
-        else:
-            dirs.sort(key=lambda x: x["name"].lower())
-            files.sort(key=lambda x: x["name"].lower())
+        ordered = []
+        for group in (0, 1):
+            for wrapped, entry in sorted(heaps[group], key=lambda x: x[0], reverse=True):
+                ordered.append((group, wrapped.key if isinstance(wrapped, _Desc) else wrapped, entry))
+        ordered = ordered[skip:limit]
         
-        all_items = dirs + files
-        total = len(all_items)
+        items = []
+        for group, key, entry in ordered:
+            try:
+                items.append(self._entry_to_item(entry, str(target_path)))
+            except OSError:
+                continue
         
-        start = (page - 1) * page_size
-        end = start + page_size
-        paginated_items = all_items[start:end]
+        next_cursor = None
+        if ordered and remaining > skip + len(ordered):
+            group, key, _ = ordered[-1]
+            next_cursor = self._encode_list_cursor(group, key, sort_by, sort_order)
         
-        return paginated_items, total, str(target_path)
+        return items, total, str(target_path), next_cursor
+    
+    def _entry_to_item(self, entry: os.DirEntry, parent_path: str) -> dict:
+        stat = entry.stat()
+        is_dir = entry.is_dir()
+        return {
+            "name": entry.name,
+            "path": entry.path,
+            "parent_path": parent_path,
+            "is_dir": is_dir,
+            "size": stat.st_size if not is_dir else 0,
+            "ext": os.path.splitext(entry.name)[1].lower() if not is_dir else None,
+            "mime_type": self._get_mime_type(entry.path) if not is_dir else None,
+            "modified_at": datetime.fromtimestamp(stat.st_mtime),
+            "created_at": datetime.fromtimestamp(stat.st_ctime),
+        }
     
     def create_folder(self, name: str, parent_path: str) -> dict:
         if not parent_path:
@@ -126,6 +214,7 @@ class FileService:
             raise ValueError("文件夹已存在")
         
         new_folder.mkdir(parents=True, exist_ok=True)
+        IndexService(self.db).apply_changes(created=[str(new_folder)])
         
         return {
             "name": name,
@@ -150,6 +239,7 @@ class FileService:
             raise ValueError("目标名称已存在")
         
         old.rename(new_path)
+        IndexService(self.db).apply_changes(moved=[(str(old), str(new_path))])
         
         self._log_operation("rename", str(old), f"renamed to {new_name}")
         
@@ -197,6 +287,9 @@ class FileService:
             except Exception:
                 pass
         
+        IndexService(self.db).apply_changes(moved=[(m["old_path"], m["new_path"]) for m in moved])
+        flush_operation_logs()
+        
         return {"moved": moved, "count": len(moved)}
     
     def copy(self, file_paths: List[str], target_path: str) -> dict:
@@ -243,8 +336,63 @@ class FileService:
             except Exception:
                 pass
         
+        IndexService(self.db).apply_changes(created=[c["new_path"] for c in copied])
+        flush_operation_logs()
+        
         return {"copied": copied, "count": len(copied)}
     
+    def start_transfer(self, action: str, file_paths: List[str], target_path: str) -> dict:
+        """与 move/copy 相同的校验与命名规则，实际传输交给后台的 TransferEngine，返回任务快照。"""
+        if action not in ("move", "copy"):
+            raise ValueError("不支持的操作")
+        
+        target = Path(target_path)
+        if not self._is_path_allowed(str(target)):
+            raise ValueError("目标路径不允许访问")
+        
+        if self._is_readonly(str(target)):
+            raise ValueError("挂载目录为只读，不允许移动文件到此" if action == "move" else "挂载目录为只读，不允许复制文件到此")
+        
+        if not target.exists() or not target.is_dir():
+            raise ValueError("目标路径不存在或不是文件夹")
+        
+        target_resolved = target.resolve()
+        items = []
+        reserved = set()
+        for fp in file_paths:
+            src = Path(fp)
+            if not self._is_path_allowed(str(src)):
+                continue
+            
+            if action == "move" and self._is_readonly(str(src)):
+                continue
+            
+            if not src.exists():
+                continue
+            
+            # 不能把文件夹移动/复制到它自己里面
+            if src.is_dir() and (target_resolved == src.resolve() or src.resolve() in target_resolved.parents):
+                continue
+            
+            dst = target / src.name
+            if action == "move":
+                if dst.exists() or dst in reserved:
+                    continue
+            else:
+                base = src.stem
+                ext = src.suffix
+                counter = 1
+                while dst.exists() or dst in reserved:
+                    dst = target / f"{base} ({counter}){ext}"
+                    counter += 1
+            reserved.add(dst)
+            items.append((str(src), str(dst)))
+        
+        if not items:
+            raise ValueError("没有可处理的文件")
+        
+        return submit_transfer(action, items, str(target)).snapshot()
+    
     def get_file_info(self, path: str) -> dict:
         file_path = Path(path)
         if not self._is_path_allowed(str(file_path)):
@@ -290,29 +438,13 @@ class FileService:
         return parts
     
     def get_stats(self) -> dict:
-        total_files = 0
-        total_dirs = 0
-        total_size = 0
-        
-        for root, dirs, files in os.walk(self.root_path):
-            root_path = Path(root)
-            if root_path.name.startswith('.') and root_path.name != '.trash':
-                continue
-            
-            total_dirs += len(dirs)
-            total_files += len(files)
-            
-            for f in files:
-                try:
-                    total_size += (root_path / f).stat().st_size
-                except:
-                    pass
+        totals = AggregateService(self.db).get_totals(str(self.root_path))
         
         return {
-            "total_files": total_files,
-            "total_dirs": total_dirs,
-            "total_size": total_size,
-            "total_size_str": self._format_size(total_size)
+            "total_files": totals["files"],
+            "total_dirs": totals["dirs"],
+            "total_size": totals["size"],
+            "total_size_str": self._format_size(totals["size"])
         }
     
     def get_folders_tree(self, path: str = "") -> List[dict]:
@@ -326,39 +458,126 @@ class FileService:
         if not target_path.exists():
             return []
         
-        result = []
-        try:
-            for entry in sorted(target_path.iterdir(), key=lambda x: x.name.lower()):
-                if not entry.is_dir():
-                    continue
-                if entry.name.startswith('.'):
+        _, children = AggregateService(self.db).refresh(str(target_path))
+        
+        def build(dir_path: str) -> List[dict]:
+            items = []
+            for sub in sorted(children.get(dir_path, ()), key=lambda x: os.path.basename(x).lower()):
+                name = os.path.basename(sub)
+                if name.startswith('.'):
                     continue
-                
-                item = {
-                    "name": entry.name,
-                    "path": str(entry),
-                    "children": []
-                }
-                
-                try:
-                    children = self.get_folders_tree(str(entry))
-                    if children:
-                        item["children"] = children
-                except:
-                    pass
-                
-                result.append(item)
-        except PermissionError:
+                items.append({
+                    "name": name,
+                    "path": sub,
+                    "children": build(sub)
+                })
+            return items
+        
+        return build(str(target_path))
+    
+    def _encode_cursor(self, name: str) -> str:
+        raw = json.dumps([name.translate(_ASCII_LOWER), name], ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+    
+    def _decode_cursor(self, cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+        if not cursor:
+            return None
+        try:
+            key, name = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+            return key, name
+        except Exception:
+            raise ValueError("无效的分页游标")
+    
+    def _index_children(self, parent: str, after: Optional[Tuple[str, str]], limit: int) -> List[dict]:
+        """已建索引时一次查询取出一层子目录，has_children 用相关子查询判断。"""
+        child = aliased(File)
+        has_children = exists().where(and_(
+            child.parent_path == File.path,
+            child.is_dir == True,
+            ~child.name.startswith('.')
+        ))
+        key = func.lower(File.name)
+        
+        query = self.db.query(File.name, File.path, has_children.label("has_children")).filter(
+            File.parent_path == parent,
+            File.is_dir == True,
+            ~File.name.startswith('.')
+        )
+        if after:
+            query = query.filter(or_(key > after[0], and_(key == after[0], File.name > after[1])))
+        
+        rows = query.order_by(key, File.name).limit(limit).all()
+        return [{"name": name, "path": path, "has_children": bool(flag)} for name, path, flag in rows]
+    
+    def _has_subdirs(self, path: str) -> bool:
+        exclusions = get_matcher(settings.excluded_dirs)
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False) and not exclusions.match_child(entry.path, entry.name):
+                        return True
+        except OSError:
             pass
+        return False
+    
+    def _scan_children(self, parent: str, after: Optional[Tuple[str, str]], limit: int) -> List[dict]:
+        """未建索引时只列一层，has_children 只对本页的目录检查。"""
+        exclusions = get_matcher(settings.excluded_dirs)
+        entries = []
+        try:
+            with os.scandir(parent) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                    except OSError:
+                        continue
+                    if exclusions.match_child(entry.path, entry.name):
+                        continue
+                    key = (entry.name.translate(_ASCII_LOWER), entry.name)
+                    if after and key <= after:
+                        continue
+                    entries.append((key, entry.path))
+        except OSError:
+            return []
+        
+        entries.sort()
+        return [
+            {"name": key[1], "path": path, "has_children": self._has_subdirs(path)}
+            for key, path in entries[:limit]
+        ]
+    
+    def get_folder_children(self, path: str = "", cursor: Optional[str] = None,
+                            limit: int = 200) -> dict:
+        """文件夹树懒加载：每次只返回一层，按名称分页。"""
+        if not path:
+            target_path = self.root_path
+        else:
+            target_path = Path(path)
+            if not self._is_path_allowed(str(target_path)):
+                return {"folders": [], "next_cursor": None, "path": str(self.root_path)}
         
-        return result
+        if not target_path.is_dir():
+            return {"folders": [], "next_cursor": None, "path": str(target_path)}
+        
+        parent = str(target_path)
+        after = self._decode_cursor(cursor)
+        
+        if settings.index_enabled and IndexService(self.db).covering_root(parent):
+            folders = self._index_children(parent, after, limit + 1)
+        else:
+            folders = self._scan_children(parent, after, limit + 1)
+        
+        next_cursor = None
+        if len(folders) > limit:
+            folders = folders[:limit]
+            next_cursor = self._encode_cursor(folders[-1]["name"])
+        
+        return {"folders": folders, "next_cursor": next_cursor, "path": parent}
     
     def _log_operation(self, action: str, file_path: str, details: str = None, ip: str = None):
-        log = OperationLog(
-            action=action,
-            file_path=file_path,
-            details=details,
-            ip_address=ip
-        )
-        self.db.add(log)
-        self.db.commit()
\ No newline at end of file
+        log_operation(action, file_path, details, ip)
\ No newline at end of file
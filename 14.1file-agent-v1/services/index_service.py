@@ -0,0 +1,459 @@
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, or_, bindparam, column, literal, func, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import File, SettingsDB, SessionLocal, path_fts_available
+from services.exclusion import get_matcher
+from services.ranking import Scorer, TopK, tokenize
+
+
+ROOT_KEY_PREFIX = "index_root:"
+
+_IN_CHUNK = 500
+_COMMIT_EVERY_DIRS = 200
+_FIND_BATCH = 1000
+# trigram 索引只能查至少 3 个字符的串
+_TRIGRAM_MIN = 3
+
+
+def path_range(column, prefix: str):
+    """column 位于 prefix 目录之下（不含自身）的范围条件，能走 path 索引。"""
+    base = prefix.rstrip("\\/") + os.sep
+    return and_(column >= base, column < base[:-1] + chr(ord(os.sep) + 1))
+
+
+UPLOAD_TEMP_SUFFIX = ".upload"
+
+
+def is_upload_temp(name: str) -> bool:
+    """分片上传进行中的临时文件 .{upload_id}.upload，不进索引、不出现在搜索结果里。"""
+    return name.startswith(".") and name.endswith(UPLOAD_TEMP_SUFFIX)
+
+
+def should_skip_dir(dirpath: str, excluded_dirs: List[str]) -> bool:
+    return get_matcher(excluded_dirs).match_path(dirpath)
+
+
+def _chunks(items: list, size: int = _IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class IndexService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.root_path = Path(settings.root_path)
+        self.excluded_dirs = settings.excluded_dirs
+        self.exclusions = get_matcher(self.excluded_dirs)
+
+    def _get_all_roots(self) -> List[Path]:
+        roots = [self.root_path]
+        for mount in settings.mounts:
+            mount_path = Path(mount.get("path", ""))
+            if mount_path.exists():
+                roots.append(mount_path)
+        return roots
+
+    def _should_skip_dir(self, dirpath: str) -> bool:
+        return self.exclusions.match_path(dirpath)
+
+    # ---------- 根目录状态 ----------
+
+    def indexed_roots(self) -> List[str]:
+        rows = self.db.query(SettingsDB.key).filter(SettingsDB.key.like(f"{ROOT_KEY_PREFIX}%")).all()
+        return [key[len(ROOT_KEY_PREFIX):] for (key,) in rows]
+
+    def covering_root(self, path: str) -> Optional[str]:
+        """返回已完成索引、且包含 path 的根目录；没有则返回 None。"""
+        path = str(path)
+        for root in self.indexed_roots():
+            if path == root or path.startswith(root.rstrip("\\/") + os.sep):
+                return root
+        return None
+
+    def _mark_root_indexed(self, root: str):
+        key = f"{ROOT_KEY_PREFIX}{root}"
+        row = self.db.query(SettingsDB).filter(SettingsDB.key == key).first()
+        if row is None:
+            row = SettingsDB(key=key)
+            self.db.add(row)
+        row.value = datetime.now().isoformat()
+
+    def get_status(self) -> dict:
+        roots = []
+        for root in self.indexed_roots():
+            row = self.db.query(SettingsDB).filter(SettingsDB.key == f"{ROOT_KEY_PREFIX}{root}").first()
+            count = self.db.query(File.id).filter(path_range(File.path, root)).count()
+            roots.append({
+                "path": root,
+                "indexed_at": row.value if row else None,
+                "entries": count
+            })
+        return {"roots": roots, "running": _indexer_lock.locked()}
+
+    # ---------- 写入 ----------
+
+    def _new_entry(self, path: str, name: str, parent: str, st: os.stat_result, is_dir: bool) -> File:
+        return File(
+            name=name,
+            path=path,
+            parent_path=parent,
+            is_dir=is_dir,
+            size=0 if is_dir else st.st_size,
+            ext=None if is_dir else os.path.splitext(name)[1].lower(),
+            # 目录的 modified_at 只在扫描过其内容后才写入，None 表示尚未扫描
+            modified_at=None if is_dir else datetime.fromtimestamp(st.st_mtime),
+            created_at=datetime.fromtimestamp(st.st_ctime),
+            indexed_at=datetime.now()
+        )
+
+    def _add_entries(self, entries: List[File]):
+        if not entries:
+            return
+        self.db.add_all(entries)
+        self.db.flush()
+
+    def remove(self, path: str):
+        """从索引中删除 path 及其整个子树。"""
+        scope = or_(File.path == path, path_range(File.path, path))
+        self.db.query(File).filter(scope).delete(synchronize_session=False)
+
+    def _rescan_dir(self, dir_path: str, st: os.stat_result) -> List[str]:
+        """对比目录当前内容与索引记录，写入差异，返回需要继续下探的子目录。"""
+        existing = {row.name: row for row in self.db.query(File).filter(File.parent_path == dir_path)}
+        seen = set()
+        subdirs = []
+        new_entries = []
+
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        est = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+
+                    if is_dir and self.exclusions.match_child(entry.path, entry.name):
+                        continue
+                    if not is_dir and is_upload_temp(entry.name):
+                        continue
+
+                    seen.add(entry.name)
+                    row = existing.get(entry.name)
+
+                    if row is not None and row.is_dir != is_dir:
+                        self.remove(row.path)
+                        row = None
+
+                    if row is None:
+                        new_entries.append(self._new_entry(entry.path, entry.name, dir_path, est, is_dir))
+                    elif not is_dir:
+                        mtime = datetime.fromtimestamp(est.st_mtime)
+                        if row.size != est.st_size or row.modified_at != mtime:
+                            row.size = est.st_size
+                            row.modified_at = mtime
+                            row.indexed_at = datetime.now()
+
+                    if is_dir:
+                        subdirs.append(entry.path)
+        except (PermissionError, FileNotFoundError, OSError):
+            pass
+
+        for name, row in existing.items():
+            if name not in seen:
+                self.remove(row.path)
+
+        self._add_entries(new_entries)
+
+        self_row = self.db.query(File).filter(File.path == dir_path).first()
+        if self_row is None:
+            self_row = self._new_entry(dir_path, os.path.basename(dir_path.rstrip("\\/")) or dir_path,
+                                       os.path.dirname(dir_path.rstrip("\\/")), st, True)
+            self._add_entries([self_row])
+        self_row.modified_at = datetime.fromtimestamp(st.st_mtime)
+        self_row.indexed_at = datetime.now()
+
+        return subdirs
+
+    def _index_tree(self, start: str) -> Tuple[int, int]:
+        """
+        从 start 开始增量索引整棵子树，返回 (访问目录数, 重新列举的目录数)。
+
+        目录 mtime 只在其直接子项增删改名时变化，因此 mtime 未变的目录直接沿用
+        索引中的子目录列表，只对每个目录做一次 stat，不再列举其中的文件。
+        """
+        scanned = 0
+        visited = 0
+        stack = [start]
+
+        while stack:
+            dir_path = stack.pop()
+            visited += 1
+
+            try:
+                st = os.stat(dir_path)
+            except OSError:
+                self.remove(dir_path)
+                continue
+
+            row = self.db.query(File).filter(File.path == dir_path).first()
+            mtime = datetime.fromtimestamp(st.st_mtime)
+
+            if row is not None and row.is_dir and row.modified_at == mtime:
+                subdirs = [p for (p,) in self.db.query(File.path).filter(
+                    File.parent_path == dir_path, File.is_dir == True
+                )]
+            else:
+                subdirs = self._rescan_dir(dir_path, st)
+                scanned += 1
+                if scanned % _COMMIT_EVERY_DIRS == 0:
+                    self.db.commit()
+
+            stack.extend(subdirs)
+
+        return visited, scanned
+
+    def index_root(self, root: str) -> dict:
+        """增量索引一个根目录，完成后该根目录的搜索改走索引。"""
+        root = str(root)
+        visited, scanned = self._index_tree(root)
+
+        self._mark_root_indexed(root)
+        self.db.commit()
+
+        return {"root": root, "dirs_visited": visited, "dirs_rescanned": scanned}
+
+    def reindex_all(self) -> List[dict]:
+        roots = [str(r) for r in self._get_all_roots() if r.exists()]
+
+        # 清理已被移除的挂载点
+        for stale in set(self.indexed_roots()) - set(roots):
+            self.remove(stale)
+            self.db.query(SettingsDB).filter(SettingsDB.key == f"{ROOT_KEY_PREFIX}{stale}").delete()
+        self.db.commit()
+
+        return [self.index_root(root) for root in roots]
+
+    # ---------- 就地更新 ----------
+
+    def _is_tracked(self, path: str) -> bool:
+        if is_upload_temp(os.path.basename(path)):
+            return False
+        if not self.covering_root(path):
+            return False
+        if self._should_skip_dir(os.path.dirname(path)):
+            return False
+        return not (os.path.isdir(path) and self._should_skip_dir(path))
+
+    def upsert(self, path: str):
+        """按磁盘现状写入单个路径；新出现的目录会连同子树一起索引。"""
+        path = str(path)
+        if not self._is_tracked(path):
+            return
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return
+
+        is_dir = os.path.isdir(path)
+        row = self.db.query(File).filter(File.path == path).first()
+
+        if row is not None and row.is_dir != is_dir:
+            self.remove(path)
+            row = None
+
+        if row is None:
+            self._add_entries([self._new_entry(path, os.path.basename(path), os.path.dirname(path), st, is_dir)])
+            if is_dir:
+                self._index_tree(path)
+        elif not is_dir:
+            row.size = st.st_size
+            row.modified_at = datetime.fromtimestamp(st.st_mtime)
+            row.indexed_at = datetime.now()
+
+    def move(self, old_path: str, new_path: str):
+        """把 old_path 及其子树整体改名为 new_path，只改路径前缀，不重扫磁盘。"""
+        old_path, new_path = str(old_path), str(new_path)
+        row = self.db.query(File).filter(File.path == old_path).first()
+
+        if row is None or not self._is_tracked(new_path):
+            self.remove(old_path)
+            self.upsert(new_path)
+            return
+
+        self.remove(new_path)
+
+        if row.is_dir:
+            cut = len(old_path) + 1
+            self.db.query(File).filter(path_range(File.path, old_path)).update({
+                File.path: literal(new_path).op("||")(func.substr(File.path, cut)),
+                File.parent_path: literal(new_path).op("||")(func.substr(File.parent_path, cut)),
+            }, synchronize_session=False)
+
+        row.name = os.path.basename(new_path)
+        row.path = new_path
+        row.parent_path = os.path.dirname(new_path)
+        row.indexed_at = datetime.now()
+
+    def apply_ops(self, ops: List[tuple]):
+        """
+        按顺序应用一批变更并提交，ops 形如 ("upsert", path) / ("remove", path) /
+        ("move", old, new)。失败时回滚，交给下一轮增量扫描兜底。
+        """
+        if not ops:
+            return
+        from services.aggregate_service import AggregateService
+        AggregateService(self.db).invalidate([p for op in ops for p in op[1:]])
+        if not settings.index_enabled:
+            self.db.commit()
+            return
+        try:
+            for op in ops:
+                if op[0] == "upsert":
+                    self.upsert(op[1])
+                elif op[0] == "remove":
+                    self.remove(op[1])
+                elif op[0] == "move":
+                    self.move(op[1], op[2])
+            self.db.commit()
+        except (SQLAlchemyError, OSError) as e:
+            self.db.rollback()
+            print(f"[索引] 就地更新失败: {e}")
+
+    def apply_changes(self, created: Iterable[str] = (), deleted: Iterable[str] = (),
+                      moved: Iterable[Tuple[str, str]] = ()):
+        ops = [("move", str(old), str(new)) for old, new in moved]
+        ops += [("remove", str(p)) for p in deleted]
+        ops += [("upsert", str(p)) for p in created]
+        self.apply_ops(ops)
+
+    # ---------- 查询 ----------
+
+    def _scoped(self, query, exts: Optional[Set[str]], roots: List[str]):
+        query = query.filter(File.is_dir == False)
+        if exts:
+            query = query.filter(File.ext.in_(exts))
+        if roots:
+            query = query.filter(or_(*[path_range(File.path, r) for r in roots]))
+        return query
+
+    @staticmethod
+    def _terms_filter(terms: List[str], use_fts: bool):
+        """
+        完整路径同时包含 terms 中每个串。至少 3 个字符的串走 file_paths 的 trigram 索引
+        取 rowid，更短的串只在这些行上用 instr 过滤；全部都太短（如两个字的中文词）
+        或没有 trigram 索引时才逐行扫描。
+        """
+        long_terms = [t for t in terms if use_fts and len(t) >= _TRIGRAM_MIN]
+        short_terms = [t for t in terms if t not in long_terms]
+        conds = []
+        if long_terms:
+            match = " ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+            conds.append(File.id.in_(
+                text("SELECT rowid FROM file_paths WHERE file_paths MATCH :match")
+                .bindparams(bindparam("match", match, unique=True)).columns(column("rowid"))
+            ))
+        path_lower = func.lower(File.path)
+        conds.extend(func.instr(path_lower, t) > 0 for t in short_terms)
+        return and_(*conds)
+
+    @classmethod
+    def _keyword_filter(cls, keyword: str, use_fts: bool = False):
+        """
+        与 Scorer 相同的子串语义：完整路径（文件名或所在目录）包含关键词，
+        或包含关键词的全部词元。是否真正命中由评分决定，这里只需不漏。
+        """
+        groups = [cls._terms_filter([keyword], use_fts)]
+        tokens = sorted(tokenize(keyword))
+        if tokens and tokens != [keyword]:
+            groups.append(cls._terms_filter(tokens, use_fts))
+        return or_(*groups)
+
+    def find(self, keywords: List[str], file_types: Optional[List[str]] = None,
+             max_results: int = 100, roots: Optional[List[str]] = None) -> List[Tuple[File, float]]:
+        """
+        在索引中查找文件，返回 (File, 相关度) 列表，按相关度加时间加成降序。
+
+        候选与实时遍历一致：路径包含关键词（子串）的文件逐行交给 services.ranking.Scorer
+        评分（时间加成取 modified_at），TopK 只保留前 max_results 个，因此同一个根目录
+        建没建索引结果相同。候选由 file_paths 的 trigram 索引给出，见 _terms_filter。
+        没有关键词时按修改时间倒序。
+        """
+        exts = set(ft.lower() for ft in file_types) if file_types else None
+        roots = [str(r) for r in roots] if roots else []
+
+        if not keywords:
+            rows = (self._scoped(self.db.query(File), exts, roots)
+                    .order_by(File.modified_at.desc(), File.name).limit(max_results).all())
+            return [(row, 0) for row in rows]
+
+        scorer = Scorer(keywords, roots)
+        ranker = TopK(max_results)
+        use_fts = path_fts_available()
+        query = (self._scoped(self.db.query(File.id, File.name, File.parent_path, File.modified_at), exts, roots)
+                 .filter(or_(*[self._keyword_filter(kw.lower(), use_fts) for kw in keywords])))
+        for fid, name, parent_path, modified_at in query.yield_per(_FIND_BATCH):
+            relevance = scorer.relevance(name, parent_path or "")
+            if relevance is None:
+                continue
+            mtime = modified_at.timestamp() if modified_at else 0
+            ranker.push(scorer.key(relevance, mtime), (fid, relevance))
+
+        picked = ranker.results()
+        rows = {}
+        for chunk in _chunks([fid for fid, _ in picked]):
+            rows.update((row.id, row) for row in self.db.query(File).filter(File.id.in_(chunk)))
+
+        return [(rows[fid], score) for fid, score in picked if fid in rows]
+
+
+_indexer_lock = threading.Lock()
+_indexer_thread = None
+
+
+def run_incremental_index() -> Optional[List[dict]]:
+    """执行一轮增量索引；已有一轮在跑时直接返回 None。"""
+    if not _indexer_lock.acquire(blocking=False):
+        return None
+    db = SessionLocal()
+    try:
+        return IndexService(db).reindex_all()
+    except Exception as e:
+        db.rollback()
+        print(f"[索引] 更新失败: {e}")
+        return None
+    finally:
+        db.close()
+        _indexer_lock.release()
+
+
+def _indexer_loop():
+    while True:
+        run_incremental_index()
+        if settings.watch_enabled:
+            from services.watch_service import ensure_index_watcher
+            ensure_index_watcher()
+        if settings.content_index_enabled:
+            from services.content_index_service import run_content_index
+            run_content_index()
+        time.sleep(max(60, settings.index_interval_hours * 3600))
+
+
+def start_background_indexer():
+    global _indexer_thread
+    if not settings.index_enabled:
+        return
+    if _indexer_thread and _indexer_thread.is_alive():
+        return
+    _indexer_thread = threading.Thread(target=_indexer_loop, name="file-indexer", daemon=True)
+    _indexer_thread.start()
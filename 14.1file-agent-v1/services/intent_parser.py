@@ -0,0 +1,177 @@
+import os
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+
+TYPE_GROUPS = {
+    "image": [".jpg", ".png", ".jpeg", ".gif", ".webp", ".bmp"],
+    "document": [".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".txt", ".md"],
+    "video": [".mp4", ".avi", ".mov", ".mkv", ".webm"],
+    "audio": [".mp3", ".wav", ".flac", ".aac"],
+}
+
+_TYPE_WORDS = {
+    "图片": "image", "照片": "image", "相片": "image", "截图": "image",
+    "image": "image", "images": "image", "photo": "image", "photos": "image",
+    "picture": "image", "pictures": "image", "pic": "image", "pics": "image",
+    "文档": "document", "document": "document", "documents": "document", "docs": "document",
+    "视频": "video", "电影": "video", "video": "video", "videos": "video", "movie": "video", "movies": "video",
+    "音频": "audio", "音乐": "audio", "歌曲": "audio", "audio": "audio", "music": "audio",
+    "song": "audio", "songs": "audio",
+}
+
+_EXTS = {
+    "pdf", "doc", "docx", "xls", "xlsx", "ppt", "pptx", "txt", "md", "csv", "json",
+    "jpg", "jpeg", "png", "gif", "webp", "bmp", "svg",
+    "mp4", "avi", "mov", "mkv", "webm", "mp3", "wav", "flac", "aac", "m4a",
+    "zip", "rar", "7z", "py", "js", "html",
+}
+
+# 与 LLM 提示词里的规则一致：常见词补上中英文同义词，提高命中率
+_SYNONYMS = {
+    "简历": ["resume", "cv"], "resume": ["简历", "cv"], "cv": ["简历", "resume"],
+    "发票": ["invoice"], "invoice": ["发票"],
+    "合同": ["contract"], "contract": ["合同"],
+    "报告": ["report"], "report": ["报告"],
+    "照片": ["photo"], "截图": ["screenshot"], "screenshot": ["截图"],
+}
+
+_SEARCH_VERBS = [
+    "帮我搜索", "帮我查找", "帮我找", "搜索一下", "搜一下", "找一下", "查一下",
+    "搜索", "查找", "搜", "找", "查",
+    "search for", "search", "find", "look for", "locate",
+]
+_BROWSE_VERBS = [
+    "打开", "浏览", "进入", "切换到", "列出", "看看",
+    "go to", "open", "browse", "cd", "ls", "list", "show",
+]
+_UP_WORDS = {"上一级", "上级", "上级目录", "返回上级", "返回上一级", "返回", "..", "back", "up"}
+_HOME_WORDS = {"根目录", "主目录", "首页", "home", "~", "/"}
+
+# 带这些词的请求涉及修改或需要理解语义，交给 LLM；
+# 中文没有分词按子串匹配，英文按整词匹配，免得 "show" 里的 "how" 误伤
+_DEFER_WORDS = [
+    "删除", "删掉", "移动", "重命名", "改名", "新建", "创建", "发送", "邮件", "上传", "复制",
+    "怎么", "如何", "为什么", "是什么", "吗", "?", "？",
+]
+_EN_DEFER_WORDS = {
+    "delete", "remove", "move", "rename", "create", "mkdir", "email", "mail", "send", "upload", "copy",
+    "how", "what", "why",
+}
+_FILLERS = [
+    "所有的", "所有", "全部的", "全部", "一下", "我的", "相关的", "相关", "文件夹", "文件", "里面的", "里的", "的",
+    "帮我", "请", "给我",
+]
+_EN_FILLERS = {"all", "my", "the", "a", "an", "please", "me", "file", "files", "for", "some", "of"}
+
+_TOKEN_RE = re.compile(r"\.?[a-z0-9][a-z0-9+#_.-]*|[一-鿿]+")
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _strip_prefix(text: str, words: List[str]) -> Tuple[Optional[str], str]:
+    """返回 (匹配到的前缀词, 剩余部分)，没有匹配时前缀词为 None。"""
+    for word in words:
+        if text.startswith(word):
+            rest = text[len(word):]
+            # 英文动词后面必须是空白，避免 "listen" 被当成 "list"
+            if word[-1].isascii() and word[-1].isalpha() and rest and not rest[0].isspace():
+                continue
+            return word, rest.strip()
+    return None, text
+
+
+def _original_rest(message: str, word: str) -> str:
+    """在原始消息里跳过前缀词，保留参数原本的大小写和空白。"""
+    pattern = r"\s*" + r"\s+".join(re.escape(part) for part in word.split())
+    m = re.match(pattern, message, re.IGNORECASE)
+    return message[m.end():].strip() if m else ""
+
+
+def _resolve_dir(arg: str, current_path: Optional[str], root_path: str) -> Optional[str]:
+    if arg in _HOME_WORDS:
+        return root_path
+    if arg in _UP_WORDS:
+        base = current_path or root_path
+        parent = os.path.dirname(base.rstrip("\\/"))
+        return parent or base
+    candidate = Path(arg)
+    if candidate.is_absolute():
+        return str(candidate) if candidate.is_dir() else None
+    # 相对路径先在当前目录下找，再到根目录下找
+    for base in dict.fromkeys(filter(None, (current_path, root_path))):
+        if (Path(base) / arg).is_dir():
+            return str(Path(base) / arg)
+    return None
+
+
+def _split_terms(text: str) -> Tuple[List[str], List[str]]:
+    """把查询拆成 (关键词, 扩展名)。"""
+    keywords = []
+    exts = []
+    for token in _TOKEN_RE.findall(text):
+        if token[0].isascii():
+            word = token.lstrip(".")
+            if word in _TYPE_WORDS:
+                exts.extend(TYPE_GROUPS[_TYPE_WORDS[word]])
+            elif word in _EXTS:
+                exts.append("." + word)
+            elif word not in _EN_FILLERS:
+                keywords.append(word)
+            continue
+
+        # 中文连写时逐个剥掉类型词和虚词，例如 "所有简历图片"
+        for word, group in _TYPE_WORDS.items():
+            if not word.isascii() and word in token:
+                exts.extend(TYPE_GROUPS[group])
+                token = token.replace(word, " ")
+        for filler in _FILLERS:
+            token = token.replace(filler, " ")
+        keywords.extend(token.split())
+    return keywords, list(dict.fromkeys(exts))
+
+
+def parse_intent(message: str, current_path: Optional[str], root_path: str) -> Optional[dict]:
+    """
+    本地解析常见的搜索/浏览/按类型查找请求，结果与 LLM 返回的 JSON 结构相同；
+    拿不准时返回 None，由调用方交给 LLM。
+    """
+    text = " ".join(message.strip().lower().split())
+    if not text or len(text) > 60:
+        return None
+    if any(word in text for word in _DEFER_WORDS) or _EN_DEFER_WORDS.intersection(_WORD_RE.findall(text)):
+        return None
+
+    if text in _UP_WORDS or text in _HOME_WORDS:
+        return {"action": "browse", "browse_params": {"path": _resolve_dir(text, current_path, root_path)}}
+
+    browse_verb, rest = _strip_prefix(text, _BROWSE_VERBS)
+    if browse_verb:
+        if not rest or rest in (".", "当前目录", "这里"):
+            return {"action": "browse", "browse_params": {"path": current_path or root_path}}
+        # 路径区分大小写，从原始消息里取参数
+        target = _resolve_dir(_original_rest(message, browse_verb), current_path, root_path)
+        if target:
+            return {"action": "browse", "browse_params": {"path": target}}
+        # "list videos" 这类按类型列出的请求继续按搜索处理
+
+    search_verb, rest = _strip_prefix(rest if browse_verb else text, _SEARCH_VERBS)
+    keywords, exts = _split_terms(rest)
+    if not search_verb and not browse_verb and not exts:
+        return None
+    if not keywords and not exts:
+        return None
+
+    expanded = list(keywords)
+    for kw in keywords:
+        expanded.extend(s for s in _SYNONYMS.get(kw, []) if s not in expanded)
+
+    return {
+        "action": "search",
+        "search_params": {
+            "keyword": " ".join(expanded),
+            "file_types": exts or None,
+            "max_results": 20,
+            "search_all": True
+        }
+    }
@@ -0,0 +1,72 @@
+import atexit
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+from app.database import OperationLog, engine
+
+
+_FLUSH_INTERVAL = 1.0
+_MAX_PENDING = 500
+_MAX_RETAINED = 10000
+
+_pending: List[dict] = []
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+
+
+def log_operation(action: str, file_path: str, details: Optional[str] = None, ip: Optional[str] = None):
+    """
+    记录一条操作日志。
+
+    日志先进内存缓冲区，由后台线程每秒或攒满 500 条时用一个事务批量写入，
+    不占用调用方的数据库会话，也不会每条日志都触发一次 fsync。
+    """
+    global _thread
+    with _lock:
+        _pending.append({
+            "action": action,
+            "file_path": file_path,
+            "details": details,
+            "ip_address": ip,
+            "created_at": datetime.utcnow()
+        })
+        full = len(_pending) >= _MAX_PENDING
+        if _thread is None or not _thread.is_alive():
+            _thread = threading.Thread(target=_flush_loop, name="oplog-writer", daemon=True)
+            _thread.start()
+    if full:
+        _wake.set()
+
+
+def flush_operation_logs() -> int:
+    """立即写入缓冲区中的日志，批量操作结束时调用，保证整批日志落在同一个事务里。"""
+    with _flush_lock:
+        with _lock:
+            rows = _pending[:]
+            _pending.clear()
+        if not rows:
+            return 0
+        try:
+            with engine.begin() as conn:
+                conn.execute(OperationLog.__table__.insert(), rows)
+        except Exception as e:
+            print(f"[操作日志] 写入失败: {e}")
+            # 放回缓冲区等下次重试，数据库长时间不可用时只保留最近的日志
+            with _lock:
+                _pending[:0] = rows
+                del _pending[:-_MAX_RETAINED]
+            return 0
+        return len(rows)
+
+
+def _flush_loop():
+    while True:
+        _wake.wait(_FLUSH_INTERVAL)
+        _wake.clear()
+        flush_operation_logs()
+
+
+atexit.register(flush_operation_logs)
@@ -1,11 +1,12 @@
 import os
-import io
-import base64
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
 from typing import Optional, Tuple
-from fastapi.responses import StreamingResponse, FileResponse
+from urllib.parse import quote
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 from app.config import settings
+from services.thumbnail_service import THUMB_SIZE, get_thumbnail
 
 
 class PreviewService:
@@ -60,19 +61,112 @@ class PreviewService:
         ext = Path(path).suffix.lower()
         return self.get_preview_type(ext) != "unknown"
     
-    def get_file_response(self, path: str, preview: bool = False) -> FileResponse:
+    def _etag(self, st: os.stat_result) -> str:
+        return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    
+    def _not_modified(self, headers, etag: str, st: os.stat_result) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip() for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags or f"W/{etag}" in tags
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+    
+    def _parse_range(self, range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+        """解析单段 Range（bytes=start-end / bytes=-suffix），不满足时抛 ValueError。"""
+        unit, _, spec = range_header.partition("=")
+        if unit.strip().lower() != "bytes" or "," in spec:
+            return None
+        start_s, _, end_s = spec.strip().partition("-")
+        try:
+            if start_s:
+                start = int(start_s)
+                end = int(end_s) if end_s else file_size - 1
+            else:
+                length = int(end_s)
+                if length <= 0:
+                    raise ValueError
+                start = max(0, file_size - length)
+                end = file_size - 1
+        except ValueError:
+            raise ValueError("Range 格式错误")
+        end = min(end, file_size - 1)
+        if start > end or start >= file_size:
+            raise ValueError("Range 超出文件范围")
+        return start, end
+    
+    def _iter_file(self, path: str, start: int, length: int, chunk_size: int = 256 * 1024):
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    def get_file_response(self, path: str, headers=None, preview: bool = True) -> Response:
+        """
+        流式返回文件，支持 Range（视频/音频拖动进度不必下载整个文件）、
+        ETag / Last-Modified 校验，未修改时返回 304。
+        """
         file_path = Path(path)
         
         if not self._is_path_allowed(path):
             raise ValueError("路径不允许访问")
         
-        if not file_path.exists():
+        if not file_path.is_file():
             raise FileNotFoundError("文件不存在")
         
-        return FileResponse(
-            path=str(file_path),
-            filename=file_path.name,
-            media_type=self._get_mime_type(path)
+        headers = headers or {}
+        st = file_path.stat()
+        etag = self._etag(st)
+        base_headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, no-cache",
+        }
+        
+        if self._not_modified(headers, etag, st):
+            return Response(status_code=304, headers=base_headers)
+        
+        disposition = "inline" if preview else "attachment"
+        base_headers["Content-Disposition"] = f"{disposition}; filename*=UTF-8''{quote(file_path.name)}"
+        media_type = self._get_mime_type(path)
+        
+        byte_range = None
+        range_header = headers.get("range")
+        if_range = headers.get("if-range")
+        if range_header and (not if_range or if_range in (etag, base_headers["Last-Modified"])):
+            try:
+                byte_range = self._parse_range(range_header, st.st_size)
+            except ValueError:
+                return Response(status_code=416, headers={"Content-Range": f"bytes */{st.st_size}"})
+        
+        if byte_range is None:
+            base_headers["Content-Length"] = str(st.st_size)
+            return StreamingResponse(
+                self._iter_file(str(file_path), 0, st.st_size),
+                media_type=media_type,
+                headers=base_headers
+            )
+        
+        start, end = byte_range
+        length = end - start + 1
+        base_headers["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+        base_headers["Content-Length"] = str(length)
+        return StreamingResponse(
+            self._iter_file(str(file_path), start, length),
+            status_code=206,
+            media_type=media_type,
+            headers=base_headers
         )
     
     def get_text_preview(self, path: str, max_size: int = 100000) -> str:
@@ -138,7 +232,8 @@ class PreviewService:
         except Exception as e:
             return f"无法读取Word文档: {str(e)}"
     
-    def get_image_base64(self, path: str, max_size: int = 10 * 1024 * 1024) -> str:
+    def get_image_thumbnail(self, path: str, size: Tuple[int, int] = THUMB_SIZE) -> Path:
+        """返回缓存中的缩略图文件路径，未命中时生成并写入缓存。"""
         file_path = Path(path)
         
         if not self._is_path_allowed(path):
@@ -147,59 +242,42 @@ class PreviewService:
         if not file_path.exists():
             raise FileNotFoundError("文件不存在")
         
-        file_size = file_path.stat().st_size
-        if file_size > max_size:
-            raise ValueError(f"文件过大 ({file_size // (1024*1024)}MB)，请下载查看")
-        
-        with open(file_path, 'rb') as f:
-            img_data = f.read()
-        
-        ext = file_path.suffix.lower()
-        mime_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.bmp': 'image/bmp',
-            '.svg': 'image/svg+xml',
-            '.ico': 'image/x-icon'
-        }
-        mime_type = mime_map.get(ext, 'image/jpeg')
-        
-        return f"data:{mime_type};base64,{base64.b64encode(img_data).decode('utf-8')}"
-    
-    def get_image_thumbnail(self, path: str, size: Tuple[int, int] = (200, 200)):
         try:
-            from PIL import Image
-            
-            file_path = Path(path)
-            
-            if not self._is_path_allowed(path):
-                raise ValueError("路径不允许访问")
-            
-            if not file_path.exists():
-                raise FileNotFoundError("文件不存在")
-            
-            img = Image.open(file_path)
-            img.thumbnail(size)
-            
-            img_byte_arr = io.BytesIO()
-            img_format = img.format or 'JPEG'
-            if img_format == 'PNG':
-                img.save(img_byte_arr, format='PNG')
-            else:
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                img.save(img_byte_arr, format='JPEG')
-            
-            img_byte_arr.seek(0)
-            return img_byte_arr
+            return get_thumbnail(str(file_path), file_path.stat(), size)
         except ImportError:
             raise RuntimeError("Pillow 库未安装，无法生成缩略图")
         except Exception as e:
             raise RuntimeError(f"生成缩略图失败: {str(e)}")
     
+    def get_thumbnail_response(self, path: str, headers=None, versioned: bool = False) -> Response:
+        """
+        返回缩略图。URL 带版本参数（原图 mtime/大小）时可以长期缓存，原图一改 URL 就变；
+        不带时按原图的 ETag 每次校验，未修改返回 304，改过的图片不会一直显示旧缩略图。
+        """
+        file_path = Path(path)
+        
+        if not self._is_path_allowed(path):
+            raise ValueError("路径不允许访问")
+        
+        if not file_path.is_file():
+            raise FileNotFoundError("文件不存在")
+        
+        headers = headers or {}
+        st = file_path.stat()
+        etag = self._etag(st)
+        base_headers = {
+            "ETag": etag,
+            "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+            "Cache-Control": "private, max-age=86400" if versioned else "private, no-cache",
+        }
+        
+        if self._not_modified(headers, etag, st):
+            return Response(status_code=304, headers=base_headers)
+        
+        thumb_path = self.get_image_thumbnail(path)
+        media_type = "image/png" if thumb_path.suffix == ".png" else "image/jpeg"
+        return FileResponse(str(thumb_path), media_type=media_type, headers=base_headers)
+    
     def _get_mime_type(self, path: str) -> str:
         import mimetypes
         mime_type, _ = mimetypes.guess_type(path)
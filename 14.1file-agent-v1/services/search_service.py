@@ -1,11 +1,15 @@
 import os
-import fnmatch
 from datetime import datetime
 from typing import List, Optional, Callable
 from pathlib import Path
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from services.index_service import IndexService, is_upload_temp
+from services.content_index_service import ContentIndexService
+from services.walker import DirectoryWalker
+from services.exclusion import get_matcher
+from services.ranking import RECENCY_BOOST, Scorer, TopK
 
 
 class SearchService:
@@ -13,6 +17,7 @@ class SearchService:
         self.db = db
         self.root_path = Path(settings.root_path)
         self.excluded_dirs = settings.excluded_dirs
+        self.exclusions = get_matcher(self.excluded_dirs)
     
     def _get_all_roots(self) -> List[Path]:
         roots = [self.root_path]
@@ -28,18 +33,6 @@ class SearchService:
                 return mount.get("name", "")
         return None
     
-    def _should_skip_dir(self, dirpath: str) -> bool:
-        dirpath_lower = dirpath.lower()
-        dirname = os.path.basename(dirpath).lower()
-        
-        for excl in self.excluded_dirs:
-            excl_lower = excl.lower()
-            if excl_lower in dirpath_lower:
-                return True
-            if fnmatch.fnmatch(dirname, excl_lower):
-                return True
-        return False
-    
     def _format_size(self, size: int) -> str:
         if size < 1024:
             return f"{size} B"
@@ -53,7 +46,14 @@ class SearchService:
     def search(self, keyword: str, file_types: Optional[List[str]] = None,
                max_results: int = 100, path: Optional[str] = None,
                progress_callback: Optional[Callable] = None,
-               search_all_mounts: bool = False) -> List[dict]:
+               search_all_mounts: bool = False,
+               on_result: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """
+        返回相关度最高的 max_results 个文件（评分见 services.ranking）。
+
+        on_result 在某个文件进入当前前 max_results 名时回调，之后它仍可能被挤出；
+        最终结果以返回值为准。
+        """
         if not keyword and not file_types:
             return []
         
@@ -68,69 +68,142 @@ class SearchService:
         else:
             search_roots = [self.root_path]
         
-        results = []
-        scanned = 0
-        
+        # 已建好索引的根目录直接查库，其余的退回实时遍历
+        index_service = IndexService(self.db)
+        indexed_roots = []
+        walk_roots = []
         for search_root in search_roots:
-            for root, dirs, files in os.walk(search_root):
-                if self._should_skip_dir(root):
-                    dirs[:] = []
-                    continue
-                
-                dirs[:] = [d for d in dirs if not self._should_skip_dir(os.path.join(root, d))]
-                
-                scanned += 1
-                if progress_callback and scanned % 100 == 0:
-                    progress_callback(f"正在扫描: {root}", len(results))
-                
-                for filename in files:
-                    if len(results) >= max_results:
-                        break
-                    
-                    ext = os.path.splitext(filename)[1].lower()
-                    
-                    if file_types_lower and ext not in file_types_lower:
-                        continue
-                    
-                    if keywords:
-                        filename_lower = filename.lower()
-                        root_lower = root.lower()
-                        matched = any(kw in filename_lower or kw in root_lower for kw in keywords)
-                        if not matched:
-                            continue
-                    
-                    filepath = os.path.join(root, filename)
-                    try:
-                        stat = os.stat(filepath)
-                        
-                        score = 0
-                        for kw in keywords:
-                            if kw in filename_lower:
-                                score += 10
-                            elif kw in root_lower:
-                                score += 3
-                        
-                        results.append({
-                            "name": filename,
-                            "path": filepath,
-                            "parent_path": root,
-                            "is_dir": False,
-                            "size": stat.st_size,
-                            "size_str": self._format_size(stat.st_size),
-                            "ext": ext,
-                            "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                            "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                            "mount_name": self._get_mount_name(filepath),
-                            "_score": score
-                        })
-                    except (PermissionError, OSError, FileNotFoundError):
-                        continue
+            if settings.index_enabled and index_service.covering_root(str(search_root)):
+                indexed_roots.append(search_root)
+            else:
+                walk_roots.append(search_root)
+        
+        # 索引和实时遍历的命中都交给同一个 TopK，边找边保留分数最高的 max_results 个
+        scorer = Scorer(keywords, [str(r) for r in search_roots])
+        ranker = TopK(max_results)
+        if indexed_roots:
+            self._search_index(index_service, keywords, file_types, max_results, indexed_roots,
+                               scorer, ranker, on_result)
+        if walk_roots:
+            self._search_walk(file_types_lower, walk_roots, scorer, ranker, progress_callback, on_result)
         
-        results.sort(key=lambda x: (-x.get("_score", 0), x["name"]))
-        for r in results:
-            r.pop("_score", None)
+        return ranker.results()
+    
+    def _search_index(self, index_service: IndexService, keywords: List[str],
+                      file_types: Optional[List[str]], max_results: int,
+                      roots: List[Path], scorer: Scorer, ranker: TopK,
+                      on_result: Optional[Callable[[dict], None]] = None):
+        for row, relevance in index_service.find(keywords, file_types, max_results, [str(r) for r in roots]):
+            # 索引可能落后于磁盘，顺手剔除已不存在的文件
+            try:
+                stat = os.stat(row.path)
+            except (PermissionError, OSError, FileNotFoundError):
+                index_service.remove(row.path)
+                continue
+            
+            item = {
+                "name": row.name,
+                "path": row.path,
+                "parent_path": row.parent_path,
+                "is_dir": False,
+                "size": stat.st_size,
+                "size_str": self._format_size(stat.st_size),
+                "ext": row.ext,
+                "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                "mount_name": self._get_mount_name(row.path)
+            }
+            if ranker.push(scorer.key(relevance, stat.st_mtime), item) and on_result:
+                on_result(item)
+        
+        self.db.commit()
+    
+    def _search_walk(self, file_types_lower: Optional[set], search_roots: List[Path],
+                     scorer: Scorer, ranker: TopK,
+                     progress_callback: Optional[Callable] = None,
+                     on_result: Optional[Callable[[dict], None]] = None):
+        def match(root: str, entry) -> Optional[tuple]:
+            filename = entry.name
+            ext = os.path.splitext(filename)[1].lower()
+            
+            if file_types_lower and ext not in file_types_lower:
+                return None
+            if is_upload_temp(filename):
+                return None
+            
+            relevance = scorer.relevance(filename, root)
+            # 时间加成拉满也进不了前 k 的，不必再 stat
+            if relevance is None or not ranker.admits(relevance + RECENCY_BOOST):
+                return None
+            
+            try:
+                stat = entry.stat()
+            except (PermissionError, OSError, FileNotFoundError):
+                return None
+            
+            return scorer.key(relevance, stat.st_mtime), {
+                "name": filename,
+                "path": entry.path,
+                "parent_path": root,
+                "is_dir": False,
+                "size": stat.st_size,
+                "size_str": self._format_size(stat.st_size),
+                "ext": ext,
+                "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                "mount_name": self._get_mount_name(entry.path)
+            }
+        
+        def collect(hit: tuple):
+            key, item = hit
+            if ranker.push(key, item) and on_result:
+                on_result(item)
+        
+        walker = DirectoryWalker(
+            skip_dir=self.exclusions.match_child,
+            match=match,
+            with_sizes=False,
+            progress_callback=progress_callback,
+            collect=collect
+        )
+        walker.walk([str(r) for r in search_roots])
+    
+    def search_content(self, keyword: str, file_types: Optional[List[str]] = None,
+                       max_results: int = 50, path: Optional[str] = None,
+                       search_all_mounts: bool = False) -> List[dict]:
+        """按文件正文检索，结果附带命中片段 snippet"""
+        if not keyword.strip():
+            return []
+        
+        if path and self._is_path_allowed(path):
+            search_roots = [path]
+        elif search_all_mounts:
+            search_roots = [str(r) for r in self._get_all_roots()]
+        else:
+            search_roots = [str(self.root_path)]
+        
+        results = []
+        for hit in ContentIndexService(self.db).search(keyword, file_types, max_results, search_roots):
+            try:
+                stat = os.stat(hit["path"])
+            except (PermissionError, OSError, FileNotFoundError):
+                continue
+            
+            results.append({
+                "name": os.path.basename(hit["path"]),
+                "path": hit["path"],
+                "parent_path": os.path.dirname(hit["path"]),
+                "is_dir": False,
+                "size": stat.st_size,
+                "size_str": self._format_size(stat.st_size),
+                "ext": hit["ext"],
+                "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
+                "mount_name": self._get_mount_name(hit["path"]),
+                "snippet": hit["snippet"]
+            })
         
-        return results[:max_results]
+        return results
     
     def search_by_type(self, file_type: str, max_results: int = 100) -> List[dict]:
         type_map = {
@@ -0,0 +1,226 @@
+import io
+import os
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.database import DATA_DIR, File, SessionLocal
+
+
+THUMB_DIR = DATA_DIR / "thumbs"
+THUMB_SIZE = (200, 200)
+THUMB_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+_EVICT_TARGET = 0.9
+_PREFETCH_PER_DIR = 500
+_PREFETCH_SEEN_MAX = 1024
+
+
+class ThumbnailCache:
+    """
+    内容寻址的缩略图磁盘缓存。
+
+    键是 (路径, mtime, 大小, 尺寸) 的哈希，原图一改键就变，旧缩略图自然过期；
+    命中时刷新文件 mtime，超出容量时按 mtime 从旧到新淘汰。
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None
+
+    def key(self, path: str, st: os.stat_result, size: Tuple[int, int]) -> str:
+        raw = f"{path}|{st.st_mtime_ns}|{st.st_size}|{size[0]}x{size[1]}"
+        return hashlib.sha1(raw.encode("utf-8", "surrogateescape")).hexdigest()
+
+    def _path_for(self, key: str, ext: str) -> Path:
+        return self.directory / key[:2] / f"{key}{ext}"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        for ext in (".jpg", ".png"):
+            thumb = self._path_for(key, ext)
+            try:
+                os.utime(thumb)
+                return thumb
+            except FileNotFoundError:
+                continue
+        return None
+
+    def store(self, key: str, data: bytes, ext: str) -> Path:
+        thumb = self._path_for(key, ext)
+        thumb.parent.mkdir(parents=True, exist_ok=True)
+        tmp = thumb.with_name(f"{thumb.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, thumb)
+
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._entries())
+            else:
+                self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+        return thumb
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if not entry.name.endswith((".jpg", ".png")):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _EVICT_TARGET
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        self._total = total
+
+
+_cache = ThumbnailCache(THUMB_DIR, settings.thumb_cache_mb * 1024 * 1024)
+
+
+def render_thumbnail(path: str, size: Tuple[int, int] = THUMB_SIZE) -> Tuple[bytes, str]:
+    """生成缩略图，返回 (图片数据, 扩展名)。PNG 保持 PNG，其余转成 JPEG。"""
+    from PIL import Image
+
+    with Image.open(path) as img:
+        img_format = img.format
+        if img_format == "JPEG":
+            # JPEG 解码时直接按 1/2、1/4、1/8 缩小，不必解出整张原图
+            img.draft("RGB", size)
+        img.thumbnail(size)
+
+        buf = io.BytesIO()
+        if img_format == "PNG":
+            img.save(buf, format="PNG")
+            return buf.getvalue(), ".png"
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buf, format="JPEG", quality=85)
+        return buf.getvalue(), ".jpg"
+
+
+def _record_thumbnails(pairs: List[Tuple[str, str]]):
+    """把缩略图路径写回 files.thumbnail（仅更新已被索引的文件）。"""
+    if not pairs:
+        return
+    db = SessionLocal()
+    try:
+        for path, thumb in pairs:
+            db.query(File).filter(File.path == path).update(
+                {File.thumbnail: thumb}, synchronize_session=False
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+
+def get_thumbnail(path: str, st: os.stat_result, size: Tuple[int, int] = THUMB_SIZE) -> Path:
+    key = _cache.key(path, st, size)
+    thumb = _cache.lookup(key)
+    if thumb is None:
+        data, ext = render_thumbnail(path, size)
+        thumb = _cache.store(key, data, ext)
+        _record_thumbnails([(path, str(thumb))])
+    return thumb
+
+
+_prefetch_queue = queue.Queue(maxsize=64)
+_prefetch_seen = OrderedDict()
+_prefetch_thread = None
+_prefetch_lock = threading.Lock()
+
+
+def _prefetch_dir(dir_path: str):
+    try:
+        mtime = os.stat(dir_path).st_mtime_ns
+    except OSError:
+        return
+    # 目录 mtime 没变说明没有新文件，上次已经生成过
+    if _prefetch_seen.get(dir_path) == mtime:
+        return
+
+    done = []
+    count = 0
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                if count >= _PREFETCH_PER_DIR:
+                    break
+                if os.path.splitext(entry.name)[1].lower() not in THUMB_EXTS:
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                count += 1
+
+                key = _cache.key(entry.path, st, THUMB_SIZE)
+                if _cache.lookup(key) is not None:
+                    continue
+                try:
+                    data, ext = render_thumbnail(entry.path)
+                except Exception:
+                    continue
+                done.append((entry.path, str(_cache.store(key, data, ext))))
+    except OSError:
+        return
+
+    _record_thumbnails(done)
+    _prefetch_seen[dir_path] = mtime
+    _prefetch_seen.move_to_end(dir_path)
+    while len(_prefetch_seen) > _PREFETCH_SEEN_MAX:
+        _prefetch_seen.popitem(last=False)
+
+
+def _prefetch_loop():
+    while True:
+        dir_path = _prefetch_queue.get()
+        try:
+            _prefetch_dir(dir_path)
+        except Exception as e:
+            print(f"[缩略图] 预生成失败 {dir_path}: {e}")
+
+
+def prefetch_dir(dir_path: str):
+    """浏览目录时调用：把目录交给后台线程预生成缩略图，队列满时直接丢弃。"""
+    global _prefetch_thread
+    if not settings.thumb_prefetch:
+        return
+
+    with _prefetch_lock:
+        if _prefetch_thread is None or not _prefetch_thread.is_alive():
+            _prefetch_thread = threading.Thread(target=_prefetch_loop, name="thumb-prefetch", daemon=True)
+            _prefetch_thread.start()
+
+    try:
+        _prefetch_queue.put_nowait(str(dir_path))
+    except queue.Full:
+        pass
@@ -0,0 +1,363 @@
+import os
+import uuid
+import errno
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import SessionLocal
+from services.index_service import IndexService
+from services.oplog import log_operation, flush_operation_logs
+
+
+_CHUNK = 8 * 1024 * 1024
+_KEEP_JOBS = 50
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int, on_bytes: Callable[[int], None]) -> bool:
+    """内核态拷贝：优先 copy_file_range（同文件系统可走 reflink），其次 sendfile；都不支持时返回 False。"""
+    for name in ("copy_file_range", "sendfile"):
+        func = getattr(os, name, None)
+        if func is None:
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                if name == "copy_file_range":
+                    n = func(src_fd, dst_fd, min(_CHUNK, size - offset), offset, offset)
+                else:
+                    n = func(dst_fd, src_fd, offset, min(_CHUNK, size - offset))
+                if n == 0:
+                    break
+                offset += n
+                on_bytes(n)
+            return True
+        except OSError as e:
+            if offset or e.errno not in _FALLBACK_ERRNOS:
+                raise
+    return False
+
+
+def copy_file(src: str, dst: str, on_bytes: Callable[[int], None]):
+    """复制单个文件并保留时间戳/权限；on_bytes 每写入一块回调一次，可抛 TransferCancelled 中止。"""
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            if not _copy_range(fsrc.fileno(), fdst.fileno(), size, on_bytes):
+                buf = bytearray(_CHUNK)
+                view = memoryview(buf)
+                while True:
+                    n = fsrc.readinto(buf)
+                    if not n:
+                        break
+                    fdst.write(view[:n])
+                    on_bytes(n)
+        shutil.copystat(src, dst)
+    except BaseException:
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        raise
+
+
+class TransferJob:
+    """一次批量移动/复制任务；进度字段在工作线程中更新，snapshot() 供轮询和 SSE 读取。"""
+
+    def __init__(self, action: str, items: List[Tuple[str, str]], target: str):
+        self.id = uuid.uuid4().hex
+        self.action = action
+        self.items = items
+        self.target = target
+        self.status = "pending"
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.total_files = 0
+        self.done_files = 0
+        self.active: Dict[str, List[int]] = {}
+        self.done: List[dict] = []
+        self.failed: List[dict] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.version = 0
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "cancelled", "failed")
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _check_cancel(self):
+        if self._cancel.is_set():
+            raise TransferCancelled()
+
+    def _progress(self, src: str, n: int):
+        self._check_cancel()
+        with self._lock:
+            self.done_bytes += n
+            self.active[src][0] += n
+            self.version += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "id": self.id,
+                "action": self.action,
+                "status": self.status,
+                "target": self.target,
+                "total_bytes": self.total_bytes,
+                "done_bytes": self.done_bytes,
+                "total_files": self.total_files,
+                "done_files": self.done_files,
+                "files": [
+                    {"path": path, "done_bytes": done, "size": size}
+                    for path, (done, size) in self.active.items()
+                ],
+                "count": len(self.done),
+                "done": self.done[-100:],
+                "failed": list(self.failed),
+                "error": self.error,
+                "created_at": self.created_at.isoformat(),
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+                "version": self.version,
+            }
+
+
+class TransferEngine:
+    """
+    批量移动/复制引擎。
+
+    同一文件系统内的移动直接 rename；其余情况把所有选中项展开成文件列表，
+    在有界线程池中逐文件用 copy_file_range / sendfile 零拷贝复制，
+    跨盘移动在一整项复制成功后才删除源。取消时已完成的项保留，进行中的项回滚。
+    """
+
+    def __init__(self, job: TransferJob, workers: Optional[int] = None):
+        self.job = job
+        self.workers = max(1, workers or settings.transfer_workers)
+
+    def _same_device(self, src: str, dst: str) -> bool:
+        try:
+            return os.stat(src).st_dev == os.stat(os.path.dirname(dst)).st_dev
+        except OSError:
+            return False
+
+    def _plan(self, src: str, dst: str) -> Tuple[List[str], List[Tuple[str, str, int]]]:
+        dirs = []
+        files = []
+        if os.path.isdir(src) and not os.path.islink(src):
+            for root, subdirs, names in os.walk(src):
+                rel = os.path.relpath(root, src)
+                dirs.append(os.path.normpath(os.path.join(dst, rel)))
+                # 指向目录的符号链接 os.walk 不会进入，当作文件由 _copy_one 重建链接，
+                # 否则跨盘移动删除源目录时链接就丢了
+                links = [d for d in subdirs if os.path.islink(os.path.join(root, d))]
+                for name in names + links:
+                    path = os.path.join(root, name)
+                    try:
+                        size = os.lstat(path).st_size
+                    except OSError:
+                        continue
+                    files.append((path, os.path.join(dst, rel, name), size))
+        else:
+            files.append((src, dst, os.path.getsize(src)))
+        return dirs, files
+
+    def _copy_one(self, src: str, dst: str, size: int):
+        job = self.job
+        with job._lock:
+            job.active[src] = [0, size]
+        try:
+            job._check_cancel()
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                copy_file(src, dst, lambda n: job._progress(src, n))
+        finally:
+            with job._lock:
+                job.active.pop(src, None)
+                job.done_files += 1
+                job.version += 1
+
+    def _rollback(self, dst: str):
+        try:
+            if os.path.isdir(dst) and not os.path.islink(dst):
+                shutil.rmtree(dst)
+            elif os.path.lexists(dst):
+                os.remove(dst)
+        except OSError:
+            pass
+
+    def _record_done(self, src: str, dst: str):
+        with self.job._lock:
+            self.job.done.append({"name": os.path.basename(src), "old_path": src, "new_path": dst})
+            self.job.version += 1
+
+    def _record_failed(self, src: str, error: str):
+        with self.job._lock:
+            self.job.failed.append({"path": src, "error": error})
+            self.job.version += 1
+
+    def _finish_item(self, item: dict):
+        job = self.job
+        src, dst = item["src"], item["dst"]
+        if item["error"] is not None or job._cancel.is_set():
+            self._rollback(dst)
+            if item["error"] is not None and not isinstance(item["error"], TransferCancelled):
+                self._record_failed(src, str(item["error"]))
+            return
+        try:
+            if job.action == "move":
+                if os.path.isdir(src) and not os.path.islink(src):
+                    shutil.rmtree(src)
+                else:
+                    os.remove(src)
+        except OSError as e:
+            self._record_failed(src, f"已复制，但删除源文件失败: {e}")
+        self._record_done(src, dst)
+
+    def _tasks(self, items: List[dict]):
+        """按选中顺序逐项建目录、产出文件任务；某项建目录失败只影响该项。"""
+        for item in items:
+            try:
+                for d in item["dirs"]:
+                    os.makedirs(d, exist_ok=True)
+            except OSError as e:
+                item["error"] = e
+                item["remaining"] = 0
+                self._finish_item(item)
+                continue
+            if not item["files"]:
+                self._finish_item(item)
+                continue
+            for f in item["files"]:
+                yield item, f
+
+    def run(self):
+        job = self.job
+        job.status = "running"
+        items = []
+
+        for src, dst in job.items:
+            if job._cancel.is_set():
+                break
+            try:
+                if job.action == "move" and self._same_device(src, dst):
+                    os.rename(src, dst)
+                    self._record_done(src, dst)
+                    continue
+                dirs, files = self._plan(src, dst)
+            except OSError as e:
+                self._record_failed(src, str(e))
+                continue
+            with job._lock:
+                job.total_bytes += sum(size for _, _, size in files)
+                job.total_files += len(files)
+                job.version += 1
+            items.append({"src": src, "dst": dst, "dirs": dirs, "files": files,
+                          "remaining": len(files), "error": None})
+
+        # 在途任务数有上限，几十万个小文件时也不会一次性堆满队列
+        tasks = self._tasks(items)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transfer") as pool:
+            while True:
+                while len(in_flight) < self.workers * 4 and not job._cancel.is_set():
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    item, (src, dst, size) = task
+                    if item["error"] is not None:
+                        # 同一项已有文件失败，剩余文件不再复制
+                        item["remaining"] -= 1
+                        if item["remaining"] == 0:
+                            self._finish_item(item)
+                        continue
+                    in_flight[pool.submit(self._copy_one, src, dst, size)] = item
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = in_flight.pop(future)
+                    if future.exception() is not None and item["error"] is None:
+                        item["error"] = future.exception()
+                    item["remaining"] -= 1
+                    if item["remaining"] == 0:
+                        self._finish_item(item)
+
+        if job._cancel.is_set():
+            # 取消时尚未开始的项直接回滚已建的目录
+            for item in items:
+                if item["remaining"] > 0:
+                    self._rollback(item["dst"])
+
+        with job._lock:
+            job.active.clear()
+            job.status = "cancelled" if job._cancel.is_set() else "done"
+            job.finished_at = datetime.now()
+            job.version += 1
+
+
+_jobs: "OrderedDict[str, TransferJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _run_job(job: TransferJob):
+    try:
+        TransferEngine(job).run()
+    except Exception as e:
+        with job._lock:
+            job.status = "failed"
+            job.error = str(e)
+            job.finished_at = datetime.now()
+            job.version += 1
+
+    if not job.done:
+        return
+    db = SessionLocal()
+    try:
+        index = IndexService(db)
+        if job.action == "move":
+            index.apply_changes(moved=[(d["old_path"], d["new_path"]) for d in job.done])
+        else:
+            index.apply_changes(created=[d["new_path"] for d in job.done])
+        verb = "moved" if job.action == "move" else "copied"
+        for d in job.done:
+            log_operation(job.action, d["old_path"], f"{verb} to {job.target}")
+        flush_operation_logs()
+    except Exception as e:
+        db.rollback()
+        print(f"[传输] 更新索引失败: {e}")
+    finally:
+        db.close()
+
+
+def submit_transfer(action: str, items: List[Tuple[str, str]], target: str) -> TransferJob:
+    """登记并在后台线程中启动一个传输任务，只保留最近 50 个已结束的任务记录。"""
+    job = TransferJob(action, items, target)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        finished = [jid for jid, j in _jobs.items() if j.finished]
+        for jid in finished[:max(0, len(finished) - _KEEP_JOBS)]:
+            del _jobs[jid]
+    threading.Thread(target=_run_job, args=(job,), name=f"transfer-{job.id[:8]}", daemon=True).start()
+    return job
+
+
+def get_transfer(job_id: str) -> Optional[TransferJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -1,13 +1,46 @@
 import os
+import time
 import shutil
 import uuid
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from typing import List, Optional
 from pathlib import Path
+from sqlalchemy import exists, func, insert, literal, select
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import Trash, OperationLog
+from app.database import Trash, TrashPurge, SessionLocal
+from services.index_service import IndexService
+from services.walker import scan_dir
+
+
+_PURGE_BATCH = 200
+_IN_CHUNK = 500
+_RETENTION_INTERVAL = 3600
+
+_purge_wake = threading.Event()
+_purge_thread = None
+_purge_lock = threading.Lock()
+_purge_status = {
+    "running": False,
+    "purged": 0,
+    "freed_bytes": 0,
+    "failed": 0,
+    "last_error": None,
+    "last_retention_at": None,
+}
+
+
+def _not_queued():
+    return ~exists().where(TrashPurge.trash_id == Trash.id)
+
+
+def _remove_path(path: str):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
 
 
 class TrashService:
@@ -80,6 +113,7 @@ class TrashService:
                 failed.append({"path": path, "error": str(e)})
         
         self.db.commit()
+        IndexService(self.db).apply_changes(deleted=[m["original_path"] for m in moved])
         
         return {
             "moved": moved,
@@ -90,7 +124,8 @@ class TrashService:
         }
     
     def list_trash(self, page: int = 1, page_size: int = 50) -> dict:
-        query = self.db.query(Trash).order_by(Trash.deleted_at.desc())
+        # 已排队等待后台删除的条目不再显示
+        query = self.db.query(Trash).filter(_not_queued()).order_by(Trash.deleted_at.desc())
         
         total = query.count()
         items = query.offset((page - 1) * page_size).limit(page_size).all()
@@ -151,6 +186,7 @@ class TrashService:
                 failed.append({"id": item_id, "error": str(e)})
         
         self.db.commit()
+        IndexService(self.db).apply_changes(created=[r["restored_path"] for r in restored])
         
         return {
             "restored": restored,
@@ -160,74 +196,122 @@ class TrashService:
             "failed_count": len(failed)
         }
     
+    def _enqueue(self, condition, reason: str) -> int:
+        """把满足条件且尚未排队的条目一次性写入删除队列，返回新增条数。"""
+        now = datetime.utcnow()
+        result = self.db.execute(
+            insert(TrashPurge).from_select(
+                ["trash_id", "reason", "queued_at"],
+                select(Trash.id, literal(reason), literal(now)).where(condition, _not_queued())
+            )
+        )
+        self.db.commit()
+        if result.rowcount:
+            start_purge_worker()
+            _purge_wake.set()
+        return result.rowcount or 0
+    
     def delete_permanently(self, ids: List[int]) -> dict:
-        deleted = []
-        failed = []
-        
-        for item_id in ids:
-            try:
-                trash_item = self.db.query(Trash).filter(Trash.id == item_id).first()
-                
-                if not trash_item:
-                    failed.append({"id": item_id, "error": "回收站记录不存在"})
-                    continue
-                
-                trash_file = Path(trash_item.trash_path)
-                
-                if trash_file.exists():
-                    if trash_file.is_dir():
-                        shutil.rmtree(str(trash_file))
-                    else:
-                        trash_file.unlink()
-                
-                deleted.append({
-                    "id": item_id,
-                    "name": trash_item.name
-                })
-                
-                self.db.delete(trash_item)
-                
-            except Exception as e:
-                failed.append({"id": item_id, "error": str(e)})
+        """排入后台删除队列后立即返回；文件删除进度见 get_purge_status()。"""
+        ids = list(dict.fromkeys(ids))
+        known = set()
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            known.update(tid for (tid,) in self.db.query(Trash.id).filter(Trash.id.in_(chunk)))
+            self._enqueue(Trash.id.in_(chunk), "manual")
         
-        self.db.commit()
+        failed = [{"id": item_id, "error": "回收站记录不存在"} for item_id in ids if item_id not in known]
         
         return {
-            "deleted": deleted,
+            "queued": len(known),
             "failed": failed,
             "total": len(ids),
-            "success_count": len(deleted),
+            "success_count": len(known),
             "failed_count": len(failed)
         }
     
     def empty_trash(self) -> dict:
-        count = 0
+        count = self._enqueue(Trash.id != None, "empty")
+        return {"cleared_count": count, "queued": count}
+    
+    def enforce_retention(self) -> int:
+        """按保留天数和容量上限把最旧的条目排入删除队列，两项都为 0 时不做任何事。"""
+        queued = 0
+        if settings.trash_retention_days > 0:
+            cutoff = datetime.utcnow() - timedelta(days=settings.trash_retention_days)
+            queued += self._enqueue(Trash.deleted_at < cutoff, "retention")
+        
+        cap = int(settings.trash_max_size_gb * 1024 ** 3)
+        if cap > 0:
+            total = self.db.query(func.coalesce(func.sum(Trash.size), 0)).filter(_not_queued()).scalar()
+            excess = total - cap
+            ids = []
+            if excess > 0:
+                rows = self.db.query(Trash.id, Trash.size).filter(_not_queued()).order_by(
+                    Trash.deleted_at.asc()
+                ).all()
+                for tid, size in rows:
+                    if excess <= 0:
+                        break
+                    ids.append(tid)
+                    excess -= size or 0
+            for i in range(0, len(ids), _IN_CHUNK):
+                queued += self._enqueue(Trash.id.in_(ids[i:i + _IN_CHUNK]), "size_cap")
         
-        for item in self.db.query(Trash).all():
+        _purge_status["last_retention_at"] = datetime.now().isoformat()
+        return queued
+    
+    def purge_batch(self) -> int:
+        """从队列取一批删除文件，再用 IN 查询批量清掉 trash 记录和队列项；返回处理条数。"""
+        ids = [tid for (tid,) in self.db.query(TrashPurge.trash_id).order_by(
+            TrashPurge.queued_at, TrashPurge.trash_id
+        ).limit(_PURGE_BATCH)]
+        if not ids:
+            return 0
+        
+        purged = []
+        freed = 0
+        for item in self.db.query(Trash).filter(Trash.id.in_(ids)):
             try:
-                trash_file = Path(item.trash_path)
-                if trash_file.exists():
-                    if trash_file.is_dir():
-                        shutil.rmtree(str(trash_file))
-                    else:
-                        trash_file.unlink()
-                self.db.delete(item)
-                count += 1
-            except Exception:
-                pass
+                _remove_path(item.trash_path)
+            except OSError as e:
+                # 删不掉的条目留在回收站里，只移出队列
+                _purge_status["failed"] += 1
+                _purge_status["last_error"] = f"{item.name}: {e}"
+                continue
+            purged.append(item.id)
+            freed += item.size or 0
         
+        if purged:
+            self.db.query(Trash).filter(Trash.id.in_(purged)).delete(synchronize_session=False)
+        self.db.query(TrashPurge).filter(TrashPurge.trash_id.in_(ids)).delete(synchronize_session=False)
         self.db.commit()
         
-        return {"cleared_count": count}
+        _purge_status["purged"] += len(purged)
+        _purge_status["freed_bytes"] += freed
+        return len(ids)
+    
+    def get_purge_status(self) -> dict:
+        pending = self.db.query(func.count(TrashPurge.trash_id)).scalar()
+        pending_bytes = self.db.query(func.coalesce(func.sum(Trash.size), 0)).join(
+            TrashPurge, TrashPurge.trash_id == Trash.id
+        ).scalar()
+        return {
+            **_purge_status,
+            "pending": pending,
+            "pending_bytes": pending_bytes,
+            "retention_days": settings.trash_retention_days,
+            "max_size_gb": settings.trash_max_size_gb
+        }
     
     def _get_dir_size(self, path: Path) -> int:
+        # 回收站容量按实际占用计算，隐藏目录也要算进去，不能用 AggregateService 的统计口径
         total = 0
-        try:
-            for entry in path.rglob('*'):
-                if entry.is_file():
-                    total += entry.stat().st_size
-        except Exception:
-            pass
+        stack = [str(path)]
+        while stack:
+            info, _ = scan_dir(stack.pop())
+            total += info["size"]
+            stack.extend(info["subdirs"])
         return total
     
     def _format_size(self, size: int) -> str:
@@ -238,4 +322,37 @@ class TrashService:
         elif size < 1024 * 1024 * 1024:
             return f"{size / (1024*1024):.1f} MB"
         else:
-            return f"{size / (1024*1024*1024):.1f} GB"
\ No newline at end of file
+            return f"{size / (1024*1024*1024):.1f} GB"
+
+
+def _purge_loop():
+    next_retention = 0.0
+    while True:
+        db = SessionLocal()
+        try:
+            service = TrashService(db)
+            if time.monotonic() >= next_retention:
+                service.enforce_retention()
+                next_retention = time.monotonic() + _RETENTION_INTERVAL
+            _purge_status["running"] = True
+            while service.purge_batch():
+                pass
+        except Exception as e:
+            db.rollback()
+            _purge_status["last_error"] = str(e)
+            print(f"[回收站] 清理失败: {e}")
+        finally:
+            _purge_status["running"] = False
+            db.close()
+        _purge_wake.wait(_RETENTION_INTERVAL)
+        _purge_wake.clear()
+
+
+def start_purge_worker():
+    """启动回收站后台清理线程：处理删除队列，并每小时按保留策略检查一次。"""
+    global _purge_thread
+    with _purge_lock:
+        if _purge_thread and _purge_thread.is_alive():
+            return
+        _purge_thread = threading.Thread(target=_purge_loop, name="trash-purge", daemon=True)
+        _purge_thread.start()
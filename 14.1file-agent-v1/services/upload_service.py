@@ -1,15 +1,47 @@
 import os
 import shutil
 import uuid
+import hashlib
 import aiofiles
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.config import settings
-from app.database import OperationLog
+from app.database import UploadSession, UploadPart
+from services.index_service import IndexService, UPLOAD_TEMP_SUFFIX
+from services.oplog import log_operation
+
+
+_WRITE_BUFFER = 1024 * 1024
+
+
+def _preallocate(fd: int, size: int):
+    """预分配分片上传的临时文件，避免并发写入时文件反复扩展产生碎片。"""
+    if size <= 0:
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Windows 或不支持 fallocate 的文件系统：退化成稀疏文件
+        os.ftruncate(fd, size)
+
+
+def _write_at(fd: int, data: bytes, offset: int):
+    """按偏移写入，各分片互不干扰；没有 pwrite 的平台每个分片各用一个 fd，seek 后写入。"""
+    view = memoryview(data)
+    if hasattr(os, "pwrite"):
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+        return
+    os.lseek(fd, offset, os.SEEK_SET)
+    while view:
+        view = view[os.write(fd, view):]
 
 
 class UploadService:
@@ -43,7 +75,7 @@ class UploadService:
         except Exception:
             return False
     
-    async def upload_file(self, file: UploadFile, target_path: Optional[str] = None) -> dict:
+    def _resolve_target_dir(self, target_path: Optional[str]) -> Path:
         if target_path:
             target_dir = Path(target_path)
         else:
@@ -53,8 +85,10 @@ class UploadService:
             target_dir = self.uploads_path
         
         target_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = target_dir / file.filename
+        return target_dir
+    
+    def _unique_path(self, target_dir: Path, filename: str) -> Path:
+        file_path = target_dir / filename
         if file_path.exists():
             base = file_path.stem
             ext = file_path.suffix
@@ -62,6 +96,11 @@ class UploadService:
             while file_path.exists():
                 file_path = target_dir / f"{base} ({counter}){ext}"
                 counter += 1
+        return file_path
+    
+    async def upload_file(self, file: UploadFile, target_path: Optional[str] = None) -> dict:
+        target_dir = self._resolve_target_dir(target_path)
+        file_path = self._unique_path(target_dir, file.filename)
         
         total_size = 0
         async with aiofiles.open(file_path, 'wb') as f:
@@ -79,6 +118,7 @@ class UploadService:
                 await f.write(chunk)
         
         stat = file_path.stat()
+        await run_in_threadpool(IndexService(self.db).apply_changes, created=[str(file_path)])
         
         self._log_operation("upload", str(file_path), f"size: {total_size}")
         
@@ -111,11 +151,201 @@ class UploadService:
             "failed_count": len(failed)
         }
     
-    def _log_operation(self, action: str, file_path: str, details: str = None):
-        log = OperationLog(
-            action=action,
-            file_path=file_path,
-            details=details
+    # ---------- 分片上传 ----------
+    
+    def _session_info(self, session: UploadSession) -> dict:
+        parts = self.db.query(UploadPart.part_number).filter(
+            UploadPart.session_id == session.id
+        ).order_by(UploadPart.part_number).all()
+        return {
+            "upload_id": session.id,
+            "filename": session.filename,
+            "target_path": session.target_dir,
+            "size": session.size,
+            "part_size": session.part_size,
+            "total_parts": session.total_parts,
+            "uploaded_parts": [p.part_number for p in parts],
+            "parallel": max(1, settings.upload_parallel_parts),
+        }
+    
+    def _get_session(self, upload_id: str) -> UploadSession:
+        session = self.db.query(UploadSession).filter(UploadSession.id == upload_id).first()
+        if not session:
+            raise ValueError("上传会话不存在或已过期")
+        return session
+    
+    def _discard_session(self, session: UploadSession):
+        try:
+            os.remove(session.temp_path)
+        except OSError:
+            pass
+        self.db.query(UploadPart).filter(UploadPart.session_id == session.id).delete(synchronize_session=False)
+        self.db.delete(session)
+    
+    def _purge_expired_sessions(self):
+        expire_before = datetime.utcnow() - timedelta(hours=settings.upload_session_expire_hours)
+        expired = self.db.query(UploadSession).filter(UploadSession.updated_at < expire_before).all()
+        for session in expired:
+            self._discard_session(session)
+        if expired:
+            self.db.commit()
+    
+    def init_upload(self, filename: str, size: int, target_path: Optional[str] = None,
+                    part_size: Optional[int] = None, fingerprint: Optional[str] = None) -> dict:
+        """
+        创建分片上传会话，返回已收到的分片号。
+
+        只有客户端给出指纹、且同一目录下有同名同大小同指纹的未完成会话时才续传；
+        同名同大小但内容不同（改过的文件、另一个客户端同时上传）各开新会话和临时文件，
+        不会把新旧分片拼进同一个文件。
+        """
+        filename = Path(filename or "").name
+        if not filename:
+            raise ValueError("文件名不能为空")
+        if size < 0:
+            raise ValueError("文件大小无效")
+        if size > self.max_size:
+            raise ValueError(f"文件大小超过限制 ({settings.max_upload_size_mb}MB)")
+        
+        self._purge_expired_sessions()
+        target_dir = self._resolve_target_dir(target_path)
+        
+        fingerprint = (fingerprint or "").strip()[:128] or None
+        if fingerprint:
+            existing = self.db.query(UploadSession).filter(
+                UploadSession.target_dir == str(target_dir),
+                UploadSession.filename == filename,
+                UploadSession.size == size,
+                UploadSession.fingerprint == fingerprint
+            ).first()
+            if existing and os.path.exists(existing.temp_path):
+                return self._session_info(existing)
+            if existing:
+                self._discard_session(existing)
+        
+        part_size = part_size or settings.upload_chunk_size_mb * 1024 * 1024
+        part_size = min(max(part_size, 256 * 1024), 64 * 1024 * 1024)
+        upload_id = uuid.uuid4().hex
+        # 临时文件放在目标目录里，完成时同盘 rename，不用再拷贝一遍
+        temp_path = target_dir / f".{upload_id}{UPLOAD_TEMP_SUFFIX}"
+        
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0))
+        try:
+            _preallocate(fd, size)
+        finally:
+            os.close(fd)
+        
+        session = UploadSession(
+            id=upload_id,
+            filename=filename,
+            target_dir=str(target_dir),
+            temp_path=str(temp_path),
+            size=size,
+            part_size=part_size,
+            total_parts=max(1, -(-size // part_size)),
+            fingerprint=fingerprint
         )
-        self.db.add(log)
-        self.db.commit()
\ No newline at end of file
+        self.db.add(session)
+        self.db.commit()
+        return self._session_info(session)
+    
+    def get_upload_status(self, upload_id: str) -> dict:
+        return self._session_info(self._get_session(upload_id))
+    
+    async def write_part(self, upload_id: str, part_number: int, chunks: AsyncIterator[bytes],
+                         checksum: Optional[str] = None) -> dict:
+        """
+        把请求体直接写到临时文件的对应偏移处，边写边算 SHA-256。
+        会话在并行上传途中被合并、取消或过期清理时抛 FileNotFoundError，客户端据此停止重试。
+        """
+        try:
+            session = self._get_session(upload_id)
+        except ValueError:
+            raise FileNotFoundError("上传会话已结束或已过期")
+        if not 1 <= part_number <= session.total_parts:
+            raise ValueError("分片序号无效")
+        
+        offset = (part_number - 1) * session.part_size
+        expected = min(session.part_size, session.size - offset)
+        hasher = hashlib.sha256()
+        written = 0
+        buffer = bytearray()
+        
+        try:
+            fd = await run_in_threadpool(os.open, session.temp_path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+        except OSError:
+            raise FileNotFoundError("上传会话已结束或已过期")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if written + len(buffer) + len(chunk) > expected:
+                    raise ValueError("分片大小与会话不符")
+                hasher.update(chunk)
+                buffer += chunk
+                if len(buffer) >= _WRITE_BUFFER:
+                    await run_in_threadpool(_write_at, fd, bytes(buffer), offset + written)
+                    written += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await run_in_threadpool(_write_at, fd, bytes(buffer), offset + written)
+                written += len(buffer)
+        finally:
+            os.close(fd)
+        
+        if written != expected:
+            raise ValueError("分片数据不完整")
+        digest = hasher.hexdigest()
+        if checksum and checksum.lower() != digest:
+            raise ValueError("分片校验失败")
+        
+        # 写入期间会话可能已被合并或取消，此时不再记录分片
+        if not self.db.query(UploadSession.id).filter(UploadSession.id == upload_id).first():
+            raise FileNotFoundError("上传会话已结束或已过期")
+        
+        part = self.db.query(UploadPart).filter(
+            UploadPart.session_id == upload_id,
+            UploadPart.part_number == part_number
+        ).first()
+        if not part:
+            part = UploadPart(session_id=upload_id, part_number=part_number)
+            self.db.add(part)
+        part.size = written
+        part.checksum = digest
+        session.updated_at = datetime.utcnow()
+        self.db.commit()
+        
+        return {"part_number": part_number, "size": written, "checksum": digest}
+    
+    def complete_upload(self, upload_id: str) -> dict:
+        session = self._get_session(upload_id)
+        received = self.db.query(UploadPart).filter(UploadPart.session_id == upload_id).count()
+        if received < session.total_parts:
+            raise ValueError(f"还有 {session.total_parts - received} 个分片未上传")
+        
+        total_parts = session.total_parts
+        file_path = self._unique_path(Path(session.target_dir), session.filename)
+        os.replace(session.temp_path, file_path)
+        
+        self.db.query(UploadPart).filter(UploadPart.session_id == upload_id).delete(synchronize_session=False)
+        self.db.delete(session)
+        self.db.commit()
+        
+        stat = file_path.stat()
+        IndexService(self.db).apply_changes(created=[str(file_path)])
+        
+        self._log_operation("upload", str(file_path), f"size: {stat.st_size}, parts: {total_parts}")
+        
+        return {
+            "name": file_path.name,
+            "path": str(file_path),
+            "size": stat.st_size,
+            "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+        }
+    
+    def abort_upload(self, upload_id: str):
+        self._discard_session(self._get_session(upload_id))
+        self.db.commit()
+    
+    def _log_operation(self, action: str, file_path: str, details: str = None):
+        log_operation(action, file_path, details)
\ No newline at end of file
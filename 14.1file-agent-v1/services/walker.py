@@ -0,0 +1,152 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Optional
+
+from app.config import settings
+
+
+def scan_dir(dir_path: str, skip_dir: Optional[Callable[[str, str], bool]] = None,
+             with_sizes: bool = True, match: Optional[Callable] = None):
+    """
+    扫描单个目录（不递归），返回 (info, matches)。
+
+    info 为 {"files", "dirs", "size", "mtime", "subdirs"}；目录不可读时 mtime 为 None。
+    """
+    subdirs = []
+    files = 0
+    size = 0
+    matches = []
+    mtime = None
+
+    try:
+        mtime = os.stat(dir_path).st_mtime
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if skip_dir and skip_dir(entry.path, entry.name):
+                            continue
+                        subdirs.append(entry.path)
+                        continue
+                    if with_sizes:
+                        size += entry.stat().st_size
+                except OSError:
+                    continue
+                files += 1
+                if match:
+                    item = match(dir_path, entry)
+                    if item is not None:
+                        matches.append(item)
+    except OSError:
+        pass
+
+    return {
+        "files": files,
+        "dirs": len(subdirs),
+        "size": size,
+        "mtime": mtime,
+        "subdirs": subdirs
+    }, matches
+
+
+class WalkResult:
+    """一次遍历的结果。"""
+
+    def __init__(self):
+        self.matches: List = []
+        self.scanned = 0
+        self.found = 0
+        self.truncated = False
+        self.timed_out = False
+
+    @property
+    def complete(self) -> bool:
+        return not (self.truncated or self.timed_out)
+
+
+class DirectoryWalker:
+    """
+    基于 os.scandir 的并行目录遍历，供未建索引时的实时搜索使用；
+    目录统计缓存（AggregateService）复用同一个 scan_dir。
+
+    每个根目录（挂载点）各用一个线程池，按目录粒度分发；
+    达到 max_results 或超出 time_budget 时提前结束，未完成的任务直接取消。
+
+    skip_dir(path, name) 返回 True 的目录不进入；
+    match(dir_path, entry) 返回非 None 时计入 matches；
+    给了 collect 时命中项改为在调用 walk() 的线程中逐个交给 collect（如 TopK），不存入 matches，
+    也不按 max_results 截断，只受 time_budget 限制。
+    """
+
+    def __init__(self, skip_dir: Optional[Callable[[str, str], bool]] = None,
+                 match: Optional[Callable] = None,
+                 with_sizes: bool = True,
+                 max_results: Optional[int] = None,
+                 time_budget: Optional[float] = None,
+                 workers: Optional[int] = None,
+                 progress_callback: Optional[Callable] = None,
+                 collect: Optional[Callable] = None):
+        self.skip_dir = skip_dir
+        self.match = match
+        self.with_sizes = with_sizes
+        self.max_results = max_results
+        self.time_budget = settings.walk_time_budget_seconds if time_budget is None else time_budget
+        self.workers = max(1, workers or settings.walk_workers)
+        self.progress_callback = progress_callback
+        self.collect = collect
+
+    def _scan(self, dir_path: str):
+        info, matches = scan_dir(dir_path, self.skip_dir, self.with_sizes, self.match)
+        return dir_path, info, matches
+
+    def walk(self, roots: List[str]) -> WalkResult:
+        result = WalkResult()
+        deadline = time.monotonic() + self.time_budget if self.time_budget else None
+
+        pools = {}
+        pending = {}
+        for root in roots:
+            root = str(root)
+            if root in pools or not os.path.isdir(root):
+                continue
+            if self.skip_dir and self.skip_dir(root, os.path.basename(root)):
+                continue
+            pools[root] = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="walk")
+            pending[pools[root].submit(self._scan, root)] = root
+
+        try:
+            while pending:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        result.timed_out = True
+                        break
+
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    root = pending.pop(future)
+                    dir_path, info, matches = future.result()
+                    result.scanned += 1
+                    result.found += len(matches)
+                    if self.collect:
+                        for item in matches:
+                            self.collect(item)
+                    else:
+                        result.matches.extend(matches)
+                    for sub in info["subdirs"]:
+                        pending[pools[root].submit(self._scan, sub)] = root
+
+                    if self.progress_callback and result.scanned % 100 == 0:
+                        self.progress_callback(f"正在扫描: {dir_path}", result.found)
+
+                if self.max_results is not None and len(result.matches) >= self.max_results:
+                    result.truncated = bool(pending)
+                    del result.matches[self.max_results:]
+                    break
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        return result
@@ -0,0 +1,282 @@
+import os
+import sys
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+import time
+from typing import Dict, List
+
+from app.config import settings
+from app.database import File, SessionLocal
+from services.index_service import IndexService, path_range, should_skip_dir, run_incremental_index
+
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct("iIII")
+_DEBOUNCE_SECONDS = 0.2
+_MAX_BATCH_SECONDS = 1.0
+
+
+class InotifyWatcher:
+    """
+    基于 inotify 的目录监听（仅 Linux）。
+
+    inotify 不支持递归，每个已索引目录各挂一个 watch；事件攒成一小批后
+    交给 IndexService.apply_ops 就地更新索引，不再遍历目录树。
+    """
+
+    def __init__(self, roots: List[str]):
+        self.roots = roots
+        self.excluded_dirs = settings.excluded_dirs
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._wd_paths: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _add_watch(self, path: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "inotify watch 数量已达上限 (fs.inotify.max_user_watches)")
+            return
+        self._wd_paths[wd] = path
+
+    def _add_tree(self, path: str):
+        """给新出现的目录及其子目录挂 watch。"""
+        for dirpath, dirnames, _ in os.walk(path):
+            if should_skip_dir(dirpath, self.excluded_dirs):
+                dirnames[:] = []
+                continue
+            self._add_watch(dirpath)
+
+    def _rename_watches(self, old_path: str, new_path: str):
+        prefix = old_path + os.sep
+        for wd, path in list(self._wd_paths.items()):
+            if path == old_path:
+                self._wd_paths[wd] = new_path
+            elif path.startswith(prefix):
+                self._wd_paths[wd] = new_path + path[len(old_path):]
+
+    def start(self):
+        """按索引中的目录列表挂 watch；超出系统上限时抛 OSError，由调用方退回轮询。"""
+        db = SessionLocal()
+        try:
+            for root in self.roots:
+                self._add_watch(root)
+                for (path,) in db.query(File.path).filter(File.is_dir == True, path_range(File.path, root)):
+                    self._add_watch(path)
+        except OSError:
+            self.close()
+            raise
+        finally:
+            db.close()
+
+        self._thread = threading.Thread(target=self._run, name="index-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        ops = []
+        pending_moves: Dict[int, str] = {}
+        batch_started = None
+
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], _DEBOUNCE_SECONDS)
+
+                if ready:
+                    try:
+                        data = os.read(self._fd, 64 * 1024)
+                    except BlockingIOError:
+                        data = b""
+                    if batch_started is None:
+                        batch_started = time.monotonic()
+                    self._parse(data, ops, pending_moves)
+
+                idle = not ready
+                overdue = batch_started is not None and time.monotonic() - batch_started > _MAX_BATCH_SECONDS
+                if (idle or overdue) and (ops or pending_moves):
+                    # 没配上 MOVED_TO 的 MOVED_FROM 说明被移出了监听范围
+                    ops.extend(("remove", path) for path in pending_moves.values())
+                    pending_moves.clear()
+                    self._flush(ops)
+                    ops = []
+                    batch_started = None
+        except OSError as e:
+            # 运行中给新目录挂 watch 超出上限：已收到的变更先写入，之后交给轮询
+            ops.extend(("remove", path) for path in pending_moves.values())
+            self._flush(ops)
+            _switch_to_polling(self, e)
+        finally:
+            self.close()
+
+    def _parse(self, data: bytes, ops: list, pending_moves: Dict[int, str]):
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            raw_name = data[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + length]
+            offset += _EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出，丢了什么不得而知，整体做一次增量对账
+                threading.Thread(target=run_incremental_index, daemon=True).start()
+                continue
+
+            if mask & IN_IGNORED:
+                self._wd_paths.pop(wd, None)
+                continue
+
+            base = self._wd_paths.get(wd)
+            if base is None:
+                continue
+            name = os.fsdecode(raw_name.rstrip(b"\0"))
+            path = os.path.join(base, name) if name else base
+            is_dir = bool(mask & IN_ISDIR)
+
+            if is_dir and should_skip_dir(path, self.excluded_dirs):
+                continue
+
+            if mask & IN_CREATE:
+                if is_dir:
+                    self._add_tree(path)
+                ops.append(("upsert", path))
+            elif mask & IN_CLOSE_WRITE:
+                ops.append(("upsert", path))
+            elif mask & IN_DELETE:
+                ops.append(("remove", path))
+            elif mask & IN_MOVED_FROM:
+                pending_moves[cookie] = path
+            elif mask & IN_MOVED_TO:
+                old_path = pending_moves.pop(cookie, None)
+                if old_path is not None:
+                    if is_dir:
+                        self._rename_watches(old_path, path)
+                    ops.append(("move", old_path, path))
+                else:
+                    if is_dir:
+                        self._add_tree(path)
+                    ops.append(("upsert", path))
+
+    def _flush(self, ops: list):
+        db = SessionLocal()
+        try:
+            IndexService(db).apply_ops(ops)
+        finally:
+            db.close()
+
+
+class PollingWatcher:
+    """
+    没有 inotify 时的退路：定时跑一轮按目录 mtime 的增量索引。
+
+    每轮都要 stat 全部已索引目录，目录多时一轮可能要几十秒并占满磁盘 IO，
+    所以默认间隔（watch_poll_seconds）取 5 分钟，变更最长延迟这么久才进索引。
+    """
+
+    def __init__(self, roots: List[str], interval: float):
+        self.roots = roots
+        self.interval = max(1.0, interval)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="index-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            run_incremental_index()
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _switch_to_polling(failed: InotifyWatcher, reason: OSError):
+    """inotify 监听中途失效时换成轮询，并立即补一轮增量索引。"""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not failed:
+            return
+        print(f"[监听] inotify 监听中断，改为轮询: {reason}")
+        _watcher = PollingWatcher(failed.roots, settings.watch_poll_seconds)
+        _watcher.start()
+    threading.Thread(target=run_incremental_index, daemon=True).start()
+
+
+def ensure_index_watcher():
+    """为所有已索引的根目录启动监听；根目录集合变化时重建。"""
+    global _watcher
+
+    db = SessionLocal()
+    try:
+        roots = sorted(r for r in IndexService(db).indexed_roots() if os.path.isdir(r))
+    finally:
+        db.close()
+
+    with _watcher_lock:
+        if _watcher is not None and _watcher.is_alive() and _watcher.roots == roots:
+            return _watcher
+        if _watcher is not None:
+            _watcher.stop()
+            _watcher = None
+        if not roots:
+            return None
+
+        watcher = None
+        if sys.platform.startswith("linux"):
+            try:
+                watcher = InotifyWatcher(roots)
+                watcher.start()
+            except OSError as e:
+                print(f"[监听] inotify 不可用，改为轮询: {e}")
+                watcher = None
+
+        if watcher is None:
+            watcher = PollingWatcher(roots, settings.watch_poll_seconds)
+            watcher.start()
+
+        _watcher = watcher
+        return _watcher
+
+
+def get_watcher_status() -> dict:
+    watcher = _watcher
+    if watcher is None or not watcher.is_alive():
+        return {"mode": None, "roots": []}
+    mode = "inotify" if isinstance(watcher, InotifyWatcher) else "polling"
+    return {"mode": mode, "roots": watcher.roots}
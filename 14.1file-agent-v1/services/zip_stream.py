@@ -0,0 +1,109 @@
+import os
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+
+# 本身已压缩的格式直接存储，再 deflate 只浪费 CPU
+STORED_EXTS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp4', '.mkv', '.mov', '.avi', '.webm', '.wmv', '.flv', '.m4v',
+    '.mp3', '.m4a', '.aac', '.ogg', '.flac', '.wma',
+    '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz', '.zst',
+    '.docx', '.xlsx', '.pptx', '.jar', '.apk',
+}
+
+_READ_CHUNK = 1024 * 1024
+_FLUSH_SIZE = 1024 * 1024
+
+
+class _StreamBuffer:
+    """只支持 write/tell 的输出对象，zipfile 检测到不可 seek 后会改用数据描述符逐项写出。"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pending = 0
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._pending += len(data)
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self):
+        pass
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self._pending = 0
+        return data
+
+
+def collect_entries(paths: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """把选中的文件/文件夹展开成 (磁盘路径, 压缩包内路径)，文件夹保留自身一级目录名。"""
+    for path in paths:
+        file_path = Path(path)
+        if file_path.is_file():
+            yield str(file_path), file_path.name
+        elif file_path.is_dir():
+            for root, dirs, files in os.walk(file_path):
+                for name in files:
+                    full_path = Path(root) / name
+                    yield str(full_path), str(full_path.relative_to(file_path.parent))
+
+
+def iter_zip(entries: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    边读边压缩地生成 zip 字节流，第一个文件读到就开始输出，不落临时文件。
+
+    已压缩格式用 ZIP_STORED；单个文件或整体超过 4GB 时 zipfile 自动写 ZIP64 结构。
+    """
+    buf = _StreamBuffer()
+    with zipfile.ZipFile(buf, "w", allowZip64=True) as zf:
+        for file_path, arcname in entries:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+
+            zinfo = zipfile.ZipInfo(arcname.replace(os.sep, "/"), time.localtime(st.st_mtime)[:6])
+            zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+            zinfo.file_size = st.st_size
+            if os.path.splitext(arcname)[1].lower() in STORED_EXTS:
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+
+            try:
+                src = open(file_path, "rb")
+            except OSError:
+                # 还没写出任何字节，跳过这个文件即可
+                continue
+
+            # 打开之后再读失败时条目已经写了一半，继续下去会得到一个"完好"但内容被截断的
+            # 压缩包；直接抛出让响应中断，客户端看到的是下载失败
+            with src, zf.open(zinfo, "w") as dest:
+                while True:
+                    chunk = src.read(_READ_CHUNK)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    if buf.pending >= _FLUSH_SIZE:
+                        yield buf.drain()
+
+            if buf.pending:
+                yield buf.drain()
+
+    if buf.pending:
+        yield buf.drain()
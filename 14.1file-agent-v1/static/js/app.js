@@ -2,6 +2,7 @@ let currentPath = '';
 let files = [];
 let selectedFiles = [];
 let pendingUploadFiles = [];
+let filesNextCursor = null;
 let isAuthenticated = false;
 let mounts = [];
 let currentMount = null;
@@ -68,6 +69,7 @@ async function loadFiles(path = '') {
         
         const data = await res.json();
         files = data.files || [];
+        filesNextCursor = data.next_cursor || null;
         renderBreadcrumb(data.breadcrumb || []);
         renderFiles(files);
     } catch (e) {
@@ -75,6 +77,22 @@ async function loadFiles(path = '') {
     }
 }
 
+async function loadMoreFiles() {
+    if (!filesNextCursor) return;
+    
+    try {
+        const res = await apiCall(`/api/files?path=${encodeURIComponent(currentPath)}&cursor=${encodeURIComponent(filesNextCursor)}`);
+        if (!res) return;
+        
+        const data = await res.json();
+        files = files.concat(data.files || []);
+        filesNextCursor = data.next_cursor || null;
+        renderFiles(files);
+    } catch (e) {
+        showToast('加载失败', 'error');
+    }
+}
+
 function renderBreadcrumb(items) {
     const el = document.getElementById('breadcrumb');
     el.innerHTML = items.map((item, i) => {
@@ -95,7 +113,7 @@ function renderFiles(files) {
         <div class="file-item ${selectedFiles.includes(f.path) ? 'selected' : ''}" data-path="${escapeAttr(f.path)}">
             <label class="checkbox"><input type="checkbox" ${selectedFiles.includes(f.path) ? 'checked' : ''} onchange="toggleSelect('${escapeAttr(f.path)}')"></label>
             <div class="file-name" onclick="${f.is_dir ? `navigateToPath(this)` : `previewFileByEl(this)`}">
-                <span class="file-icon">${getFileIcon(f.ext, f.is_dir)}</span>
+                <span class="file-icon">${getFileThumb(f)}</span>
                 ${escapeHtml(f.name)}
                 ${f.mount_name ? `<span class="mount-tag">${escapeHtml(f.mount_name)}</span>` : ''}
             </div>
@@ -106,7 +124,11 @@ function renderFiles(files) {
                 ${!isReadonlyPath ? `<button class="btn-sm btn-danger" onclick="deleteByPath('${escapeAttr(f.path)}')">🗑️</button>` : ''}
             </div>
         </div>
-    `).join('');
+    `).join('') + (filesNextCursor ? `
+        <div style="padding:16px;text-align:center;">
+            <button class="btn-sm" onclick="loadMoreFiles()">加载更多</button>
+        </div>
+    ` : '');
 }
 
 function escapeAttr(str) {
@@ -145,6 +167,15 @@ function getFileIcon(ext, isDir) {
     return icons[ext] || '📄';
 }
 
+const THUMB_EXTS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'];
+
+function getFileThumb(f) {
+    if (f.is_dir || !THUMB_EXTS.includes(f.ext)) return getFileIcon(f.ext, f.is_dir);
+    // 带上修改时间和大小作版本号，图片改过之后 URL 随之变化，不会命中浏览器里的旧缩略图
+    const version = encodeURIComponent(`${f.modified_at || ''}-${f.size || 0}`);
+    return `<img class="file-thumb" src="/api/preview/thumb?path=${encodeURIComponent(f.path)}&v=${version}" loading="lazy" alt="" onerror="this.outerHTML='🖼️'">`;
+}
+
 function formatSize(bytes) {
     if (!bytes) return '-';
     if (bytes < 1024) return bytes + ' B';
@@ -283,34 +314,139 @@ async function doUploadFiles() {
     // 立即提示，确认按钮已生效
     showToast(`开始上传 ${pendingUploadFiles.length} 个文件...`, '');
 
-    const formData = new FormData();
-    pendingUploadFiles.forEach(file => formData.append('files', file));
-    formData.append('target_path', currentPath);
-    
+    const files = pendingUploadFiles.slice();
+    const targetPath = currentPath;
+    // 所有文件的分片共用一个并发池，大文件和小文件一起排队
+    const limit = createLimiter(UPLOAD_DEFAULT_PARALLEL);
+    let finishedParts = 0;
+    const onPart = () => {
+        finishedParts++;
+        if (finishedParts % 10 === 0) {
+            showToast(`已上传 ${finishedParts} 个分片...`, '');
+        }
+    };
+
+    const results = await Promise.allSettled(
+        files.map(file => uploadFileChunked(file, targetPath, limit, onPart))
+    );
+    const successCount = results.filter(r => r.status === 'fulfilled').length;
+    const failed = results.filter(r => r.status === 'rejected');
+
+    if (successCount > 0 && failed.length === 0) {
+        showToast(`上传成功 ${successCount} 个文件`, 'success');
+        closeModal('upload-modal');
+    } else if (successCount > 0) {
+        showToast(`上传成功 ${successCount} 个，失败 ${failed.length} 个: ${failed[0].reason.message || ''}`, 'error');
+    } else {
+        showToast('上传失败: ' + (failed[0].reason.message || ''), 'error');
+    }
+    if (successCount > 0) {
+        loadFiles(currentPath);
+    }
+}
+
+const UPLOAD_DEFAULT_PARALLEL = 4;
+const UPLOAD_PART_RETRIES = 3;
+
+function createLimiter(limit) {
+    let active = 0;
+    const queue = [];
+    const next = () => {
+        if (active >= limit || queue.length === 0) return;
+        active++;
+        const { task, resolve, reject } = queue.shift();
+        task().then(resolve, reject).finally(() => {
+            active--;
+            next();
+        });
+    };
+    const run = task => new Promise((resolve, reject) => {
+        queue.push({ task, resolve, reject });
+        next();
+    });
+    run.setLimit = value => {
+        limit = Math.max(1, value);
+        next();
+    };
+    return run;
+}
+
+async function readJson(res, fallback) {
+    let data = {};
     try {
-        const res = await apiCall('/api/files/upload', { method: 'POST', body: formData });
-        if (!res) return;
-        
-        let data;
+        data = await res.json();
+    } catch (e) {
+        throw new Error(fallback);
+    }
+    if (!res.ok) {
+        const err = new Error(data.detail || fallback);
+        err.status = res.status;
+        throw err;
+    }
+    return data;
+}
+
+async function sha256Hex(blob) {
+    // crypto.subtle 只在 HTTPS / localhost 下可用，其余情况由服务端计算后返回
+    if (!(window.crypto && crypto.subtle)) return null;
+    const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function uploadPart(uploadId, partNumber, blob) {
+    const checksum = await sha256Hex(blob);
+    const headers = { 'Content-Type': 'application/octet-stream' };
+    if (checksum) headers['X-Part-Checksum'] = checksum;
+
+    for (let attempt = 1; ; attempt++) {
         try {
-            data = await res.json();
+            const res = await apiCall(`/api/files/upload/${uploadId}/parts/${partNumber}`, {
+                method: 'PUT', headers, body: blob
+            });
+            if (!res) throw new Error('未登录');
+            return await readJson(res, `分片 ${partNumber} 上传失败`);
         } catch (e) {
-            showToast('上传失败：返回数据格式异常', 'error');
-            return;
-        }
-        
-        if (data.success_count > 0) {
-            showToast(`上传成功 ${data.success_count} 个文件`, 'success');
-            closeModal('upload-modal');
-            loadFiles(currentPath);
-        } else {
-            showToast('上传失败', 'error');
+            // 410：会话已合并、取消或过期，重试也没用
+            if (e.status === 410 || attempt >= UPLOAD_PART_RETRIES) throw e;
+            await new Promise(resolve => setTimeout(resolve, 500 * attempt));
         }
-    } catch (e) {
-        showToast('上传失败: ' + (e.message || ''), 'error');
     }
 }
 
+async function uploadFingerprint(file) {
+    // 修改时间和开头 1MB 的哈希都对得上才认为是同一个文件，改过的同名同大小文件不会续到旧会话上
+    const meta = `${file.size}|${file.lastModified}|${file.name}`;
+    const head = await sha256Hex(file.slice(0, 1024 * 1024));
+    return head ? await sha256Hex(new Blob([`${meta}|${head}`])) : meta;
+}
+
+async function uploadFileChunked(file, targetPath, limit, onPart) {
+    const form = new FormData();
+    form.append('filename', file.name);
+    form.append('size', file.size);
+    form.append('target_path', targetPath);
+    form.append('fingerprint', await uploadFingerprint(file));
+    const initRes = await apiCall('/api/files/upload/init', { method: 'POST', body: form });
+    if (!initRes) throw new Error('未登录');
+    const session = await readJson(initRes, `${file.name} 初始化上传失败`);
+    if (session.parallel) limit.setLimit(session.parallel);
+
+    // 续传：指纹一致时服务端才会返回已收到的分片，跳过即可
+    const done = new Set(session.uploaded_parts || []);
+    const tasks = [];
+    for (let n = 1; n <= session.total_parts; n++) {
+        if (done.has(n)) continue;
+        const start = (n - 1) * session.part_size;
+        const blob = file.slice(start, Math.min(start + session.part_size, file.size));
+        tasks.push(limit(() => uploadPart(session.upload_id, n, blob)).then(onPart));
+    }
+    await Promise.all(tasks);
+
+    const res = await apiCall(`/api/files/upload/${session.upload_id}/complete`, { method: 'POST' });
+    if (!res) throw new Error('未登录');
+    return (await readJson(res, `${file.name} 合并失败`)).file;
+}
+
 function showNewFolderModal() {
     if (!isAuthenticated) {
         showToast('请先登录', 'error');
@@ -417,10 +553,8 @@ async function previewFile(path) {
         title.textContent = data.filename || '预览';
         
         if (data.type === 'image') {
-            if (data.data) {
-                body.innerHTML = `<img src="${data.data}" alt="${data.filename}" style="max-width:100%;max-height:80vh;">`;
-            } else if (data.url) {
-                body.innerHTML = `<img src="${data.url}" alt="${data.filename}">`;
+            if (data.url) {
+                body.innerHTML = `<img src="${data.url}" alt="${data.filename}" style="max-width:100%;max-height:80vh;">`;
             } else {
                 body.innerHTML = `<p style="color:var(--text-dim);">无法加载图片</p>`;
             }
@@ -453,6 +587,7 @@ async function searchFiles() {
         const data = await res.json();
         
         files = data.results || [];
+        filesNextCursor = null;
         renderBreadcrumb([{ name: `搜索: ${keyword}`, path: '' }]);
         renderFiles(files);
     } catch (e) {
@@ -468,6 +603,7 @@ async function searchByType(type) {
         const data = await res.json();
         
         files = data.results || [];
+        filesNextCursor = null;
         const typeNames = { image: '图片', video: '视频', document: '文档', audio: '音频' };
         renderBreadcrumb([{ name: typeNames[type] || type, path: '' }]);
         renderFiles(files);
@@ -574,8 +710,9 @@ async function deletePermanently(id) {
         if (data.success_count > 0) {
             showToast('已永久删除', 'success');
             showTrash();
+            pollPurgeStatus();
         } else {
-            showToast('删除失败', 'error');
+            showToast(data.failed?.[0]?.error || '删除失败', 'error');
         }
     } catch (e) {
         showToast('删除失败', 'error');
@@ -592,13 +729,37 @@ async function emptyTrash() {
         if (!res) return;
         
         const data = await res.json();
-        showToast(`已清空 ${data.cleared_count} 个文件`, 'success');
+        showToast(`已清空 ${data.cleared_count} 个文件，正在后台释放空间`, 'success');
         showTrash();
+        pollPurgeStatus();
     } catch (e) {
         showToast('清空失败', 'error');
     }
 }
 
+let purgePollTimer = null;
+
+async function pollPurgeStatus() {
+    // 删除在后台进行，这里只负责提示剩余数量
+    if (purgePollTimer) return;
+    const tick = async () => {
+        try {
+            const res = await apiCall('/api/trash/purge');
+            if (!res) return;
+            const data = await res.json();
+            if (data.pending > 0) {
+                showToast(`正在删除回收站文件，剩余 ${data.pending} 项（${formatSize(data.pending_bytes)}）`, '');
+                purgePollTimer = setTimeout(tick, 1500);
+                return;
+            }
+        } catch (e) {
+            // 忽略，下次操作时再查
+        }
+        purgePollTimer = null;
+    };
+    purgePollTimer = setTimeout(tick, 1000);
+}
+
 function toggleAgent() {
     document.getElementById('agent-panel').classList.toggle('visible');
 }
@@ -618,8 +779,22 @@ async function sendAgentMsg(text) {
     const messagesEl = document.getElementById('agent-messages');
     messagesEl.innerHTML += `<div class="agent-msg user">${escapeHtml(msg)}</div>`;
     
+    const replyEl = document.createElement('div');
+    replyEl.className = 'agent-msg';
+    replyEl.textContent = '思考中...';
+    messagesEl.appendChild(replyEl);
+    
+    let streamed = '';
+    let liveFiles = [];
+    let renderTimer = null;
+    const showFiles = list => {
+        files = list;
+        filesNextCursor = null;
+        renderFiles(files);
+    };
+    
     try {
-        const res = await apiCall('/api/agent/chat', {
+        const res = await apiCall('/api/agent/chat/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ message: msg, context: { current_path: currentPath } })
@@ -627,16 +802,57 @@ async function sendAgentMsg(text) {
         
         if (!res) return;
         
-        const data = await res.json();
-        messagesEl.innerHTML += `<div class="agent-msg">${escapeHtml(data.reply)}</div>`;
-        messagesEl.scrollTop = messagesEl.scrollHeight;
+        await readEventStream(res, event => {
+            if (event.type === 'progress') {
+                if (!streamed && event.status !== 'idle') replyEl.textContent = event.message;
+            } else if (event.type === 'token') {
+                streamed += event.text;
+                replyEl.textContent = streamed;
+            } else if (event.type === 'file') {
+                // 搜索命中边找边显示，合并到每 300ms 渲染一次
+                liveFiles.push(event.file);
+                if (!renderTimer) {
+                    renderTimer = setTimeout(() => {
+                        renderTimer = null;
+                        showFiles(liveFiles.slice());
+                    }, 300);
+                }
+            } else if (event.type === 'done') {
+                clearTimeout(renderTimer);
+                replyEl.textContent = event.reply;
+                if (event.files && event.files.length > 0) showFiles(event.files);
+            } else if (event.type === 'error') {
+                replyEl.textContent = event.message;
+            }
+            messagesEl.scrollTop = messagesEl.scrollHeight;
+        });
+    } catch (e) {
+        clearTimeout(renderTimer);
+        replyEl.textContent = '请求失败，请重试';
+    }
+}
+
+// EventSource 只支持 GET，POST 返回的 SSE 在这里手动按空行切分
+async function readEventStream(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
         
-        if (data.files && data.files.length > 0) {
-            files = data.files;
-            renderFiles(files);
+        let sep;
+        while ((sep = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            const data = block.split('\n')
+                .filter(line => line.startsWith('data: '))
+                .map(line => line.slice(6))
+                .join('\n');
+            if (data) onEvent(JSON.parse(data));
         }
-    } catch (e) {
-        messagesEl.innerHTML += `<div class="agent-msg">请求失败，请重试</div>`;
     }
 }
 
@@ -648,54 +864,97 @@ function showMoveModal() {
 }
 
 async function loadFolderTree() {
-    const el = document.getElementById('folder-tree');
+    await loadLazyFolderTree('folder-tree', selectMoveTargetByEl);
+}
+
+async function fetchFolderChildren(path, cursor) {
+    let url = `/api/files/folders/children?path=${encodeURIComponent(path)}`;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    const res = await apiCall(url);
+    if (!res) return null;
+    return await res.json();
+}
+
+// 文件夹树按层懒加载：展开时才请求下一层，每层按游标分页
+async function loadLazyFolderTree(containerId, onSelect) {
+    const el = document.getElementById(containerId);
     el.innerHTML = '<div style="padding:10px;color:var(--text-dim);">加载中...</div>';
     
     try {
-        const res = await apiCall('/api/files/folders');
-        if (!res) return;
+        const data = await fetchFolderChildren('', null);
+        if (!data) return;
         
-        const data = await res.json();
-        renderFolderTree(data.folders || []);
+        el.innerHTML = '';
+        const rootItem = document.createElement('div');
+        rootItem.className = 'folder-item selected';
+        rootItem.dataset.path = '';
+        rootItem.style.cssText = 'padding:8px;cursor:pointer;border-radius:4px;';
+        rootItem.textContent = '🏠 根目录';
+        rootItem.onclick = () => onSelect(rootItem);
+        el.appendChild(rootItem);
+        
+        if ((data.folders || []).length === 0) {
+            const empty = document.createElement('div');
+            empty.style.cssText = 'padding:10px;color:var(--text-dim);';
+            empty.textContent = '没有可用的文件夹';
+            el.appendChild(empty);
+            return;
+        }
+        renderFolderLevel(el, '', 0, onSelect, data);
     } catch (e) {
         el.innerHTML = '<div style="padding:10px;color:var(--text-dim);">加载失败</div>';
     }
 }
 
-function renderFolderTree(folders, indent = 0) {
-    const el = document.getElementById('folder-tree');
-    
-    if (folders.length === 0 && indent === 0) {
-        el.innerHTML = '<div style="padding:10px;color:var(--text-dim);">没有可用的文件夹</div>';
-        return;
-    }
-    
-    if (indent === 0) {
-        el.innerHTML = `
-            <div class="folder-item ${selectedMoveTarget === '' ? 'selected' : ''}" 
-                 onclick="selectMoveTarget('')" style="padding:8px;cursor:pointer;border-radius:4px;">
-                🏠 根目录
-            </div>
-        `;
-    }
-    
-    folders.forEach(f => {
-        const isSelected = selectedMoveTarget === f.path;
+function renderFolderLevel(container, path, indent, onSelect, data) {
+    (data.folders || []).forEach(f => {
         const isDisabled = selectedFiles.includes(f.path);
         
-        el.innerHTML += `
-            <div class="folder-item ${isSelected ? 'selected' : ''} ${isDisabled ? 'disabled' : ''}" 
-                 data-path="${escapeAttr(f.path)}"
-                 onclick="${isDisabled ? '' : 'selectMoveTargetByEl(this)'}"
-                 style="padding:8px;padding-left:${16 + indent * 16}px;cursor:${isDisabled ? 'not-allowed' : 'pointer'};border-radius:4px;opacity:${isDisabled ? 0.5 : 1};">
-                📁 ${escapeHtml(f.name)} ${isDisabled ? '(当前选择)' : ''}
-            </div>
-        `;
+        const row = document.createElement('div');
+        row.className = 'folder-item' + (isDisabled ? ' disabled' : '');
+        row.dataset.path = escapeAttr(f.path);
+        row.style.cssText = `padding:8px;padding-left:${16 + indent * 16}px;cursor:${isDisabled ? 'not-allowed' : 'pointer'};border-radius:4px;opacity:${isDisabled ? 0.5 : 1};`;
+        
+        const toggle = document.createElement('span');
+        toggle.style.cssText = 'display:inline-block;width:16px;';
+        toggle.textContent = f.has_children ? '▸' : '';
+        row.appendChild(toggle);
+        row.appendChild(document.createTextNode(`📁 ${f.name} ${isDisabled ? '(当前选择)' : ''}`));
+        
+        const children = document.createElement('div');
+        children.style.display = 'none';
         
-        if (f.children && f.children.length > 0) {
-            renderFolderTree(f.children, indent + 1);
+        if (!isDisabled) row.onclick = () => onSelect(row);
+        if (f.has_children) {
+            toggle.onclick = async (ev) => {
+                ev.stopPropagation();
+                const open = children.style.display === 'none';
+                children.style.display = open ? '' : 'none';
+                toggle.textContent = open ? '▾' : '▸';
+                if (open && !children.dataset.loaded) {
+                    children.dataset.loaded = '1';
+                    const sub = await fetchFolderChildren(f.path, null);
+                    if (sub) renderFolderLevel(children, f.path, indent + 1, onSelect, sub);
+                }
+            };
         }
+        
+        container.appendChild(row);
+        container.appendChild(children);
     });
+    
+    if (data.next_cursor) {
+        const more = document.createElement('div');
+        more.style.cssText = `padding:8px;padding-left:${32 + indent * 16}px;cursor:pointer;color:var(--text-dim);`;
+        more.textContent = '加载更多...';
+        more.onclick = async (ev) => {
+            ev.stopPropagation();
+            more.remove();
+            const next = await fetchFolderChildren(path, data.next_cursor);
+            if (next) renderFolderLevel(container, path, indent, onSelect, next);
+        };
+        container.appendChild(more);
+    }
 }
 
 function selectMoveTargetByEl(el) {
@@ -715,25 +974,94 @@ async function moveFiles() {
         return;
     }
     
+    closeModal('move-modal');
+    await startTransfer('move', selectedMoveTarget);
+}
+
+let activeTransferId = null;
+let transferSource = null;
+
+async function startTransfer(action, target) {
+    const label = action === 'move' ? '移动' : '复制';
     try {
-        const res = await apiCall(`/api/files/move?paths=${encodeURIComponent(selectedFiles.join(','))}&target=${encodeURIComponent(selectedMoveTarget)}`, {
+        const res = await apiCall(`/api/files/transfer?action=${action}&paths=${encodeURIComponent(selectedFiles.join(','))}&target=${encodeURIComponent(target)}`, {
             method: 'POST'
         });
         if (!res) return;
         
         const data = await res.json();
+        if (!res.ok) {
+            showToast(data.detail || `${label}失败`, 'error');
+            return;
+        }
         
-        if (data.count > 0) {
-            showToast(`已移动 ${data.count} 个文件`, 'success');
-            closeModal('move-modal');
-            clearSelection();
-            loadFiles(currentPath);
+        clearSelection();
+        activeTransferId = data.id;
+        document.getElementById('transfer-title').textContent = `${label}文件`;
+        document.getElementById('transfer-cancel-btn').disabled = false;
+        renderTransfer(data);
+        showModal('transfer-modal');
+        watchTransfer(data.id, label);
+    } catch (e) {
+        showToast(`${label}失败`, 'error');
+    }
+}
+
+function watchTransfer(jobId, label) {
+    if (transferSource) transferSource.close();
+    transferSource = new EventSource(`/api/files/transfers/${jobId}/progress`);
+    
+    transferSource.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        renderTransfer(data);
+        if (!data.finished_at) return;
+        
+        transferSource.close();
+        transferSource = null;
+        activeTransferId = null;
+        closeModal('transfer-modal');
+        loadFiles(currentPath);
+        
+        if (data.status === 'cancelled') {
+            showToast(`已取消，完成 ${data.count} 项`, '');
+        } else if (data.status === 'failed' || (data.count === 0 && data.failed.length > 0)) {
+            showToast(`${label}失败: ${data.error || data.failed[0].error}`, 'error');
+        } else if (data.failed.length > 0) {
+            showToast(`已${label} ${data.count} 项，失败 ${data.failed.length} 项`, 'error');
         } else {
-            showToast('移动失败', 'error');
+            showToast(`已${label} ${data.count} 项`, 'success');
         }
-    } catch (e) {
-        showToast('移动失败', 'error');
+    };
+    
+    transferSource.onerror = () => {
+        // 连接断开时 EventSource 会自动重连，任务已结束则不再重试
+        if (!activeTransferId) transferSource.close();
+    };
+}
+
+function renderTransfer(data) {
+    const percent = data.total_bytes ? Math.floor(data.done_bytes * 100 / data.total_bytes) : (data.finished_at ? 100 : 0);
+    document.getElementById('transfer-bar-fill').style.width = percent + '%';
+    document.getElementById('transfer-summary').textContent =
+        `${percent}%  ${formatSize(data.done_bytes)} / ${formatSize(data.total_bytes)}  ·  文件 ${data.done_files} / ${data.total_files}`;
+    
+    const list = document.getElementById('transfer-files');
+    list.innerHTML = '';
+    (data.files || []).forEach(f => {
+        const row = document.createElement('div');
+        const pct = f.size ? Math.floor(f.done_bytes * 100 / f.size) : 0;
+        row.textContent = `${f.path.split(/[/\\]/).pop()}  ${pct}%`;
+        list.appendChild(row);
+    });
+}
+
+async function cancelTransfer() {
+    if (!activeTransferId) {
+        closeModal('transfer-modal');
+        return;
     }
+    document.getElementById('transfer-cancel-btn').disabled = true;
+    await apiCall(`/api/files/transfers/${activeTransferId}/cancel`, { method: 'POST' });
 }
 
 let selectedCopyTarget = '';
@@ -747,54 +1075,7 @@ function showCopyModal() {
 }
 
 async function loadCopyFolderTree() {
-    const el = document.getElementById('copy-folder-tree');
-    el.innerHTML = '<div style="padding:10px;color:var(--text-dim);">加载中...</div>';
-    
-    try {
-        const res = await apiCall('/api/files/folders');
-        if (!res) return;
-        
-        const data = await res.json();
-        renderCopyFolderTree(data.folders || []);
-    } catch (e) {
-        el.innerHTML = '<div style="padding:10px;color:var(--text-dim);">加载失败</div>';
-    }
-}
-
-function renderCopyFolderTree(folders, indent = 0) {
-    const el = document.getElementById('copy-folder-tree');
-    
-    if (folders.length === 0 && indent === 0) {
-        el.innerHTML = '<div style="padding:10px;color:var(--text-dim);">没有可用的文件夹</div>';
-        return;
-    }
-    
-    if (indent === 0) {
-        el.innerHTML = `
-            <div class="folder-item ${selectedCopyTarget === '' ? 'selected' : ''}" 
-                 onclick="selectCopyTarget('')" style="padding:8px;cursor:pointer;border-radius:4px;">
-                🏠 根目录
-            </div>
-        `;
-    }
-    
-    folders.forEach(f => {
-        const isSelected = selectedCopyTarget === f.path;
-        const isDisabled = selectedFiles.includes(f.path);
-        
-        el.innerHTML += `
-            <div class="folder-item ${isSelected ? 'selected' : ''} ${isDisabled ? 'disabled' : ''}" 
-                 data-path="${escapeAttr(f.path)}"
-                 onclick="${isDisabled ? '' : 'selectCopyTargetByEl(this)'}"
-                 style="padding:8px;padding-left:${16 + indent * 16}px;cursor:${isDisabled ? 'not-allowed' : 'pointer'};border-radius:4px;opacity:${isDisabled ? 0.5 : 1};">
-                📁 ${escapeHtml(f.name)} ${isDisabled ? '(当前选择)' : ''}
-            </div>
-        `;
-        
-        if (f.children && f.children.length > 0) {
-            renderCopyFolderTree(f.children, indent + 1);
-        }
-    });
+    await loadLazyFolderTree('copy-folder-tree', selectCopyTargetByEl);
 }
 
 function selectCopyTargetByEl(el) {
@@ -827,25 +1108,8 @@ async function copyFiles() {
         return;
     }
     
-    try {
-        const res = await apiCall(`/api/files/copy?paths=${encodeURIComponent(selectedFiles.join(','))}&target=${encodeURIComponent(selectedCopyTarget)}`, {
-            method: 'POST'
-        });
-        if (!res) return;
-        
-        const data = await res.json();
-        
-        if (data.count > 0) {
-            showToast(`已复制 ${data.count} 个文件`, 'success');
-            closeModal('copy-modal');
-            clearSelection();
-            loadFiles(currentPath);
-        } else {
-            showToast('复制失败', 'error');
-        }
-    } catch (e) {
-        showToast('复制失败', 'error');
-    }
+    closeModal('copy-modal');
+    await startTransfer('copy', selectedCopyTarget);
 }
 
 function showRenameModal() {
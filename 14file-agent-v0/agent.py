@@ -55,7 +55,8 @@ SYSTEM_PROMPT = """你是本地文件助手，帮用户搜索、浏览电脑文
 global_search_progress = {
     "status": "idle",
     "message": "",
-    "found_count": 0
+    "found_count": 0,
+    "files": []  # 搜索进行中时当前最好的结果，/progress 边找边推给前端
 }
 
 class FileAgent:
@@ -71,6 +72,7 @@ class FileAgent:
         global_search_progress["status"] = "analyzing"
         global_search_progress["message"] = "正在理解您的需求..."
         global_search_progress["found_count"] = 0
+        global_search_progress["files"] = []
 
         messages = [{"role": "system", "content": SYSTEM_PROMPT}]
 
@@ -129,13 +131,18 @@ class FileAgent:
                 global_search_progress["message"] = msg
                 global_search_progress["found_count"] = count
 
+            def on_results(partial):
+                # 多个盘并行搜索时，快的盘先找到的结果不必等慢盘扫完
+                global_search_progress["files"] = partial
+
             files = search_files(
                 keywords=keywords,
                 file_types=file_types,
                 max_results=max_results,
-                timeout_seconds=300,       # 提高到5分钟
+                timeout_seconds=_config.get("search_timeout_seconds", 60),
                 search_roots=search_roots,
-                progress_callback=on_progress
+                progress_callback=on_progress,
+                on_results=on_results
             )
             self.last_results = files
             global_search_progress["status"] = "idle"
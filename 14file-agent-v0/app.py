@@ -2,6 +2,7 @@ from flask import Flask, request, jsonify, render_template
 import os
 import json
 from agent import FileAgent
+from file_search import start_background_indexer
 
 app = Flask(__name__)
 app.config['TEMPLATES_AUTO_RELOAD'] = True
@@ -69,6 +70,7 @@ def chat():
         # Reset progress on error
         from agent import global_search_progress
         global_search_progress["status"] = "idle"
+        global_search_progress["files"] = []
         return jsonify({
             "reply": "服务暂时出错，请稍后重试",
             "action": "chat",
@@ -84,15 +86,22 @@ def progress():
         from agent import global_search_progress
         last_msg = ""
         last_count = -1
+        last_files = None
         
         while True:
             current_status = global_search_progress["status"]
             current_msg = global_search_progress["message"]
             current_count = global_search_progress["found_count"]
+            current_files = global_search_progress.get("files")
             
             # 只有状态改变或每秒强制发送一次心跳
             if current_status != "idle" or last_msg != current_msg or last_count != current_count:
-                yield f"data: {json.dumps({'status': current_status, 'message': current_msg, 'found_count': current_count})}\n\n"
+                payload = {'status': current_status, 'message': current_msg, 'found_count': current_count}
+                # 中间结果只在变化时附带
+                if current_files and current_files is not last_files:
+                    payload['files'] = current_files
+                    last_files = current_files
+                yield f"data: {json.dumps(payload)}\n\n"
                 last_msg = current_msg
                 last_count = current_count
             
@@ -245,4 +254,6 @@ if __name__ == "__main__":
     print(f"  本机访问：  http://localhost:{port}")
     print(f"  局域网访问：http://{local_ip}:{port}")
     print(f"{'='*50}\n")
+    # 后台建文件名索引，建好之前搜索仍走实时遍历
+    start_background_indexer()
     app.run(host=host, port=port, debug=False, threaded=True)
@@ -0,0 +1,306 @@
+"""
+文件名索引：把 search_roots 下的文件名存进本地 SQLite，search_files 先查库，
+尚未建好索引的根目录再退回实时遍历。
+
+刷新按目录 mtime 增量进行：mtime 没变的目录不再列文件，只继续检查它的子目录；
+目录里增删、改名文件时 mtime 会变，只重扫这一层。文件原地修改不会改变目录 mtime，
+所以索引里的大小和修改时间可能略旧，search_files 返回前会重新 stat。
+
+新鲜度完全由后台线程保证：没有变化的一轮只是每个目录一次 stat，默认每分钟一轮，
+查询本身不碰磁盘目录。
+
+文件路径另建 FTS5 trigram 索引（files_fts，由触发器随 files 同步），关键词按索引取
+候选；SQLite 不支持 trigram（3.34 以前）时退回 LIKE 逐行匹配。
+"""
+import os
+import sqlite3
+import time
+
+from exclusion import get_matcher
+from ranking import tokenize
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "file_index.sqlite3")
+_COMMIT_EVERY_DIRS = 200
+# trigram 索引只能查至少 3 个字符的串
+_TRIGRAM_MIN = 3
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS roots ("
+    "path TEXT PRIMARY KEY, excluded TEXT, complete INTEGER DEFAULT 0, indexed_at REAL)",
+    # mtime 为 NULL 表示已发现但还没扫描过
+    "CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime REAL)",
+    "CREATE INDEX IF NOT EXISTS ix_dirs_parent ON dirs (parent)",
+    "CREATE TABLE IF NOT EXISTS files ("
+    "path TEXT PRIMARY KEY, dir TEXT, name TEXT, ext TEXT, size INTEGER, mtime REAL, path_lower TEXT)",
+    "CREATE INDEX IF NOT EXISTS ix_files_dir ON files (dir)",
+)
+
+_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS files_fts "
+    "USING fts5(path, content='files', content_rowid='rowid', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS files_fts_ai AFTER INSERT ON files BEGIN "
+    "INSERT INTO files_fts (rowid, path) VALUES (new.rowid, new.path); END",
+    "CREATE TRIGGER IF NOT EXISTS files_fts_ad AFTER DELETE ON files BEGIN "
+    "INSERT INTO files_fts (files_fts, rowid, path) VALUES ('delete', old.rowid, old.path); END",
+    "CREATE TRIGGER IF NOT EXISTS files_fts_au AFTER UPDATE ON files BEGIN "
+    "INSERT INTO files_fts (files_fts, rowid, path) VALUES ('delete', old.rowid, old.path); "
+    "INSERT INTO files_fts (rowid, path) VALUES (new.rowid, new.path); END",
+)
+
+
+def connect():
+    """每个线程用自己的连接；WAL 模式下后台刷新不会挡住查询。"""
+    conn = sqlite3.connect(INDEX_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # INSERT OR REPLACE 顶掉旧行时也要触发删除触发器，files_fts 才不会留下旧条目
+    conn.execute("PRAGMA recursive_triggers=ON")
+    for stmt in _SCHEMA:
+        conn.execute(stmt)
+    _init_fts(conn)
+    conn.commit()
+    return conn
+
+
+def _init_fts(conn):
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'"
+    ).fetchone() is not None
+    if not exists:
+        try:
+            for stmt in _FTS_SCHEMA:
+                conn.execute(stmt)
+        except sqlite3.OperationalError:
+            conn.rollback()
+            return
+        # 已有的索引一次性补进来
+        conn.execute("INSERT INTO files_fts (files_fts) VALUES ('rebuild')")
+
+
+def _has_fts(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'"
+    ).fetchone() is not None
+
+
+def _signature(excluded_dirs):
+    return "\n".join(sorted(excluded_dirs))
+
+
+def _range(prefix):
+    """位于 prefix 目录之下（不含自身）的路径范围 [lo, hi)，能走主键索引。"""
+    base = prefix.rstrip("\\/") + os.sep
+    return base, base[:-1] + chr(ord(os.sep) + 1)
+
+
+def _under(path, root):
+    path = os.path.normcase(os.path.normpath(path))
+    root = os.path.normcase(os.path.normpath(root))
+    return path == root or path.startswith(root.rstrip("\\/") + os.sep)
+
+
+def _drop_tree(conn, path):
+    lo, hi = _range(path)
+    conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, lo, hi))
+    conn.execute("DELETE FROM files WHERE path >= ? AND path < ?", (lo, hi))
+
+
+def _list_dir(dir_path, matcher):
+    subdirs = []
+    files = []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if not matcher.match_child(entry.path, entry.name):
+                            subdirs.append(entry.path)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((
+                    entry.path, dir_path, entry.name, os.path.splitext(entry.name)[1].lower(),
+                    st.st_size, st.st_mtime, entry.path.lower()
+                ))
+    except OSError:
+        pass
+    return subdirs, files
+
+
+def _refresh_tree(conn, start, matcher, stop=None):
+    """检查 start（已登记在 dirs 中）及其下所有目录的 mtime，只重扫变了的；被 stop 打断时返回 False。"""
+    stack = [start]
+    scanned = 0
+    while stack:
+        if stop is not None and stop.is_set():
+            conn.commit()
+            return False
+
+        dir_path = stack.pop()
+        try:
+            mtime = os.stat(dir_path).st_mtime
+        except OSError:
+            _drop_tree(conn, dir_path)
+            continue
+
+        known = [p for (p,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (dir_path,))]
+        row = conn.execute("SELECT mtime FROM dirs WHERE path = ?", (dir_path,)).fetchone()
+        if row is not None and row[0] == mtime:
+            stack.extend(known)
+            continue
+
+        subdirs, files = _list_dir(dir_path, matcher)
+        current = set(subdirs)
+        for gone in known:
+            if gone not in current:
+                _drop_tree(conn, gone)
+        # 子目录先登记（mtime 为空），中途中断后下一轮也能从父目录找到它们
+        conn.executemany(
+            "INSERT OR IGNORE INTO dirs (path, parent, mtime) VALUES (?, ?, NULL)",
+            [(p, dir_path) for p in subdirs]
+        )
+        conn.execute("DELETE FROM files WHERE dir = ?", (dir_path,))
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files)
+        conn.execute("UPDATE dirs SET mtime = ? WHERE path = ?", (mtime, dir_path))
+        stack.extend(subdirs)
+
+        scanned += 1
+        if scanned % _COMMIT_EVERY_DIRS == 0:
+            conn.commit()
+    conn.commit()
+    return True
+
+
+def refresh_root(conn, root, excluded_dirs, stop=None):
+    """
+    增量刷新一个根目录。排除规则变了就整棵重建；全部目录检查完才标记为完整，
+    中途被 stop 打断时保留已写入的部分，下一轮接着补。
+    """
+    matcher = get_matcher(excluded_dirs)
+    signature = _signature(excluded_dirs)
+
+    row = conn.execute("SELECT excluded FROM roots WHERE path = ?", (root,)).fetchone()
+    if row is None or row[0] != signature:
+        _drop_tree(conn, root)
+        conn.execute(
+            "INSERT OR REPLACE INTO roots (path, excluded, complete, indexed_at) VALUES (?, ?, 0, NULL)",
+            (root, signature)
+        )
+    conn.execute("INSERT OR IGNORE INTO dirs (path, parent, mtime) VALUES (?, NULL, NULL)", (root,))
+    conn.commit()
+
+    if not _refresh_tree(conn, root, matcher, stop):
+        return False
+
+    conn.execute("UPDATE roots SET complete = 1, indexed_at = ? WHERE path = ?", (time.time(), root))
+    conn.commit()
+    return True
+
+
+def refresh(roots, excluded_dirs, stop=None):
+    """刷新一轮所有根目录；不再配置的根目录连同索引一起删掉。"""
+    wanted = []
+    for root in sorted(roots, key=len):
+        if os.path.isdir(root) and not any(_under(root, r) for r in wanted):
+            wanted.append(root)
+
+    conn = connect()
+    try:
+        for (old,) in conn.execute("SELECT path FROM roots").fetchall():
+            if old not in wanted:
+                _drop_tree(conn, old)
+                conn.execute("DELETE FROM roots WHERE path = ?", (old,))
+        conn.commit()
+
+        for root in wanted:
+            start = time.time()
+            try:
+                if not refresh_root(conn, root, excluded_dirs, stop):
+                    return
+            except (OSError, sqlite3.Error) as e:
+                conn.rollback()
+                print(f"[索引] 刷新 {root} 失败: {e}")
+                continue
+            print(f"[索引] {root} 已更新，用时 {time.time() - start:.1f} 秒")
+    finally:
+        conn.close()
+
+
+def indexed_root(conn, path, excluded_dirs):
+    """path 位于某个已完整建好索引（且排除规则未变）的根目录之下时返回该根目录，否则返回 None。"""
+    for (root,) in conn.execute(
+        "SELECT path FROM roots WHERE complete = 1 AND excluded = ?", (_signature(excluded_dirs),)
+    ):
+        if _under(path, root):
+            return root
+    return None
+
+
+def stored_path(conn, path, root):
+    """
+    把调用方给的 path 换成索引里存的写法。
+
+    Windows 上路径不区分大小写，c:\\users\\x 和存进库的 C:\\Users\\X 是同一个目录，
+    但主键比较区分大小写；这里从根目录逐层按 normcase 找到库里对应的子目录。
+    不在索引中时返回 None。
+    """
+    # 调用方已用 _under 确认 path 在 root 之下，normcase 不改变长度，直接按长度切出相对部分
+    rel = os.path.normpath(path)[len(os.path.normpath(root)):].strip(os.sep)
+    stored = root
+    for part in rel.split(os.sep) if rel else []:
+        want = os.path.normcase(os.path.join(stored, part))
+        for (child,) in conn.execute("SELECT path FROM dirs WHERE parent = ?", (stored,)):
+            if os.path.normcase(child) == want:
+                stored = child
+                break
+        else:
+            return None
+    return stored
+
+
+def _like(text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def candidates(conn, path, keywords=None, file_types=None):
+    """
+    索引中位于 path 之下、可能命中关键词的文件，逐行产出 (path, dir, name, ext, size, mtime)。
+    path 须是索引里存的写法（stored_path 的返回值），主键按它做范围查询。
+
+    关键词之间是"或"：完整路径包含关键词，或包含关键词的全部词元即为候选，
+    是否真正命中、排在第几由调用方评分决定。至少 3 个字符的串走 files_fts 索引，
+    更短的串只在这些行上用 LIKE 过滤；一组里全是短串时才逐行匹配。
+    """
+    lo, hi = _range(path)
+    use_fts = _has_fts(conn)
+
+    sql = "SELECT path, dir, name, ext, size, mtime FROM files WHERE path >= ? AND path < ?"
+    params = [lo, hi]
+
+    if file_types:
+        sql += f" AND ext IN ({', '.join('?' * len(file_types))})"
+        params.extend(file_types)
+
+    groups = []
+    for kw in keywords or []:
+        alternatives = [[kw]]
+        tokens = sorted(tokenize(kw))
+        if tokens and tokens != [kw]:
+            alternatives.append(tokens)
+        for terms in alternatives:
+            long_terms = [t for t in terms if use_fts and len(t) >= _TRIGRAM_MIN]
+            conds = []
+            if long_terms:
+                conds.append("rowid IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?)")
+                params.append(" ".join('"' + t.replace('"', '""') + '"' for t in long_terms))
+            for t in terms:
+                if t not in long_terms:
+                    conds.append("path_lower LIKE ? ESCAPE '\\'")
+                    params.append(_like(t))
+            groups.append("(" + " AND ".join(conds) + ")")
+    if groups:
+        sql += " AND (" + " OR ".join(groups) + ")"
+
+    yield from conn.execute(sql, params)
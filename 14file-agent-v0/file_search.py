@@ -1,7 +1,14 @@
 import os
-import fnmatch
 import json
+import queue
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import file_index
+from exclusion import get_matcher
+from ranking import RECENCY_BOOST, Scorer, TopK
 
 # Try to import optional libraries for content search
 try:
@@ -16,6 +23,12 @@ try:
 except ImportError:
     HAS_PDF = False
 
+try:
+    from pptx import Presentation
+    HAS_PPTX = True
+except ImportError:
+    HAS_PPTX = False
+
 # Cache config to avoid repeated file reads
 _config_cache = None
 _config_mtime = 0
@@ -56,26 +69,64 @@ def format_time(ts):
     return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
 
 
-def should_skip_dir(dirpath, excluded_dirs, excluded_set=None):
+def should_skip_dir(dirpath, excluded_dirs):
     """Check if a directory should be skipped."""
-    dirpath_lower = dirpath.lower()
-    dirname = os.path.basename(dirpath)
-    dirname_lower = dirname.lower()
+    return get_matcher(excluded_dirs).match_path(dirpath)
 
-    if excluded_set and dirname_lower in excluded_set:
-        return True
 
-    for excl in excluded_dirs:
-        excl_lower = excl.lower()
-        if excl_lower in dirpath_lower:
-            return True
-        if fnmatch.fnmatch(dirname_lower, excl_lower):
-            return True
-    return False
+# Extracted text cache, keyed by (path, mtime, size), so unchanged files are
+# not re-parsed on every content search
+CONTENT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "content_cache.sqlite3")
+_content_db = None
+_content_db_lock = threading.Lock()
+
+
+def _get_content_db():
+    global _content_db
+    if _content_db is None:
+        _content_db = sqlite3.connect(CONTENT_CACHE_PATH, check_same_thread=False)
+        _content_db.execute(
+            "CREATE TABLE IF NOT EXISTS content_cache ("
+            "path TEXT PRIMARY KEY, mtime REAL, size INTEGER, content TEXT)"
+        )
+        _content_db.commit()
+    return _content_db
 
 
 def read_text_content(filepath):
-    """Read text content from a file for content search."""
+    """Read text content from a file for content search (cached)."""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return ""
+
+    try:
+        with _content_db_lock:
+            row = _get_content_db().execute(
+                "SELECT mtime, size, content FROM content_cache WHERE path = ?", (filepath,)
+            ).fetchone()
+        if row and row[0] == st.st_mtime and row[1] == st.st_size:
+            return row[2]
+    except sqlite3.Error:
+        row = None
+
+    content = _extract_text_content(filepath)
+
+    try:
+        with _content_db_lock:
+            db = _get_content_db()
+            db.execute(
+                "INSERT OR REPLACE INTO content_cache (path, mtime, size, content) VALUES (?, ?, ?, ?)",
+                (filepath, st.st_mtime, st.st_size, content)
+            )
+            db.commit()
+    except sqlite3.Error:
+        pass
+    return content
+
+
+def _extract_text_content(filepath):
+    """Extract text content from a file."""
     ext = os.path.splitext(filepath)[1].lower()
     try:
         if ext in [".txt", ".md", ".py", ".js", ".html", ".css", ".csv", ".log", ".json", ".xml"]:
@@ -91,6 +142,13 @@ def read_text_content(filepath):
                 for page in reader.pages[:10]:  # first 10 pages
                     text.append(page.extract_text() or "")
             return "\n".join(text)
+        elif ext == ".pptx" and HAS_PPTX:
+            text = []
+            for slide in Presentation(filepath).slides:
+                for shape in slide.shapes:
+                    if shape.has_text_frame:
+                        text.append(shape.text_frame.text)
+            return "\n".join(text)
     except Exception:
         pass
     return ""
@@ -185,7 +243,8 @@ def list_directory(path=None, show_hidden=False):
 
 
 def search_files(keywords, file_types=None, content_keyword=None, max_results=20,
-                 timeout_seconds=300, search_roots=None, progress_callback=None):
+                 timeout_seconds=60, search_roots=None, progress_callback=None,
+                 on_results=None, parallel=None, root_timeout_seconds=None):
     """
     搜索文件（按名称关键词，可选按内容）。
 
@@ -194,12 +253,20 @@ def search_files(keywords, file_types=None, content_keyword=None, max_results=20
         file_types: 扩展名列表如 ['.pdf', '.docx']，None 表示所有类型
         content_keyword: 搜索文件内容的关键词
         max_results: 最大返回结果数
-        timeout_seconds: 最大搜索时间（秒），默认300秒（5分钟）
+        timeout_seconds: 最大搜索时间（秒），默认60秒。未建索引的根目录要一直遍历到超时或走完，
+            只有前 max_results 名都已是满分命中（见 Scorer.ceiling）时才提前结束；
+            实际上满分还要求文件刚刚修改，很少触发，遍历时长主要由这个时限决定
         search_roots: 覆盖 config 的搜索根目录
-        progress_callback: fn(status_str, found_count) 进度回调，可为 None
+        progress_callback: fn(status_str, found_count) 进度回调，可为 None；并行时会从多个线程调用
+        on_results: fn(files) 当前最好的结果有变化时回调（至多每 0.5 秒一次），可为 None
+        parallel: 每个根目录一个线程同时遍历；None 时取 config 的 parallel_search（默认开启）
+        root_timeout_seconds: 单个根目录的遍历时限，None 时取 config 的 root_timeout_seconds，
+            未配置则与 timeout_seconds 相同；config 的 root_timeouts 可按根目录单独覆盖
+            （如网络盘给更短的时限）。每个根目录从开始遍历时各自计时，
+            慢盘超时只放弃它自己剩下的目录，其他根目录照常走到总时限
 
     Returns:
-        list of dicts with file info
+        list of dicts with file info, best matches first (see ranking.py)
     """
     config = load_config()
 
@@ -209,35 +276,110 @@ def search_files(keywords, file_types=None, content_keyword=None, max_results=20
     if search_roots == ["all"] or search_roots == "all":
         search_roots = get_all_drives()
 
+    if parallel is None:
+        parallel = config.get("parallel_search", True)
+    if root_timeout_seconds is None:
+        root_timeout_seconds = config.get("root_timeout_seconds", timeout_seconds)
+    root_timeouts = {
+        os.path.normcase(os.path.normpath(root)): seconds
+        for root, seconds in config.get("root_timeouts", {}).items()
+    }
+
     excluded_dirs = config.get("excluded_dirs", [])
 
     file_types_lower = set(ft.lower() for ft in file_types) if file_types else None
     keywords_lower = [kw.lower() for kw in keywords] if keywords else []
-    excluded_set = set(d.lower() for d in excluded_dirs if '\\' not in d and '/' not in d)
+    exclusions = get_matcher(excluded_dirs)
 
-    results = []
+    # 所有根目录共用一个有界堆，边遍历边保留分数最高的 max_results 个
+    scorer = Scorer(keywords_lower, search_roots)
+    ranker = TopK(max_results)
     seen_paths = set()
     start_time = time.time()
-    dirs_scanned = 0
+    deadline = start_time + timeout_seconds
+    stop = threading.Event()
+    published = {"dirty": False, "at": 0.0}
+
+    def evaluate(dirpath, filename):
+        """返回 (排序键, 文件信息)，不匹配或进不了前 max_results 时返回 None；可在多个线程中调用。"""
+        ext = os.path.splitext(filename)[1].lower()
+        if file_types_lower and ext not in file_types_lower:
+            return None
+
+        relevance = scorer.relevance(filename, dirpath)
+        # 时间加成拉满也进不了前 max_results 的，不必再 stat 和读内容
+        if relevance is None or not ranker.admits(relevance + RECENCY_BOOST):
+            return None
+
+        filepath = os.path.join(dirpath, filename)
+        try:
+            stat = os.stat(filepath)
+        except (PermissionError, OSError, FileNotFoundError):
+            return None
 
-    for root in search_roots:
-        if not os.path.exists(root):
-            continue
+        key = scorer.key(relevance, stat.st_mtime)
+        if not ranker.admits(key[0]):
+            return None
+
+        if content_keyword:
+            try:
+                content = read_text_content(filepath)
+                if content_keyword.lower() not in content.lower():
+                    return None
+            except Exception:
+                return None
+
+        return key, {
+            "name": filename,
+            "path": filepath,
+            "size": stat.st_size,
+            "size_str": format_size(stat.st_size),
+            "modified": stat.st_mtime,
+            "modified_str": format_time(stat.st_mtime),
+            "ext": ext
+        }
 
+    def publish(force=False):
+        if on_results and published["dirty"] and (force or time.time() - published["at"] >= 0.5):
+            published["dirty"] = False
+            published["at"] = time.time()
+            on_results(ranker.results())
+
+    # 前 max_results 名都已拿到满分（全部关键词与主文件名完全相同）时，剩下的目录不必再走
+    ceiling = scorer.ceiling()
+
+    def accept(hit):
+        """只在调用 search_files 的线程中执行，TopK 不需要加锁。"""
+        key, item = hit
+        if item["path"] in seen_paths:
+            return
+        seen_paths.add(item["path"])
+        if ranker.push(key, item):
+            published["dirty"] = True
+            publish()
+            if ranker.settled(ceiling):
+                stop.set()
+
+    def walk_root(root, emit):
+        limit = root_timeouts.get(os.path.normcase(os.path.normpath(root)), root_timeout_seconds)
+        root_deadline = min(deadline, time.time() + limit)
+        dirs_scanned = 0
         try:
             for dirpath, dirnames, filenames in os.walk(root, topdown=True, onerror=lambda e: None):
-                elapsed = time.time() - start_time
-                if elapsed > timeout_seconds:
-                    if progress_callback:
-                        progress_callback(f"搜索超时（{int(elapsed)}秒），返回已找到的结果", len(results))
+                if stop.is_set():
                     break
-
-                if len(results) >= max_results * 10:
+                now = time.time()
+                if now > root_deadline:
+                    if progress_callback:
+                        if now > deadline:
+                            progress_callback(f"搜索超时（{int(now - start_time)}秒），返回已找到的结果", len(ranker))
+                        else:
+                            progress_callback(f"{root} 超过 {limit:g} 秒，跳过其余目录", len(ranker))
                     break
 
                 dirnames[:] = [
                     d for d in dirnames
-                    if not should_skip_dir(os.path.join(dirpath, d), excluded_dirs, excluded_set)
+                    if not exclusions.match_child(os.path.join(dirpath, d), d)
                 ]
 
                 dirs_scanned += 1
@@ -245,73 +387,122 @@ def search_files(keywords, file_types=None, content_keyword=None, max_results=20
                 if progress_callback and dirs_scanned % 50 == 0:
                     progress_callback(
                         f"正在扫描：{dirpath}",
-                        len(results)
+                        ranker.seen
                     )
 
-                dirpath_lower = dirpath.lower()
-
                 for filename in filenames:
-                    if len(results) >= max_results * 10:
-                        break
-
-                    filepath = os.path.join(dirpath, filename)
-                    if filepath in seen_paths:
-                        continue
-
-                    ext = os.path.splitext(filename)[1].lower()
-                    if file_types_lower and ext not in file_types_lower:
-                        continue
-
-                    if keywords_lower:
-                        filename_lower = filename.lower()
-                        matched = any(kw in filename_lower or kw in dirpath_lower
-                                      for kw in keywords_lower)
-                        if not matched:
-                            continue
-
-                    if content_keyword:
-                        try:
-                            content = read_text_content(filepath)
-                            if content_keyword.lower() not in content.lower():
-                                continue
-                        except Exception:
-                            continue
-
-                    try:
-                        stat = os.stat(filepath)
-                        score = 0
-                        filename_lower = filename.lower()
-                        for kw in keywords_lower:
-                            if kw in filename_lower:
-                                score += 10
-                            elif kw in dirpath_lower:
-                                score += 3
-
-                        results.append({
-                            "name": filename,
-                            "path": filepath,
-                            "size": stat.st_size,
-                            "size_str": format_size(stat.st_size),
-                            "modified": stat.st_mtime,
-                            "modified_str": format_time(stat.st_mtime),
-                            "ext": ext,
-                            "_score": score
-                        })
-                        seen_paths.add(filepath)
-                    except (PermissionError, OSError, FileNotFoundError):
-                        continue
-
+                    hit = evaluate(dirpath, filename)
+                    if hit is not None:
+                        emit(hit)
         except (PermissionError, OSError):
-            continue
+            pass
+
+    # 已建好索引的根目录直接查库（候选再经 stat 确认仍存在），其余的实时遍历
+    walk_roots = []
+    conn = None
+    if config.get("index_enabled", True):
+        try:
+            conn = file_index.connect()
+        except sqlite3.Error:
+            conn = None
 
-        if time.time() - start_time > timeout_seconds:
+    for root in search_roots:
+        if stop.is_set():
             break
+        if not os.path.exists(root):
+            continue
+        try:
+            indexed = conn is not None and file_index.indexed_root(conn, root, excluded_dirs)
+            if not indexed:
+                walk_roots.append(root)
+                continue
+            if progress_callback:
+                progress_callback(f"正在查询索引：{root}", ranker.seen)
+            # 索引的新鲜度由后台刷新保证，这里只把路径换成库里的写法
+            base = file_index.stored_path(conn, root, indexed)
+            if base is None:
+                walk_roots.append(root)
+                continue
+            for _, dirpath, filename, *_ in file_index.candidates(
+                conn, base, keywords_lower, file_types_lower
+            ):
+                hit = evaluate(dirpath, filename)
+                if hit is not None:
+                    accept(hit)
+                if stop.is_set() or time.time() > deadline:
+                    break
+        except sqlite3.Error:
+            walk_roots.append(root)
+
+    if conn is not None:
+        conn.close()
+
+    if not parallel or len(walk_roots) <= 1:
+        for root in walk_roots:
+            walk_root(root, accept)
+            if stop.is_set() or time.time() > deadline:
+                break
+        return ranker.results()
+
+    # 并行：每个根目录一个线程，各自计时；命中经队列交回本线程入堆，
+    # 快的盘先出结果，慢盘（网络盘、超大的 C 盘）不会拖住其他盘
+    hits = queue.Queue()
+    pool = ThreadPoolExecutor(max_workers=len(walk_roots), thread_name_prefix="search")
+    try:
+        pending = [pool.submit(walk_root, root, hits.put) for root in walk_roots]
+        while pending and not stop.is_set() and time.time() <= deadline:
+            try:
+                accept(hits.get(timeout=0.2))
+            except queue.Empty:
+                publish()
+            pending = [f for f in pending if not f.done()]
+        while True:
+            try:
+                accept(hits.get_nowait())
+            except queue.Empty:
+                break
+    finally:
+        stop.set()
+        pool.shutdown(wait=False)
+
+    return ranker.results()
+
+
+# ---------- 后台索引 ----------
+
+_indexer_thread = None
+_indexer_stop = threading.Event()
 
-    results.sort(key=lambda x: (-x.get("_score", 0), -x["modified"]))
-    for r in results:
-        r.pop("_score", None)
 
-    return results[:max_results]
+def _index_roots(config):
+    roots = config.get("search_roots", ["C:\\Users"])
+    if roots == ["all"] or roots == "all":
+        roots = get_all_drives()
+    return roots
+
+
+def _indexer_loop():
+    while not _indexer_stop.is_set():
+        config = load_config()
+        if config.get("index_enabled", True):
+            try:
+                file_index.refresh(_index_roots(config), config.get("excluded_dirs", []), _indexer_stop)
+            except Exception as e:
+                print(f"[索引] 更新失败: {e}")
+        _indexer_stop.wait(max(0.5, config.get("index_refresh_minutes", 1)) * 60)
+
+
+def start_background_indexer():
+    """
+    启动后台线程：先建一遍文件名索引，之后每隔 index_refresh_minutes 分钟（默认 1）按目录 mtime
+    增量刷新。没有变化时一轮只是每个目录一次 stat，刚保存的文件最多晚一轮就能从索引搜到。
+    """
+    global _indexer_thread
+    if _indexer_thread is not None and _indexer_thread.is_alive():
+        return
+    _indexer_stop.clear()
+    _indexer_thread = threading.Thread(target=_indexer_loop, daemon=True, name="file-index")
+    _indexer_thread.start()
 
 
 def get_file_info(filepath):
@@ -0,0 +1,193 @@
+"""
+搜索结果排序：相关度评分和流式 top-k。
+
+遍历或查库时每个命中项算出排序键 (分数, 修改时间) 后交给 TopK，
+堆里只保留当前最好的 k 个，不必先收集全部候选再排序，也不会因为
+提前截断而丢掉真正靠前的结果。
+
+评分规则（每个关键词取最高的一档累加）：
+- 主文件名与关键词完全相同 +20；
+- 文件名中的词元以关键词的各词元开头（与文件名索引的匹配方式一致）+12，
+  只是子串包含 +10；
+- 文件名没命中、所在目录路径命中时 +4（词元前缀）/ +3（子串）；
+- 有关键词时，相对搜索根每深一层 -0.5，最多 -5；
+- 按修改时间加分，刚修改的 +4，每 30 天减半。
+
+本文件在 14.1file-agent-v1/services 和 14file-agent-v0 各有一份，两个项目独立部署、
+互不导入，内容必须保持一致：改一处就同步另一处，并运行
+14.1file-agent-v1/scripts/check_vendored.py 核对。
+"""
+import heapq
+import os
+import re
+import time
+from typing import Any, Iterable, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"[a-z]+|[0-9]+|[\u4e00-\u9fff]+")
+_TOKEN_MAX_LEN = 50
+
+NAME_EXACT = 20.0
+NAME_PREFIX = 12.0
+NAME_SUBSTRING = 10.0
+DIR_PREFIX = 4.0
+DIR_SUBSTRING = 3.0
+DEPTH_PENALTY = 0.5
+MAX_DEPTH_PENALTY = 5.0
+RECENCY_BOOST = 4.0
+RECENCY_HALF_LIFE_DAYS = 30.0
+
+_DIR_CACHE_SIZE = 4096
+
+
+def tokenize(text: str) -> Set[str]:
+    """把文件名切成小写词元：英文单词、数字串原样保留，中文拆成单字和相邻二字。"""
+    tokens = set()
+    for run in _TOKEN_RE.findall(text.lower()):
+        if "\u4e00" <= run[0] <= "\u9fff":
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.add(run[:_TOKEN_MAX_LEN])
+    return tokens
+
+
+def recency_boost(mtime: float, now: Optional[float] = None) -> float:
+    age_days = max(0.0, ((now or time.time()) - mtime) / 86400)
+    return RECENCY_BOOST * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _depth(path: str) -> int:
+    path = path.rstrip("\\/")
+    return path.count("/") + path.count("\\")
+
+
+def _match(keyword: str, kw_tokens: Tuple[str, ...], text: str, tokens: Set[str],
+           prefix: float, substring: float) -> float:
+    if keyword in text:
+        contained = True
+    elif kw_tokens and all(k in text for k in kw_tokens):
+        contained = False
+    else:
+        return 0.0
+    if kw_tokens and all(any(t.startswith(k) for t in tokens) for k in kw_tokens):
+        return prefix
+    return substring if contained else 0.0
+
+
+class Scorer:
+    """
+    按一组关键词给文件打分。relevance() 不含时间加成，可以在 stat 之前算出，
+    配合 TopK.admits() 提前丢掉不可能进前 k 的候选。
+
+    同一目录下的文件共用目录部分的结果；可以在多个线程中同时使用。
+    """
+
+    def __init__(self, keywords: Iterable[str], roots: Iterable[str] = (), now: Optional[float] = None):
+        self.keywords = [(kw, tuple(sorted(tokenize(kw)))) for kw in (k.lower() for k in keywords) if kw]
+        self.roots = sorted((str(r) for r in roots), key=len, reverse=True)
+        self.now = now or time.time()
+        self._dirs = {}
+
+    def _root_depth(self, dir_path: str) -> int:
+        for root in self.roots:
+            if dir_path.startswith(root):
+                return _depth(root)
+        return _depth(dir_path)
+
+    def _dir_info(self, dir_path: str) -> Tuple[List[float], float]:
+        info = self._dirs.get(dir_path)
+        if info is None:
+            dir_lower = dir_path.lower()
+            tokens = tokenize(dir_lower)
+            scores = [_match(kw, kw_tokens, dir_lower, tokens, DIR_PREFIX, DIR_SUBSTRING)
+                      for kw, kw_tokens in self.keywords]
+            depth = max(0, _depth(dir_path) - self._root_depth(dir_path))
+            info = (scores, min(depth * DEPTH_PENALTY, MAX_DEPTH_PENALTY))
+            if len(self._dirs) >= _DIR_CACHE_SIZE:
+                self._dirs.clear()
+            self._dirs[dir_path] = info
+        return info
+
+    def relevance(self, name: str, dir_path: str) -> Optional[float]:
+        """有关键词但文件名和所在目录都没命中时返回 None。"""
+        if not self.keywords:
+            return 0.0
+
+        dir_scores, penalty = self._dir_info(dir_path)
+        name_lower = name.lower()
+        stem = os.path.splitext(name_lower)[0]
+        tokens = None
+        score = 0.0
+        matched = False
+        for i, (kw, kw_tokens) in enumerate(self.keywords):
+            if kw == stem:
+                hit = NAME_EXACT
+            else:
+                if tokens is None:
+                    tokens = tokenize(name_lower)
+                hit = _match(kw, kw_tokens, name_lower, tokens, NAME_PREFIX, NAME_SUBSTRING) or dir_scores[i]
+            if hit:
+                matched = True
+                score += hit
+        if not matched:
+            return None
+        return score - penalty
+
+    def ceiling(self) -> float:
+        """任何文件能拿到的最高分：每个关键词都与主文件名完全相同、不扣深度、刚刚修改。"""
+        return NAME_EXACT * len(self.keywords) + RECENCY_BOOST
+
+    def key(self, relevance: float, mtime: float) -> Tuple[float, float]:
+        """TopK 的排序键：分数加上时间加成，同分时较新的在前。"""
+        return relevance + recency_boost(mtime, self.now), mtime
+
+
+class TopK:
+    """
+    有界最小堆，流式保留排序键最大的 k 项；排序键相同时先到的在前。
+
+    堆满后第 k 名的分数只增不减，其他线程调用 admits() 做剪枝是安全的：
+    读到旧值只会少剪一些，不会误剪。push() 需在同一个线程中调用。
+    """
+
+    def __init__(self, k: int):
+        self.k = max(0, k)
+        self.seen = 0
+        self._heap: list = []
+        self._seq = 0
+        self._floor: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def admits(self, score: float) -> bool:
+        """排序键首项为 score 的项是否可能进入前 k。"""
+        if self.k == 0:
+            return False
+        floor = self._floor
+        return floor is None or score >= floor
+
+    def settled(self, ceiling: float) -> bool:
+        """堆已满且第 k 名不低于 ceiling（剩余候选能拿到的最高分）时，再找下去也换不掉任何一项。"""
+        floor = self._floor
+        return floor is not None and floor >= ceiling
+
+    def push(self, key: tuple, item: Any) -> bool:
+        """放入一项，进入当前前 k 时返回 True。"""
+        self.seen += 1
+        if self.k == 0:
+            return False
+        self._seq += 1
+        entry = (key, -self._seq, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+        else:
+            return False
+        if len(self._heap) == self.k:
+            self._floor = self._heap[0][0][0]
+        return True
+
+    def results(self) -> List[Any]:
+        return [item for _, _, item in sorted(self._heap, key=lambda e: (e[0], e[1]), reverse=True)]
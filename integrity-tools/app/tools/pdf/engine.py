@@ -0,0 +1,210 @@
+"""
+PDF 任务引擎：上传保存好之后提交任务立即返回 job_id，处理在后台线程池中进行，
+客户端轮询状态、完成后下载结果。
+
+排队加运行中的任务数有上限（PDF_QUEUE_SIZE），满了直接拒绝，
+一个几百 MB 的合并只占一个工作线程，不会拖住整个 API。
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+
+from config import PDF_WORKERS, PDF_QUEUE_SIZE, PDF_JOB_TTL
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class PdfJob:
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.done = 0
+        self.total = 0
+        self.message = "排队中"
+        self.output = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    def advance(self, n=1):
+        self.done += n
+
+    def wait(self, timeout):
+        return self._finished.wait(timeout)
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "done": self.done,
+            "total": self.total,
+            "message": self.message,
+        }
+        if self.status == "done":
+            data["download_url"] = f"/api/pdf/download/{os.path.basename(self.output)}"
+        return data
+
+
+class PdfJobEngine:
+    def __init__(self, workers, queue_size, ttl):
+        self.queue_size = max(1, queue_size)
+        self.ttl = ttl
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pdf-job")
+
+    def reserve(self):
+        """
+        先占一个名额，再去接收上传：队列已满时在读请求体之前就抛出 QueueFullError。
+        占到的名额交给 submit(..., reserved=True) 使用，不提交任务时要 release() 归还。
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(f"处理队列已满（{self.queue_size} 个任务），请稍后再试")
+
+    def release(self):
+        self._slots.release()
+
+    def submit(self, kind, func, *args, cleanup=(), reserved=False):
+        """
+        提交任务；func(job, *args) 返回 (输出路径, 完成提示)。cleanup 中的临时文件在任务结束后删除。
+        reserved 为 True 时使用之前 reserve() 占到的名额；否则现占，
+        队列已满时抛出 QueueFullError，调用方应先删掉已保存的上传。
+        """
+        if not reserved:
+            self.reserve()
+
+        self._prune()
+        job = PdfJob(kind)
+        with self._lock:
+            self.jobs[job.id] = job
+        try:
+            self._pool.submit(self._run, job, func, args, cleanup)
+        except RuntimeError:
+            with self._lock:
+                self.jobs.pop(job.id, None)
+            self._slots.release()
+            raise
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, func, args, cleanup):
+        job.status = "running"
+        job.message = "处理中"
+        try:
+            job.output, job.message = func(job, *args)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.message = f"处理失败: {e}"
+        finally:
+            for path in cleanup:
+                if os.path.exists(path):
+                    os.remove(path)
+            job.finished_at = time.time()
+            job._finished.set()
+            self._slots.release()
+
+    def _prune(self):
+        """清掉超过保留时间的已结束任务及其输出文件。"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [j for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            if job.output and os.path.exists(job.output):
+                os.remove(job.output)
+
+
+engine = PdfJobEngine(PDF_WORKERS, PDF_QUEUE_SIZE, PDF_JOB_TTL)
+
+
+def _write(writer, output_path):
+    # 先写临时文件再改名，下载时不会拿到写了一半的文件
+    partial = output_path + ".part"
+    try:
+        with open(partial, "wb") as f:
+            writer.write(f)
+        os.replace(partial, output_path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def _close(readers):
+    for reader in readers:
+        try:
+            if hasattr(reader, 'stream') and reader.stream:
+                reader.stream.close()
+        except Exception:
+            pass
+
+
+def merge_pdfs(job, paths, output_path):
+    """逐页加入合并结果；PdfReader 直接读磁盘上的文件，页面内容按需读取。"""
+    readers = [PdfReader(p) for p in paths]
+    try:
+        job.total = sum(len(r.pages) for r in readers)
+        writer = PdfWriter()
+        for reader in readers:
+            for page in reader.pages:
+                writer.add_page(page)
+                job.advance()
+        job.message = "写入中"
+        _write(writer, output_path)
+    finally:
+        _close(readers)
+    return output_path, f'合并完成：{len(paths)} 个文件，共 {job.total} 页'
+
+
+def remove_pages(job, path, remove_idx, output_path):
+    reader = PdfReader(path)
+    try:
+        total_pages = len(reader.pages)
+        job.total = total_pages
+        writer = PdfWriter()
+        for i in range(total_pages):
+            if i not in remove_idx:
+                writer.add_page(reader.pages[i])
+            job.advance()
+        job.message = "写入中"
+        _write(writer, output_path)
+    finally:
+        _close([reader])
+    removed = len([i for i in remove_idx if i < total_pages])
+    return output_path, f'原 {total_pages} 页，删除 {removed} 页，剩余 {total_pages - removed} 页'
+
+
+def images_to_pdf(job, paths, force_landscape, output_path):
+    """每张图片单独转成一页 PDF 再追加，同一时刻只解码一张图片。"""
+    job.total = len(paths)
+    writer = PdfWriter()
+    for p in paths:
+        with Image.open(p) as img:
+            if img.mode in ("RGBA", "P"):
+                img = img.convert("RGB")
+            if force_landscape and img.height > img.width:
+                img = img.rotate(90, expand=True)
+            page = BytesIO()
+            img.save(page, format="PDF")
+        page.seek(0)
+        writer.append(PdfReader(page))
+        job.advance()
+    job.message = "写入中"
+    _write(writer, output_path)
+    return output_path, f'完成：{len(paths)} 张图片合成 PDF'
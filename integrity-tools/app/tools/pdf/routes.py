@@ -4,13 +4,16 @@ import tempfile
 import shutil
 import zipfile
 import atexit
+from functools import wraps
 from io import BytesIO
 from pathlib import Path
 
-from PIL import Image
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfReader
 from werkzeug.utils import secure_filename
 
+from config import PDF_SYNC_WAIT
+from app.tools.pdf.engine import engine, QueueFullError, images_to_pdf, merge_pdfs, remove_pages
+
 pdf_bp = Blueprint('pdf', __name__)
 
 UPLOAD_FOLDER = tempfile.mkdtemp()
@@ -96,7 +99,56 @@ def api_pdf_info():
             os.remove(temp_path)
     return jsonify({'info': info})
 
+def reserves_job_slot(f):
+    """
+    进入视图、读取上传之前先占住一个任务名额，队列已满时直接返回 503，
+    几百 MB 的上传不会先落盘再被拒绝。视图没有提交任务（参数校验失败等）时归还名额。
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        try:
+            engine.reserve()
+        except QueueFullError as e:
+            return jsonify({'success': False, 'message': str(e)}), 503
+        request.pdf_slot_reserved = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            if request.pdf_slot_reserved:
+                engine.release()
+    return decorated
+
+def submit_job(kind, func, args, temp_paths):
+    """
+    提交后台任务。带 async=1 时立即返回 job_id；否则最多等 PDF_SYNC_WAIT 秒，
+    小文件仍按原来的格式直接返回结果，超时的转为返回 job_id 由客户端轮询。
+    """
+    reserved = getattr(request, 'pdf_slot_reserved', False)
+    # 名额交给任务，之后由任务结束时归还
+    request.pdf_slot_reserved = False
+    try:
+        job = engine.submit(kind, func, *args, cleanup=temp_paths, reserved=reserved)
+    except QueueFullError as e:
+        for p in temp_paths:
+            if os.path.exists(p):
+                os.remove(p)
+        return jsonify({'success': False, 'message': str(e)}), 503
+
+    if request.form.get('async') != '1':
+        job.wait(PDF_SYNC_WAIT)
+    return job_response(job)
+
+def job_response(job):
+    data = job.to_dict()
+    if job.status == 'done':
+        return jsonify({'success': True, **data})
+    if job.status == 'failed':
+        return jsonify({'success': False, **data})
+    data['status_url'] = f'/api/pdf/jobs/{job.id}'
+    return jsonify({'success': True, 'pending': True, **data}), 202
+
 @pdf_bp.route('/images_to_pdf', methods=['POST'])
+@reserves_job_slot
 def api_images_to_pdf():
     if 'images' not in request.files:
         return jsonify({'success': False, 'message': '请上传图片'})
@@ -107,30 +159,17 @@ def api_images_to_pdf():
 
     force_landscape = 'force_landscape' in request.form
 
-    try:
-        images = []
-        for f in files:
-            img = Image.open(f)
-            if img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            if force_landscape and img.height > img.width:
-                img = img.rotate(90, expand=True)
-            images.append(img)
-
-        output_filename = f"images_to_pdf_{os.urandom(4).hex()}.pdf"
-        output_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        first, rest = images[0], images[1:]
-        first.save(output_path, save_all=True, append_images=rest)
-
-        return jsonify({
-            'success': True,
-            'message': f'完成：{len(images)} 张图片合成 PDF',
-            'download_url': f'/api/pdf/download/{output_filename}'
-        })
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'处理失败: {e}'})
+    temp_paths = []
+    for f in files:
+        temp_path = safe_temp_path(f.filename, '.jpg')
+        f.save(temp_path)
+        temp_paths.append(temp_path)
+
+    output_path = os.path.join(UPLOAD_FOLDER, f"images_to_pdf_{os.urandom(4).hex()}.pdf")
+    return submit_job('images_to_pdf', images_to_pdf, (temp_paths, force_landscape, output_path), temp_paths)
 
 @pdf_bp.route('/merge', methods=['POST'])
+@reserves_job_slot
 def api_merge_pdfs():
     if 'pdfs' not in request.files:
         return jsonify({'success': False, 'message': '请上传 PDF 文件'})
@@ -140,38 +179,16 @@ def api_merge_pdfs():
         return jsonify({'success': False, 'message': '请上传至少 2 个 PDF 文件'})
 
     temp_paths = []
-    try:
-        writer = PdfWriter()
-        total_pages = 0
-
-        for pdf_file in files:
-            temp_path = safe_temp_path(pdf_file.filename)
-            pdf_file.save(temp_path)
-            temp_paths.append(temp_path)
-            reader = PdfReader(temp_path)
-            for page in reader.pages:
-                writer.add_page(page)
-            total_pages += len(reader.pages)
-            close_reader(reader)
-
-        output_filename = f"merged_{os.urandom(4).hex()}.pdf"
-        output_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        with open(output_path, "wb") as f:
-            writer.write(f)
-
-        return jsonify({
-            'success': True,
-            'message': f'合并完成：{len(files)} 个文件，共 {total_pages} 页',
-            'download_url': f'/api/pdf/download/{output_filename}'
-        })
-    except Exception as e:
-        return jsonify({'success': False, 'message': f'处理失败: {e}'})
-    finally:
-        for p in temp_paths:
-            if os.path.exists(p):
-                os.remove(p)
+    for pdf_file in files:
+        temp_path = safe_temp_path(pdf_file.filename)
+        pdf_file.save(temp_path)
+        temp_paths.append(temp_path)
+
+    output_path = os.path.join(UPLOAD_FOLDER, f"merged_{os.urandom(4).hex()}.pdf")
+    return submit_job('merge', merge_pdfs, (temp_paths, output_path), temp_paths)
 
 @pdf_bp.route('/remove_pages', methods=['POST'])
+@reserves_job_slot
 def api_remove_pages():
     if 'pdf' not in request.files:
         return jsonify({'success': False, 'message': '请上传 PDF 文件'})
@@ -185,35 +202,30 @@ def api_remove_pages():
 
     try:
         pdf_file.save(temp_path)
+        # 只读页数做校验，逐页复制放到后台任务里
         reader = PdfReader(temp_path)
-        writer = PdfWriter()
         total_pages = len(reader.pages)
-
-        pages_to_remove = parse_page_range(pages_str, total_pages)
-        if not pages_to_remove:
-            return jsonify({'success': False, 'message': '没有有效的页码'})
-
-        remove_idx = {p - 1 for p in pages_to_remove}
-        for i in range(total_pages):
-            if i not in remove_idx:
-                writer.add_page(reader.pages[i])
         close_reader(reader)
-
-        output_filename = f"removed_{os.urandom(4).hex()}.pdf"
-        output_path = os.path.join(UPLOAD_FOLDER, output_filename)
-        with open(output_path, "wb") as f:
-            writer.write(f)
-
-        return jsonify({
-            'success': True,
-            'message': f'原 {total_pages} 页，删除 {len(remove_idx)} 页，剩余 {total_pages - len(remove_idx)} 页',
-            'download_url': f'/api/pdf/download/{output_filename}'
-        })
     except Exception as e:
-        return jsonify({'success': False, 'message': f'处理失败: {e}'})
-    finally:
         if os.path.exists(temp_path):
             os.remove(temp_path)
+        return jsonify({'success': False, 'message': f'处理失败: {e}'})
+
+    pages_to_remove = parse_page_range(pages_str, total_pages)
+    if not pages_to_remove:
+        os.remove(temp_path)
+        return jsonify({'success': False, 'message': '没有有效的页码'})
+
+    remove_idx = {p - 1 for p in pages_to_remove}
+    output_path = os.path.join(UPLOAD_FOLDER, f"removed_{os.urandom(4).hex()}.pdf")
+    return submit_job('remove_pages', remove_pages, (temp_path, remove_idx, output_path), [temp_path])
+
+@pdf_bp.route('/jobs/<job_id>')
+def api_job_status(job_id):
+    job = engine.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': '任务不存在或已过期'}), 404
+    return job_response(job)
 
 @pdf_bp.route('/download/<filename>')
 def download_file(filename):
@@ -97,4 +97,11 @@ LLM_TIMEOUT = 60
 DEBATE_TIME_LIMIT = 5 * 60
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
\ No newline at end of file
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+# PDF 任务引擎：后台工作线程数、排队加运行中的任务上限、结果保留秒数，
+# 以及未带 async=1 的请求最多等待多少秒（超时则返回 job_id 转为轮询）
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", 2))
+PDF_QUEUE_SIZE = int(os.environ.get("PDF_QUEUE_SIZE", 8))
+PDF_JOB_TTL = int(os.environ.get("PDF_JOB_TTL", 3600))
+PDF_SYNC_WAIT = float(os.environ.get("PDF_SYNC_WAIT", 10))
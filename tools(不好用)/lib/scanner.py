@@ -1,6 +1,7 @@
 """scanner.py — 目录扫描，收集文件元信息和内容预览"""
 from pathlib import Path
 
+from .exclusion import ExclusionMatcher
 from .utils import SKIP_DIRS, SKIP_EXTS, MAX_FILE_SIZE_FOR_PREVIEW, CONTENT_PREVIEW_LINES, fmt_size
 
 TEXT_EXTS = {
@@ -9,6 +10,9 @@ TEXT_EXTS = {
     ".html", ".css", ".rst", ".csv", ".log",
 }
 
+# SKIP_DIRS 只按名称精确匹配（不区分大小写）
+_SKIP = ExclusionMatcher(SKIP_DIRS, substring=False)
+
 
 def scan_directory(root: Path, max_depth: int = 3) -> list[dict]:
     """
@@ -26,7 +30,7 @@ def scan_directory(root: Path, max_depth: int = 3) -> list[dict]:
         except PermissionError:
             return
         for entry in entries:
-            if entry.name in SKIP_DIRS:
+            if _SKIP.match_name(entry.name):
                 continue
             if entry.is_dir():
                 _walk(entry, depth + 1)